@@ -89,7 +89,7 @@ class FieldLookupBackend(BaseFilterBackend):
     Filter using field lookups provided via query string parameters.
     '''
 
-    RESERVED_NAMES = ('page', 'page_size', 'format', 'order', 'order_by',
+    RESERVED_NAMES = ('page', 'page_size', 'cursor', 'format', 'order', 'order_by',
                       'search', 'type', 'host_filter')
 
     SUPPORTED_LOOKUPS = ('exact', 'iexact', 'contains', 'icontains',
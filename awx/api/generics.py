@@ -30,7 +30,7 @@ from rest_framework import views
 # AWX
 from awx.api.filters import FieldLookupBackend
 from awx.main.models import *  # noqa
-from awx.main.access import access_registry
+from awx.main.access import access_registry, prefetch_user_capabilities
 from awx.main.utils import * # noqa
 from awx.main.utils.db import get_all_field_names
 from awx.api.serializers import ResourceAccessListElementSerializer
@@ -310,6 +310,10 @@ class GenericAPIView(generics.GenericAPIView, APIView):
                 d[key] = self.metadata_class().get_serializer_info(serializer, method=method)
         d['settings'] = settings
         d['has_named_url'] = self.model in settings.NAMED_URL_GRAPH
+        cursor_ordering = getattr(self, 'cursor_ordering', None) or ()
+        if isinstance(cursor_ordering, basestring):
+            cursor_ordering = (cursor_ordering,)
+        d['cursor_ordering'] = ', '.join(cursor_ordering)
         return d
 
 
@@ -330,8 +334,17 @@ class ListAPIView(generics.ListAPIView, GenericAPIView):
         # Queries RBAC info & stores into list objects
         if hasattr(self, 'capabilities_prefetch') and page is not None:
             cache_list_capabilities(page, self.capabilities_prefetch, self.model, self.request.user)
+        # Batches the remaining role checks behind summary_fields.user_capabilities
+        if page is not None and self._shows_user_capabilities():
+            prefetch_user_capabilities(self.request.user, page)
         return page
 
+    def _shows_user_capabilities(self):
+        # Polymorphic serializers pick a per-type serializer for each object,
+        # and those do show them.
+        return (hasattr(self.get_serializer_class(), 'show_capabilities') or
+                issubclass(self.model, (UnifiedJobTemplate, UnifiedJob)))
+
     def get_description_context(self):
         if 'username' in get_all_field_names(self.model):
             order_field = 'username'
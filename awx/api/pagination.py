@@ -7,10 +7,56 @@ from rest_framework import pagination
 from rest_framework.utils.urls import replace_query_param
 
 
+class CursorPagination(pagination.CursorPagination):
+    '''
+    Keyset pagination, seeking on the indexed ordering of the view instead of
+    counting the results and skipping to an offset, so that any page of a
+    large collection costs the same.
+    '''
+
+    page_size_query_param = 'page_size'
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super(CursorPagination, self).paginate_queryset(queryset, request, view=view)
+        # Links are relative, as for page number pagination
+        self.base_url = request.get_full_path().encode('utf-8')
+        return page
+
+
 class Pagination(pagination.PageNumberPagination):
+    '''
+    Page number pagination, or cursor pagination (see CursorPagination) on
+    views that set cursor_ordering when the cursor query string parameter is
+    given.
+    '''
 
     page_size_query_param = 'page_size'
     max_page_size = settings.MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    cursor_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_ordering = getattr(view, 'cursor_ordering', None)
+        if cursor_ordering and self.cursor_query_param in request.query_params:
+            self.cursor_pagination = CursorPagination()
+            self.cursor_pagination.cursor_query_param = self.cursor_query_param
+            self.cursor_pagination.ordering = cursor_ordering
+            page = self.cursor_pagination.paginate_queryset(queryset, request, view=view)
+            self.display_page_controls = self.cursor_pagination.display_page_controls
+            return page
+        return super(Pagination, self).paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super(Pagination, self).get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.to_html()
+        return super(Pagination, self).to_html()
 
     def get_next_link(self):
         if not self.page.has_next():
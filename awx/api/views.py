@@ -26,7 +26,7 @@ from django.utils.timezone import now
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import never_cache
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 
@@ -56,7 +56,7 @@ from social_core.backends.utils import load_backends
 from wsgiref.util import FileWrapper
 
 # AWX
-from awx.main.tasks import send_notifications
+from awx.main.tasks import send_notifications, schedule_update_inventory_host_addresses
 from awx.main.access import get_user_queryset
 from awx.main.ha import is_ha_environment
 from awx.api.authentication import TokenGetAuthentication
@@ -81,7 +81,7 @@ from awx.api.serializers import * # noqa
 from awx.api.metadata import RoleMetadata, JobTypeMetadata
 from awx.main.consumers import emit_channel_notification
 from awx.main.models.unified_jobs import ACTIVE_STATES
-from awx.main.scheduler.tasks import run_job_complete
+from awx.main.scheduler.tasks import schedule_job_complete
 
 logger = logging.getLogger('awx.api.views')
 
@@ -2027,7 +2027,7 @@ class HostList(HostRelatedSearchMixin, ListCreateAPIView):
         qs = super(HostList, self).get_queryset()
         filter_string = self.request.query_params.get('host_filter', None)
         if filter_string:
-            filter_qs = SmartFilter.query_from_string(filter_string)
+            filter_qs = SmartFilter.compiled_query(filter_string)
             qs &= filter_qs
         return qs.distinct()
 
@@ -2479,6 +2479,14 @@ class InventoryScriptView(RetrieveAPIView):
                 hosts_q['enabled'] = True
             host = get_object_or_404(obj.hosts, **hosts_q)
             return Response(host.variables_dict)
+        if hostvars and getattr(request.accepted_renderer, 'format', None) == 'json':
+            # Full inventories with hostvars can be very large; stream the JSON
+            # as it is read from the database rather than building it in memory.
+            return StreamingHttpResponse(obj.iter_script_data(
+                hostvars=hostvars,
+                towervars=towervars,
+                show_all=show_all
+            ), content_type='application/json')
         return Response(obj.get_script_data(
             hostvars=hostvars,
             towervars=towervars,
@@ -3223,34 +3231,21 @@ class JobTemplateCallback(GenericAPIView):
                 remote_hosts.remove(rh)
         if not remote_hosts:
             return set()
-        # Find the host objects to search for a match.
-        obj = self.get_object()
-        hosts = obj.inventory.hosts.all()
-        # Populate host_mappings
-        host_mappings = {}
-        for host in hosts:
-            host_name = host.get_effective_host_name()
-            host_mappings.setdefault(host_name, [])
-            host_mappings[host_name].append(host)
+        # Find the host objects to search for a match, by the addresses
+        # recorded for each host of the inventory.
+        inventory = self.get_object().inventory
+        inventory.update_host_address_names()
+        addresses_qs = HostAddress.objects.filter(inventory_id=inventory.pk, address__in=remote_hosts)
         # Try finding direct match
-        matches = set()
-        for host_name in remote_hosts:
-            if host_name in host_mappings:
-                matches.update(host_mappings[host_name])
+        matches = set(Host.objects.filter(pk__in=addresses_qs.filter(is_name=True).values('host_id')))
         if len(matches) == 1:
             return matches
-        # Try to resolve forward addresses for each host to find matches.
-        for host_name in host_mappings:
-            try:
-                result = socket.getaddrinfo(host_name, None)
-                possible_ips = set(x[4][0] for x in result)
-                possible_ips.discard(host_name)
-                if possible_ips and possible_ips & remote_hosts:
-                    matches.update(host_mappings[host_name])
-            except socket.gaierror:
-                pass
-            except UnicodeError:
-                pass
+        # Try the IP addresses each host name resolves to: resolve names never
+        # resolved before now, and refresh the others in the background once
+        # they are older than AWX_CALLBACK_ADDRESS_TTL.
+        inventory.resolve_host_addresses()
+        schedule_update_inventory_host_addresses(inventory.pk)
+        matches.update(Host.objects.filter(pk__in=addresses_qs.filter(is_name=False).values('host_id')))
         return matches
 
     def get(self, request, *args, **kwargs):
@@ -3781,7 +3776,7 @@ class WorkflowJobCancel(WorkflowsEnforcementMixin, RetrieveAPIView):
         if obj.can_cancel:
             obj.cancel()
             #TODO: Figure out whether an immediate schedule is needed.
-            run_job_complete.delay(obj.id)
+            schedule_job_complete(obj.id)
             return Response(status=status.HTTP_202_ACCEPTED)
         else:
             return self.http_method_not_allowed(request, *args, **kwargs)
@@ -3899,6 +3894,7 @@ class JobList(ListCreateAPIView):
     model = Job
     metadata_class = JobTypeMetadata
     serializer_class = JobListSerializer
+    cursor_ordering = 'id'
 
     @property
     def allowed_methods(self):
@@ -4243,6 +4239,7 @@ class GroupJobEventsList(BaseJobEventsList):
 class JobJobEventsList(BaseJobEventsList):
 
     parent_model = Job
+    cursor_ordering = ('counter', 'id')
 
     def get_queryset(self):
         job = self.get_parent_object()
@@ -4528,6 +4525,7 @@ class UnifiedJobList(ListAPIView):
     model = UnifiedJob
     serializer_class = UnifiedJobListSerializer
     new_in_148 = True
+    cursor_ordering = 'id'
 
 
 class StdoutANSIFilter(object):
@@ -4746,6 +4744,7 @@ class ActivityStreamList(ActivityStreamEnforcementMixin, SimpleListAPIView):
     model = ActivityStream
     serializer_class = ActivityStreamSerializer
     new_in_145 = True
+    cursor_ordering = 'id'
 
 
 class ActivityStreamDetail(ActivityStreamEnforcementMixin, RetrieveAPIView):
@@ -23,6 +23,7 @@ from awx.main.utils import (
     get_pk_from_dict,
     to_python_boolean,
     get_licenser,
+    cache_list_capabilities,
 )
 from awx.main.models import * # noqa
 from awx.main.models.unified_jobs import ACTIVE_STATES
@@ -31,7 +32,7 @@ from awx.main.models.mixins import ResourceMixin
 from awx.conf.license import LicenseForbids, feature_enabled
 
 __all__ = ['get_user_queryset', 'check_user_access', 'check_user_access_with_errors',
-           'user_accessible_objects', 'consumer_access',
+           'user_accessible_objects', 'consumer_access', 'prefetch_user_capabilities',
            'user_admin_role', 'ActiveJobConflict',]
 
 logger = logging.getLogger('awx.main.access')
@@ -151,6 +152,23 @@ def get_user_capabilities(user, instance, **kwargs):
     return access_class(user).get_user_capabilities(instance, **kwargs)
 
 
+def prefetch_user_capabilities(user, objs):
+    '''
+    Prepare a page of objects for get_user_capabilities, letting the access
+    class of each model load what its checks need for all of the objects at
+    once instead of querying per object.
+    '''
+    if not user.is_authenticated() or user.is_superuser:
+        return
+    objs_by_class = {}
+    for obj in objs:
+        objs_by_class.setdefault(obj.__class__, []).append(obj)
+    for model_class, model_objs in objs_by_class.items():
+        access_class = access_registry.get(model_class)
+        if access_class is not None:
+            access_class(user).prefetch_user_capabilities(model_objs)
+
+
 def check_superuser(func):
     '''
     check_superuser is a decorator that provides a simple short circuit
@@ -186,6 +204,10 @@ class BaseAccess(object):
     model = None
     select_related = ()
     prefetch_related = ()
+    capabilities_prefetch = []
+    # (type, job model, lookup from the job to the object) for each kind of
+    # active job that keeps an object from being deleted
+    active_jobs_prefetch = []
 
     def __init__(self, user, save_messages=False):
         self.user = user
@@ -328,6 +350,50 @@ class BaseAccess(object):
             elif "features" not in validation_info:
                 raise LicenseForbids(_("Features not found in active license."))
 
+    def prefetch_user_capabilities(self, objs):
+        '''
+        Batch the queries get_user_capabilities would run for each of objs:
+        cache the capabilities listed in capabilities_prefetch (in the format
+        of cache_list_capabilities) with one query each, unless the view
+        already did, and record which of the roles of objs and of their
+        cached related objects the user holds, so that the remaining role
+        membership checks are answered from memory. The active jobs checked
+        by can_delete are loaded for all of objs the first time one of them
+        needs them.
+        '''
+        uncached = [obj for obj in objs if not hasattr(obj, 'capabilities_cache')]
+        if uncached and self.capabilities_prefetch:
+            cache_list_capabilities(uncached, self.capabilities_prefetch, self.model, self.user)
+        prefetch_role_membership(self.user, objs)
+        if self.active_jobs_prefetch:
+            page = list(objs)
+            for obj in page:
+                obj._active_jobs_page = page
+
+    def _load_active_jobs(self, objs):
+        active_jobs = dict((obj.pk, []) for obj in objs)
+        for job_type, job_model, lookup in self.active_jobs_prefetch:
+            qs = job_model.objects.filter(**{'%s__in' % lookup: active_jobs.keys(), 'status__in': ACTIVE_STATES})
+            for obj_pk, job_pk in qs.order_by('pk').values_list(lookup, 'pk').distinct():
+                active_jobs[obj_pk].append(dict(type=job_type, id=job_pk))
+        return active_jobs
+
+    def get_active_jobs(self, obj):
+        '''
+        Return the active jobs listed in active_jobs_prefetch that keep obj
+        from being deleted, in the format of ActiveJobConflict. For objects
+        passed to prefetch_user_capabilities, the first call loads them for
+        the whole page with one query per job model.
+        '''
+        if not hasattr(obj, '_active_jobs_cache'):
+            page = getattr(obj, '_active_jobs_page', None)
+            if page is None:
+                return self._load_active_jobs([obj])[obj.pk]
+            active_jobs = self._load_active_jobs(page)
+            for page_obj in page:
+                page_obj._active_jobs_cache = active_jobs[page_obj.pk]
+        return obj._active_jobs_cache
+
     def get_user_capabilities(self, obj, method_list=[], parent_obj=None):
         if obj is None:
             return {}
@@ -554,6 +620,11 @@ class OrganizationAccess(BaseAccess):
 
     model = Organization
     prefetch_related = ('created_by', 'modified_by',)
+    active_jobs_prefetch = [
+        ('job', Job, 'project__organization'),
+        ('project_update', ProjectUpdate, 'project__organization'),
+        ('inventory_update', InventoryUpdate, 'inventory_source__inventory__organization'),
+    ]
 
     def filtered_queryset(self):
         return self.model.accessible_objects(self.user, 'read_role')
@@ -567,13 +638,7 @@ class OrganizationAccess(BaseAccess):
         is_change_possible = self.can_change(obj, None)
         if not is_change_possible:
             return False
-        active_jobs = []
-        active_jobs.extend([dict(type="job", id=o.id)
-                            for o in Job.objects.filter(project__in=obj.projects.all(), status__in=ACTIVE_STATES)])
-        active_jobs.extend([dict(type="project_update", id=o.id)
-                            for o in ProjectUpdate.objects.filter(project__in=obj.projects.all(), status__in=ACTIVE_STATES)])
-        active_jobs.extend([dict(type="inventory_update", id=o.id)
-                            for o in InventoryUpdate.objects.filter(inventory_source__inventory__organization=obj, status__in=ACTIVE_STATES)])
+        active_jobs = self.get_active_jobs(obj)
         if len(active_jobs) > 0:
             raise ActiveJobConflict(active_jobs)
         return True
@@ -613,6 +678,12 @@ class InventoryAccess(BaseAccess):
 
     model = Inventory
     select_related = ('created_by', 'modified_by', 'organization',)
+    capabilities_prefetch = ['admin', 'adhoc']
+    active_jobs_prefetch = [
+        ('job', Job, 'inventory'),
+        ('inventory_update', InventoryUpdate, 'inventory_source__inventory'),
+        ('ad_hoc_command', AdHocCommand, 'inventory'),
+    ]
 
     def filtered_queryset(self, allowed=None, ad_hoc=None):
         return self.model.accessible_objects(self.user, 'read_role')
@@ -660,13 +731,7 @@ class InventoryAccess(BaseAccess):
         is_can_admin = self.can_admin(obj, None)
         if not is_can_admin:
             return False
-        active_jobs = []
-        active_jobs.extend([dict(type="job", id=o.id)
-                           for o in Job.objects.filter(inventory=obj, status__in=ACTIVE_STATES)])
-        active_jobs.extend([dict(type="inventory_update", id=o.id)
-                            for o in InventoryUpdate.objects.filter(inventory_source__inventory=obj, status__in=ACTIVE_STATES)])
-        active_jobs.extend([dict(type="ad_hoc_command", id=o.id)
-                            for o in AdHocCommand.objects.filter(inventory=obj, status__in=ACTIVE_STATES)])
+        active_jobs = self.get_active_jobs(obj)
         if len(active_jobs) > 0:
             raise ActiveJobConflict(active_jobs)
         return True
@@ -697,6 +762,7 @@ class HostAccess(BaseAccess):
     select_related = ('created_by', 'modified_by', 'inventory',
                       'last_job__job_template', 'last_job_host_summary__job',)
     prefetch_related = ('groups',)
+    capabilities_prefetch = ['inventory.admin']
 
     def filtered_queryset(self):
         return self.model.objects.filter(inventory__in=Inventory.accessible_pk_qs(self.user, 'read_role'))
@@ -753,6 +819,10 @@ class GroupAccess(BaseAccess):
     model = Group
     select_related = ('created_by', 'modified_by', 'inventory',)
     prefetch_related = ('parents', 'children',)
+    capabilities_prefetch = ['inventory.admin', 'inventory.adhoc']
+    active_jobs_prefetch = [
+        ('inventory_update', InventoryUpdate, 'inventory_source__groups'),
+    ]
 
     def filtered_queryset(self):
         return Group.objects.filter(inventory__in=Inventory.accessible_pk_qs(self.user, 'read_role'))
@@ -789,9 +859,7 @@ class GroupAccess(BaseAccess):
         is_delete_allowed = bool(obj and self.user in obj.inventory.admin_role)
         if not is_delete_allowed:
             return False
-        active_jobs = []
-        active_jobs.extend([dict(type="inventory_update", id=o.id)
-                            for o in InventoryUpdate.objects.filter(inventory_source__in=obj.inventory_sources.all(), status__in=ACTIVE_STATES)])
+        active_jobs = self.get_active_jobs(obj)
         if len(active_jobs) > 0:
             raise ActiveJobConflict(active_jobs)
         return True
@@ -818,6 +886,9 @@ class InventorySourceAccess(BaseAccess):
 
     model = InventorySource
     select_related = ('created_by', 'modified_by', 'inventory',)
+    active_jobs_prefetch = [
+        ('inventory_update', InventoryUpdate, 'inventory_source'),
+    ]
 
     def filtered_queryset(self):
         return self.model.objects.filter(inventory__in=Inventory.accessible_pk_qs(self.user, 'read_role'))
@@ -841,9 +912,9 @@ class InventorySourceAccess(BaseAccess):
         if not self.user.is_superuser and \
                 not (obj and obj.inventory and self.user.can_access(Inventory, 'admin', obj.inventory, None)):
             return False
-        active_jobs_qs = InventoryUpdate.objects.filter(inventory_source=obj, status__in=ACTIVE_STATES)
-        if active_jobs_qs.exists():
-            raise ActiveJobConflict([dict(type="inventory_update", id=o.id) for o in active_jobs_qs.all()])
+        active_jobs = self.get_active_jobs(obj)
+        if active_jobs:
+            raise ActiveJobConflict(active_jobs)
         return True
 
     @check_superuser
@@ -948,6 +1019,7 @@ class CredentialAccess(BaseAccess):
     prefetch_related = ('admin_role', 'use_role', 'read_role',
                         'admin_role__parents', 'admin_role__members',
                         'credential_type', 'organization')
+    capabilities_prefetch = ['admin', 'use']
 
     def filtered_queryset(self):
         return self.model.accessible_objects(self.user, 'read_role')
@@ -1068,6 +1140,11 @@ class ProjectAccess(BaseAccess):
 
     model = Project
     select_related = ('modified_by', 'credential', 'current_job', 'last_job',)
+    capabilities_prefetch = ['admin', 'update']
+    active_jobs_prefetch = [
+        ('job', Job, 'project'),
+        ('project_update', ProjectUpdate, 'project'),
+    ]
 
     def filtered_queryset(self):
         return self.model.accessible_objects(self.user, 'read_role')
@@ -1088,11 +1165,7 @@ class ProjectAccess(BaseAccess):
         is_change_allowed = self.can_change(obj, None)
         if not is_change_allowed:
             return False
-        active_jobs = []
-        active_jobs.extend([dict(type="job", id=o.id)
-                            for o in Job.objects.filter(project=obj, status__in=ACTIVE_STATES)])
-        active_jobs.extend([dict(type="project_update", id=o.id)
-                            for o in ProjectUpdate.objects.filter(project=obj, status__in=ACTIVE_STATES)])
+        active_jobs = self.get_active_jobs(obj)
         if len(active_jobs) > 0:
             raise ActiveJobConflict(active_jobs)
         return True
@@ -1153,6 +1226,13 @@ class JobTemplateAccess(BaseAccess):
         'credentials__credential_type',
         Prefetch('labels', queryset=Label.objects.all().order_by('name')),
     )
+    capabilities_prefetch = [
+        'admin', 'execute',
+        {'copy': ['project.use', 'inventory.use']}
+    ]
+    active_jobs_prefetch = [
+        ('job', Job, 'job_template'),
+    ]
 
     def filtered_queryset(self):
         return self.model.accessible_objects(self.user, 'read_role')
@@ -1272,8 +1352,7 @@ class JobTemplateAccess(BaseAccess):
         is_delete_allowed = self.user.is_superuser or self.user in obj.admin_role
         if not is_delete_allowed:
             return False
-        active_jobs = [dict(type="job", id=o.id)
-                       for o in obj.jobs.filter(status__in=ACTIVE_STATES)]
+        active_jobs = self.get_active_jobs(obj)
         if len(active_jobs) > 0:
             raise ActiveJobConflict(active_jobs)
         return True
@@ -1695,6 +1774,9 @@ class WorkflowJobTemplateAccess(BaseAccess):
     model = WorkflowJobTemplate
     select_related = ('created_by', 'modified_by', 'next_schedule',
                       'admin_role', 'execute_role', 'read_role',)
+    active_jobs_prefetch = [
+        ('workflow_job', WorkflowJob, 'workflow_job_template'),
+    ]
 
     def filtered_queryset(self):
         return self.model.accessible_objects(self.user, 'read_role')
@@ -1777,8 +1859,7 @@ class WorkflowJobTemplateAccess(BaseAccess):
         is_delete_allowed = self.user.is_superuser or self.user in obj.admin_role
         if not is_delete_allowed:
             return False
-        active_jobs = [dict(type="workflow_job", id=o.id)
-                       for o in obj.workflow_jobs.filter(status__in=ACTIVE_STATES)]
+        active_jobs = self.get_active_jobs(obj)
         if len(active_jobs) > 0:
             raise ActiveJobConflict(active_jobs)
         return True
@@ -5,13 +5,17 @@ import StringIO
 import json
 import os
 import shutil
+import signal
 import stat
+import subprocess
 import tempfile
 import time
 import logging
 from distutils.version import LooseVersion as Version
 
 from django.conf import settings
+from django.db.models import Case, CharField, DateTimeField, IntegerField, Value, When
+from django.utils.timezone import now
 
 import awx
 from awx.main.expect import run
@@ -22,6 +26,80 @@ logger = logging.getLogger('awx.isolated.manager')
 playbook_logger = logging.getLogger('awx.isolated.manager.playbooks')
 
 
+def ssh_control_path_dir():
+    '''
+    Returns the directory holding the multiplexed SSH connections to
+    isolated instances, which are shared by every job (and management
+    playbook) talking to the same instance.
+    '''
+    path = os.path.join(settings.AWX_PROOT_BASE_PATH, 'awx_isolated_cp')
+    if not os.path.exists(path):
+        try:
+            os.mkdir(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+    return path
+
+
+class ArtifactStreamReader(object):
+    '''
+    A file-like object fed the output of `awx-expect stream`; stdout is
+    written to `stdout_handle` and artifacts (e.g., job event data) to the
+    local private data directory, mirroring what `check_isolated.yml` would
+    have synchronized.
+    '''
+
+    def __init__(self, private_data_dir, stdout_handle):
+        self.artifacts_dir = os.path.join(private_data_dir, 'artifacts')
+        self.stdout_handle = stdout_handle
+        self.output = StringIO.StringIO()
+        self.offset = 0
+        self.finished = False
+        self._pending = []
+
+    def write(self, data):
+        if '\n' not in data:
+            self._pending.append(data)
+            return
+        lines = (''.join(self._pending) + data).split('\n')
+        self._pending = [lines.pop()]
+        for line in lines:
+            self._handle(line.rstrip('\r'))
+
+    def flush(self):
+        pass
+
+    def _handle(self, line):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            # e.g., ssh errors; kept for troubleshooting
+            self.output.write(line + '\n')
+        elif 'stdout' in message:
+            self.stdout_handle.write(message['stdout'])
+            self.offset = message['offset']
+        elif 'artifact' in message:
+            self._write_artifact(message['artifact'], message['data'])
+        elif message.get('eof'):
+            self.finished = True
+
+    def _write_artifact(self, name, data):
+        path = os.path.normpath(os.path.join(self.artifacts_dir, name))
+        if not path.startswith(self.artifacts_dir + os.sep):
+            logger.warning('Ignoring isolated artifact outside of {}: {}'.format(self.artifacts_dir, name))
+            return
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
+        tmp_path = path + '.tmp'
+        with codecs.open(tmp_path, 'w', encoding='utf-8') as f:
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IWUSR)
+            f.write(data)
+        os.rename(tmp_path, path)
+
+
 class IsolatedManager(object):
 
     def __init__(self, args, cwd, env, stdout_handle, ssh_key_path,
@@ -82,6 +160,9 @@ class IsolatedManager(object):
         env['ANSIBLE_RETRY_FILES_ENABLED'] = 'False'
         env['ANSIBLE_HOST_KEY_CHECKING'] = 'False'
         env['ANSIBLE_LIBRARY'] = os.path.join(os.path.dirname(awx.__file__), 'plugins', 'isolated')
+        # share the multiplexed connections used to stream job output
+        env['ANSIBLE_SSH_CONTROL_PATH_DIR'] = ssh_control_path_dir()
+        env['ANSIBLE_SSH_CONTROL_PATH'] = '%(directory)s/%%C'
         return env
 
     @staticmethod
@@ -104,6 +185,29 @@ class IsolatedManager(object):
             args.extend(['-e', json.dumps(extra_vars)])
         return args
 
+    @staticmethod
+    def _build_ssh_args(host, command):
+        '''
+        Returns the ssh command which runs `command` on an isolated instance
+        over the multiplexed connection to it
+
+        :param host:    the hostname of the isolated instance
+        :param command: a list of `subprocess.call`-style arguments
+        '''
+        return [
+            'ssh',
+            '-o', 'ControlMaster=auto',
+            '-o', 'ControlPersist={}s'.format(settings.AWX_ISOLATED_CONTROL_PERSIST),
+            '-o', 'ControlPath={}'.format(os.path.join(ssh_control_path_dir(), '%C')),
+            '-o', 'ConnectTimeout={}'.format(settings.AWX_ISOLATED_CONNECTION_TIMEOUT),
+            '-o', 'ServerAliveInterval={}'.format(settings.AWX_ISOLATED_CONNECTION_TIMEOUT),
+            '-o', 'StrictHostKeyChecking=no',
+            '-o', 'BatchMode=yes',
+            '-l', settings.AWX_ISOLATED_USERNAME,
+            host,
+            run.args2cmdline(*command)
+        ]
+
     @staticmethod
     def _redact_isolated_env(env):
         '''
@@ -260,9 +364,43 @@ class IsolatedManager(object):
             return True
         return False
 
+    def stream(self):
+        """
+        Stream stdout and job artifacts from the isolated node over a single,
+        long-lived SSH session until the job exits.
+
+        Returns (status, rc, offset, output): the result of the session, the
+        number of bytes of stdout received and any unexpected output. The
+        status is 'failed' if the session ended before the job did.
+        """
+        remaining = self.job_timeout
+        if remaining != 0:
+            remaining = max(0, remaining - (time.time() - self.started_at))
+            if remaining == 0:
+                return 'failed', None, 0, ''
+        reader = ArtifactStreamReader(self.private_data_dir, self.stdout_handle)
+        logger.debug('Streaming isolated job {} with `awx-expect stream`.'.format(self.instance.id))
+        status, rc = IsolatedManager.run_pexpect(
+            self._build_ssh_args(self.host, ['awx-expect', 'stream', self.private_data_dir]),
+            self.awx_playbook_path(), self.management_env, reader,
+            cancelled_callback=self.cancelled_callback,
+            extra_update_fields=self.extra_update_fields,
+            job_timeout=remaining,
+            pexpect_timeout=5,
+            proot_cmd=self.proot_cmd
+        )
+        output = reader.output.getvalue()
+        if status == 'successful' and not reader.finished:
+            status = 'failed'
+        if status == 'failed':
+            playbook_logger.info('Isolated job {} stream ended early:\n{}'.format(self.instance.id, output))
+        return status, rc, reader.offset, output
+
     def check(self, interval=None):
         """
-        Repeatedly poll the isolated node to determine if the job has run.
+        Follow the job on the isolated node until it has run: stream its
+        output (see `stream`) or, if that is disabled or the stream breaks,
+        repeatedly poll the isolated node with `check_isolated.yml`.
 
         On success, copy job artifacts to the controlling node.
         On failure, continue to poll the isolated node (until the job timeout
@@ -286,6 +424,8 @@ class IsolatedManager(object):
         buff = cStringIO.StringIO()
         last_check = time.time()
         seek = 0
+        if settings.AWX_ISOLATED_STREAMING:
+            status, rc, seek, output = self.stream()
         job_timeout = remaining = self.job_timeout
         while status == 'failed':
             if job_timeout != 0:
@@ -371,7 +511,7 @@ class IsolatedManager(object):
             logger.warning('Isolated job {} cleanup error, output:\n{}'.format(self.instance.id, output))
 
     @classmethod
-    def update_capacity(cls, instance, task_result, awx_application_version):
+    def update_capacity(cls, instance, task_result, awx_application_version, save=True):
         instance.version = task_result['version']
 
         isolated_version = instance.version.split("-", 1)[0]
@@ -385,52 +525,141 @@ class IsolatedManager(object):
             if instance.capacity == 0 and task_result['capacity']:
                 logger.warning('Isolated instance {} has re-joined.'.format(instance.hostname))
             instance.capacity = int(task_result['capacity'])
-        instance.save(update_fields=['capacity', 'version', 'modified'])
+        if save:
+            instance.save(update_fields=['capacity', 'version', 'modified'])
 
     @classmethod
-    def health_check(cls, instance_qs, awx_application_version):
+    def probe(cls, instances, timeout):
         '''
-        :param instance_qs:         List of Django objects representing the
-                                    isolated instances to manage
-        Runs playbook that will
-         - determine if instance is reachable
-         - find the instance capacity
-         - clean up orphaned private files
-        Performs save on each instance to update its capacity.
+        Runs `awx-expect heartbeat` on all of the isolated instances at once,
+        each over its multiplexed SSH connection, and yields an
+        (instance, result) pair as each of them answers or times out.
+
+        :param instances: the isolated instances to probe
+        :param timeout:   a timeout (in seconds) for each probe
         '''
-        hostname_string = ''
-        for instance in instance_qs:
-            hostname_string += '{},'.format(instance.hostname)
-        args = cls._build_args('heartbeat_isolated.yml', hostname_string)
-        args.extend(['--forks', str(len(instance_qs))])
-        env = cls._base_management_env()
-        env['ANSIBLE_STDOUT_CALLBACK'] = 'json'
+        isolated_ssh_path = None
+        probes = []
+        devnull = open(os.devnull, 'r')
+        try:
+            if all([
+                getattr(settings, 'AWX_ISOLATED_KEY_GENERATION', False) is True,
+                getattr(settings, 'AWX_ISOLATED_PRIVATE_KEY', None)
+            ]):
+                isolated_ssh_path = tempfile.mkdtemp(prefix='awx_isolated', dir=settings.AWX_PROOT_BASE_PATH)
+                os.chmod(isolated_ssh_path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
 
-        buff = cStringIO.StringIO()
-        timeout = max(60, 2 * settings.AWX_ISOLATED_CONNECTION_TIMEOUT)
-        status, rc = IsolatedManager.run_pexpect(
-            args, cls.awx_playbook_path(), env, buff,
-            idle_timeout=timeout, job_timeout=timeout,
-            pexpect_timeout=5
-        )
-        output = buff.getvalue()
-        buff.close()
+            env = cls._base_management_env()
+            for i, instance in enumerate(instances):
+                args = cls._build_ssh_args(instance.hostname, ['awx-expect', 'heartbeat'])
+                if isolated_ssh_path:
+                    # as in `run_pexpect`, each probe loads the key into its
+                    # own ssh-agent through a fifo
+                    isolated_key = os.path.join(isolated_ssh_path, '.isolated_{}'.format(i))
+                    ssh_sock = os.path.join(isolated_ssh_path, '.isolated_ssh_auth_{}.sock'.format(i))
+                    run.open_fifo_write(isolated_key, settings.AWX_ISOLATED_PRIVATE_KEY)
+                    args = run.wrap_args_with_ssh_agent(args, isolated_key, ssh_sock, silence_ssh_add=True)
+                # output goes to files rather than pipes: a backgrounded SSH
+                # control master keeps the stderr of the ssh that started it
+                output = tempfile.TemporaryFile()
+                process = subprocess.Popen(
+                    args, stdin=devnull, stdout=output, stderr=subprocess.STDOUT,
+                    env=env, close_fds=True, preexec_fn=os.setsid
+                )
+                probes.append((instance, process, output))
+
+            deadline = time.time() + timeout
+            while probes:
+                for probe in probes[:]:
+                    instance, process, output = probe
+                    if process.poll() is None and time.time() < deadline:
+                        continue
+                    probes.remove(probe)
+                    if process.returncode is None:
+                        cls._kill_probe(process)
+                        yield instance, {'msg': 'timed out after {} seconds'.format(timeout)}
+                        continue
+                    output.seek(0)
+                    yield instance, cls._parse_heartbeat(output.read())
+                    output.close()
+                if probes:
+                    time.sleep(0.1)
+        finally:
+            for instance, process, output in probes:
+                if process.poll() is None:
+                    cls._kill_probe(process)
+                output.close()
+            devnull.close()
+            if isolated_ssh_path:
+                shutil.rmtree(isolated_ssh_path)
+
+    @staticmethod
+    def _kill_probe(process):
+        # the ssh command may run under `ssh-agent sh -c`, so kill the whole
+        # session started for the probe
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        process.wait()
 
+    @staticmethod
+    def _parse_heartbeat(output):
+        # `awx-expect heartbeat` prints a single JSON document; anything
+        # before it comes from ssh
+        lines = output.strip().splitlines()
         try:
-            result = json.loads(output)
+            result = json.loads(lines[-1])
             if not isinstance(result, dict):
                 raise TypeError('Expected a dict but received {}.'.format(str(type(result))))
-        except (ValueError, AssertionError, TypeError):
-            logger.exception('Failed to read status from isolated instances, output:\n {}'.format(output))
+        except (ValueError, IndexError, TypeError):
+            return {'msg': output.strip() or 'no output'}
+        return result
+
+    @staticmethod
+    def save_capacity(instances):
+        '''
+        Writes the capacity, version and modified time of the given instances
+        with a single UPDATE.
+        '''
+        if not instances:
             return
+        from awx.main.models import Instance
+
+        def by_pk(field, output_field):
+            return Case(
+                *[When(pk=instance.pk, then=Value(getattr(instance, field))) for instance in instances],
+                output_field=output_field
+            )
 
-        for instance in instance_qs:
-            try:
-                task_result = result['plays'][0]['tasks'][0]['hosts'][instance.hostname]
-            except (KeyError, IndexError):
-                task_result = {}
+        Instance.objects.filter(pk__in=[instance.pk for instance in instances]).update(
+            capacity=by_pk('capacity', IntegerField()),
+            version=by_pk('version', CharField()),
+            modified=by_pk('modified', DateTimeField()),
+        )
+
+    @classmethod
+    def health_check(cls, instance_qs, awx_application_version):
+        '''
+        :param instance_qs:         List of Django objects representing the
+                                    isolated instances to manage
+        Probes every instance concurrently (see `probe`) to
+         - determine if instance is reachable
+         - find the instance capacity
+         - clean up orphaned private files
+        Results are handled as they arrive; the capacity of all instances is
+        then saved with a single update.
+        '''
+        timeout = max(60, 2 * settings.AWX_ISOLATED_CONNECTION_TIMEOUT)
+        changed = []
+        for instance, task_result in cls.probe(list(instance_qs), timeout):
             if 'capacity' in task_result:
-                cls.update_capacity(instance, task_result, awx_application_version)
+                cls.update_capacity(instance, task_result, awx_application_version, save=False)
+                instance.modified = now()
+                changed.append(instance)
+                if task_result.get('paths_removed'):
+                    logger.debug('Isolated instance {} removed {}.'.format(
+                        instance.hostname, ', '.join(task_result['paths_removed'])))
             elif instance.capacity == 0:
                 logger.debug('Isolated instance {} previously marked as lost, could not re-join.'.format(
                     instance.hostname))
@@ -440,9 +669,10 @@ class IsolatedManager(object):
                 ))
                 if instance.is_lost(isolated=True):
                     instance.capacity = 0
-                    instance.save(update_fields=['capacity'])
+                    changed.append(instance)
                     logger.error('Isolated instance {} last checked in at {}, marked as lost.'.format(
                         instance.hostname, instance.modified))
+        cls.save_capacity(changed)
 
     @staticmethod
     def get_stdout_handle(instance, private_data_dir, event_data_key='job_id'):
@@ -5,13 +5,17 @@ import base64
 import codecs
 import collections
 import cStringIO
+import datetime
+import glob
 import logging
 import json
 import os
+import shutil
 import stat
 import pipes
 import re
 import signal
+import subprocess
 import sys
 import thread
 import time
@@ -208,6 +212,153 @@ def run_isolated_job(private_data_dir, secrets, logfile=sys.stdout):
                        pexpect_timeout=pexpect_timeout)
 
 
+def is_alive(private_data_dir):
+    '''
+    Returns `True` if the daemon started by `awx-expect start` for
+    `private_data_dir` is running, `False` if it is not and `None` if it
+    has not written its pidfile (yet).
+    '''
+    try:
+        with open(os.path.join(private_data_dir, 'pid'), 'r') as f:
+            pid = int(f.readline())
+    except (IOError, ValueError):
+        return None
+    try:
+        os.kill(pid, signal.SIG_DFL)
+        return True
+    except OSError:
+        return False
+
+
+def stream_artifacts(private_data_dir, logfile=sys.stdout, poll_interval=0.5,
+                     start_timeout=30, chunk_size=65536):
+    '''
+    Write the stdout and artifacts of a job started with `awx-expect start` to
+    `logfile` as they are produced, one JSON document per line, until the job
+    exits:
+
+        {"artifact": "job_events/<uuid>-partial.json", "data": "..."}
+        {"stdout": "...", "offset": <bytes of stdout sent so far>}
+        {"eof": true}
+
+    Event data is always sent before the chunk of stdout that refers to it;
+    the final `status`, `rc` (and `daemon.log`) artifacts precede `eof`.
+
+    :param private_data_dir: the private data directory of the job
+    :param logfile:          a file-like object to stream to
+    :param poll_interval:    seconds to wait for new output
+    :param start_timeout:    seconds to wait for the job's pidfile to appear
+    :param chunk_size:       maximum bytes of stdout sent per message
+    '''
+    artifacts_dir = os.path.join(private_data_dir, 'artifacts')
+    events_dir = os.path.join(artifacts_dir, 'job_events')
+    stdout_path = os.path.join(artifacts_dir, 'stdout')
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    sent_events = set()
+    offset = 0
+    started = time.time()
+
+    def emit(**message):
+        logfile.write(json.dumps(message) + '\n')
+        logfile.flush()
+
+    def emit_artifact(name):
+        path = os.path.join(artifacts_dir, name)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                emit(artifact=name, data=f.read().decode('utf-8', 'replace'))
+
+    def emit_events():
+        if not os.path.isdir(events_dir):
+            return
+        # event files are renamed into place once they're complete
+        for filename in sorted(os.listdir(events_dir)):
+            if filename.endswith('-partial.json') and filename not in sent_events:
+                emit_artifact(os.path.join('job_events', filename))
+                sent_events.add(filename)
+
+    while True:
+        alive = is_alive(private_data_dir)
+        if alive is None:
+            # the daemon hasn't written its pidfile yet
+            alive = (
+                time.time() - started < start_timeout and
+                not os.path.exists(os.path.join(artifacts_dir, 'status'))
+            )
+        chunk = ''
+        if os.path.exists(stdout_path):
+            with open(stdout_path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(chunk_size)
+        if chunk:
+            offset += len(chunk)
+            emit_events()
+            emit(stdout=decoder.decode(chunk), offset=offset)
+            continue
+        if not alive:
+            break
+        time.sleep(poll_interval)
+
+    emit_events()
+    for name in ('status', 'rc', 'daemon.log'):
+        emit_artifact(name)
+    emit(eof=True)
+
+
+def get_capacity():
+    '''
+    Returns the number of forks this isolated instance can run.
+    '''
+    # Duplicated with awx.main.utils.common.get_system_task_capacity
+    out = subprocess.check_output(['free', '-m'])
+    total_mem_value = out.split()[7]
+    if int(total_mem_value) <= 2048:
+        return 50
+    return 50 + ((int(total_mem_value) / 1024) - 2) * 75
+
+
+def cleanup_private_data_dirs():
+    '''
+    Removes the private data directories of jobs which are no longer running.
+
+    Returns the list of paths removed.
+    '''
+    paths_removed = []
+
+    # If a folder was last modified before this datetime, it will always be deleted
+    folder_cutoff = datetime.datetime.now() - datetime.timedelta(days=7)
+    # If a folder does not have an associated job running and is older than
+    # this datetime, then it will be deleted because its job has finished
+    job_cutoff = datetime.datetime.now() - datetime.timedelta(hours=1)
+
+    for search_pattern in [
+        '/tmp/ansible_awx_[0-9]*_*', '/tmp/ansible_awx_proot_*',
+    ]:
+        for path in glob.iglob(search_pattern):
+            modtime = datetime.datetime.fromtimestamp(os.stat(path).st_mtime)
+            if modtime > job_cutoff:
+                continue
+            elif modtime > folder_cutoff:
+                if re.match(r'\/tmp\/ansible_awx_\d+_.+', path) and is_alive(path):
+                    continue
+            shutil.rmtree(path)
+            paths_removed.append(path)
+    return paths_removed
+
+
+def heartbeat(version):
+    '''
+    Returns the status reported to the controlling instance by
+    `awx-expect heartbeat`, cleaning up after finished jobs on the way.
+    '''
+    try:
+        capacity = get_capacity()
+        paths_removed = cleanup_private_data_dirs()
+    except (subprocess.CalledProcessError, OSError, ValueError, IndexError) as e:
+        return {'msg': str(e)}
+    return {'capacity': capacity, 'version': version, 'paths_removed': paths_removed}
+
+
 def handle_termination(pid, args, proot_cmd, is_cancel=True):
     '''
     Terminate a subprocess spawned by `pexpect`.
@@ -272,10 +423,17 @@ if __name__ == '__main__':
     __version__ = awx.__version__
     parser = argparse.ArgumentParser(description='manage a daemonized, isolated ansible playbook')
     parser.add_argument('--version', action='version', version=__version__ + '-isolated')
-    parser.add_argument('command', choices=['start', 'stop', 'is-alive'])
-    parser.add_argument('private_data_dir')
+    parser.add_argument('command', choices=['start', 'stop', 'is-alive', 'stream', 'heartbeat'])
+    parser.add_argument('private_data_dir', nargs='?')
     args = parser.parse_args()
 
+    if args.command == 'heartbeat':
+        result = heartbeat(__version__ + '-isolated')
+        print(json.dumps(result))
+        sys.exit(0 if 'capacity' in result else 1)
+    elif args.private_data_dir is None:
+        parser.error('the {} command requires a private_data_dir'.format(args.command))
+
     private_data_dir = args.private_data_dir
     pidfile = os.path.join(private_data_dir, 'pid')
 
@@ -297,6 +455,10 @@ if __name__ == '__main__':
             __run__(private_data_dir)
         sys.exit(0)
 
+    if args.command == 'stream':
+        stream_artifacts(private_data_dir)
+        sys.exit(0)
+
     try:
         with open(pidfile, 'r') as f:
             pid = int(f.readline())
@@ -310,8 +472,4 @@ if __name__ == '__main__':
         except IOError:
             handle_termination(pid, [], 'bwrap')
     elif args.command == 'is-alive':
-        try:
-            os.kill(pid, signal.SIG_DFL)
-            sys.exit(0)
-        except OSError:
-            sys.exit(1)
+        sys.exit(0 if is_alive(private_data_dir) else 1)
@@ -43,7 +43,7 @@ from rest_framework import serializers
 # AWX
 from awx.main.utils.filters import SmartFilter
 from awx.main.validators import validate_ssh_private_key
-from awx.main.models.rbac import batch_role_ancestor_rebuilding, Role
+from awx.main.models.rbac import batch_role_ancestor_rebuilding, expire_accessible_ids, Role
 from awx.main import utils
 
 
@@ -343,6 +343,8 @@ class ImplicitRoleField(models.ForeignKey):
 
         Role_ = utils.get_current_apps().get_model('main', 'Role')
         child_ids = [x for x in Role_.parents.through.objects.filter(to_role_id__in=role_ids).distinct().values_list('from_role_id', flat=True)]
+        # The members of these roles lose whatever access they granted.
+        expire_accessible_ids(Role_.members.through.objects.filter(role_id__in=role_ids).values_list('user_id', flat=True))
         Role_.objects.filter(id__in=role_ids).delete()
         Role.rebuild_role_ancestor_list([], child_ids)
 
@@ -0,0 +1,46 @@
+# Copyright (c) 2017 Ansible, Inc.
+# All Rights Reserved
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from awx.main.models import Host, HostFactValue, HostFactPath
+from awx.main.utils.filters import get_indexed_fact_paths, expire_searchable_fact_paths
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the index of ansible_facts values used by smart inventory filters
+    """
+
+    help = (
+        'Rebuild the HostFactValue rows of every host from its ansible_facts. '
+        'Run this after changing AWX_INDEXED_ANSIBLE_FACTS; smart filters only '
+        'use the index for a path once this has completed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=500,
+                            help='Number of hosts to index per query')
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size') or 500
+        paths = get_indexed_fact_paths()
+        with transaction.atomic():
+            HostFactPath.objects.exclude(path__in=paths).delete()
+            HostFactValue.objects.exclude(path__in=paths).delete()
+        expire_searchable_fact_paths()
+        if not paths:
+            print('No ansible_facts paths are listed in AWX_INDEXED_ANSIBLE_FACTS')
+            return
+        host_pks = list(Host.objects.order_by('pk').values_list('pk', flat=True))
+        for offset in xrange(0, len(host_pks), batch_size):
+            with transaction.atomic():
+                hosts = Host.objects.filter(pk__in=host_pks[offset:(offset + batch_size)]).only('pk', 'ansible_facts')
+                HostFactValue.update_for_hosts(list(hosts))
+        # Facts saved since the hosts were listed were indexed as they were
+        # saved, so every host is covered now.
+        for path in paths:
+            HostFactPath.objects.get_or_create(path=path)
+        expire_searchable_fact_paths()
+        print('Indexed {} for {} hosts'.format(', '.join(sorted(paths)), len(host_pks)))
@@ -6,11 +6,15 @@ import json
 import logging
 import os
 import re
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
 import time
 import traceback
 import shutil
+from multiprocessing.pool import ThreadPool
 
 # Django
 from django.conf import settings
@@ -18,6 +22,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.core.exceptions import ImproperlyConfigured
 from django.db import connection, transaction
 from django.utils.encoding import smart_text
+from django.utils.timezone import now
 
 # AWX
 from awx.main.models import * # noqa
@@ -28,7 +33,13 @@ from awx.main.utils import (
     build_proot_temp_dir,
     get_licenser
 )
-from awx.main.utils.mem_inventory import MemInventory, dict_to_mem_data
+from awx.main.utils.db import bulk_update_fields
+from awx.main.utils.mem_inventory import (
+    MemInventory,
+    HostVars,
+    SpilledHostVars,
+    stream_to_mem_data
+)
 from awx.main.signals import disable_activity_stream
 
 logger = logging.getLogger('awx.main.commands.inventory_import')
@@ -69,7 +80,6 @@ class AnsibleInventoryLoader(object):
         self.source = source
         self.source_dir = functioning_dir(self.source)
         self.is_custom = is_custom
-        self.tmp_private_dir = None
         self.method = 'ansible-inventory'
         self.group_filter_re = group_filter_re
         self.host_filter_re = host_filter_re
@@ -115,7 +125,12 @@ class AnsibleInventoryLoader(object):
         return [abs_module_path, '-i', self.source]
 
     def get_proot_args(self, cmd, env):
+        '''
+        Return the proot-wrapped command and the temporary directory created
+        for it (None if none was), which the caller has to remove.
+        '''
         cwd = os.getcwd()
+        tmp_private_dir = None
         if not check_proot_installed():
             raise RuntimeError("proot is not installed but is configured for use")
 
@@ -132,29 +147,55 @@ class AnsibleInventoryLoader(object):
                 private_data_dir = functioning_dir(env['AWX_PRIVATE_DATA_DIR'])
                 logger.debug("Using private credential data in '{}'.".format(private_data_dir))
                 kwargs['private_data_dir'] = private_data_dir
-            self.tmp_private_dir = build_proot_temp_dir()
-            logger.debug("Using fresh temporary directory '{}' for isolation.".format(self.tmp_private_dir))
-            kwargs['proot_temp_dir'] = self.tmp_private_dir
+            tmp_private_dir = build_proot_temp_dir()
+            logger.debug("Using fresh temporary directory '{}' for isolation.".format(tmp_private_dir))
+            kwargs['proot_temp_dir'] = tmp_private_dir
             # Run from source's location so that custom script contents are in `show_paths`
             cwd = functioning_dir(self.source)
         logger.debug("Running from `{}` working directory.".format(cwd))
 
-        return wrap_args_with_proot(cmd, cwd, **kwargs)
+        return wrap_args_with_proot(cmd, cwd, **kwargs), tmp_private_dir
 
-    def command_to_json(self, cmd):
+    def command_to_json(self, cmd, timeout=None):
+        '''
+        Run the command and return its JSON output; the command is killed if
+        it runs for more than `timeout` seconds.
+        '''
         data = {}
         stdout, stderr = '', ''
         env = self.build_env()
+        tmp_private_dir = None
 
         if ((self.is_custom or 'AWX_PRIVATE_DATA_DIR' in env) and
                 getattr(settings, 'AWX_PROOT_ENABLED', False)):
-            cmd = self.get_proot_args(cmd, env)
-
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-        stdout, stderr = proc.communicate()
-
-        if self.tmp_private_dir:
-            shutil.rmtree(self.tmp_private_dir, True)
+            cmd, tmp_private_dir = self.get_proot_args(cmd, env)
+
+        # The command runs in its own process group, so that a timeout also
+        # kills the script run under proot/bwrap, not only the wrapper.
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+                                preexec_fn=os.setsid)
+        timed_out = threading.Event()
+
+        def kill():
+            if proc.poll() is None:
+                timed_out.set()
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+        timer = threading.Timer(timeout, kill) if timeout else None
+        if timer:
+            timer.start()
+        try:
+            stdout, stderr = proc.communicate()
+        finally:
+            if timer:
+                timer.cancel()
+
+        if tmp_private_dir:
+            shutil.rmtree(tmp_private_dir, True)
+        if timed_out.is_set():
+            raise RuntimeError('%s timed out after %s seconds' % (self.method, timeout))
         if proc.returncode != 0 or 'file not found' in stderr:
             raise RuntimeError('%s failed (rc=%d) with stdout:\n%s\nstderr:\n%s' % (
                 self.method, proc.returncode, stdout, stderr))
@@ -170,52 +211,103 @@ class AnsibleInventoryLoader(object):
             raise
         return data
 
+    def command_to_mem_data(self, cmd, inventory, hostvars):
+        '''
+        Like command_to_json, but add the JSON output of the command to
+        `inventory` as it is read (see stream_to_mem_data), so the output is
+        never held in memory as a whole.
+        '''
+        env = self.build_env()
+        tmp_private_dir = None
+
+        if ((self.is_custom or 'AWX_PRIVATE_DATA_DIR' in env) and
+                getattr(settings, 'AWX_PROOT_ENABLED', False)):
+            cmd, tmp_private_dir = self.get_proot_args(cmd, env)
+
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, env=env)
+            error = None
+            try:
+                stream_to_mem_data(proc.stdout, inventory=inventory, hostvars=hostvars)
+            except ValueError as e:
+                error = e
+            finally:
+                proc.stdout.close()
+                proc.wait()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+
+        if tmp_private_dir:
+            shutil.rmtree(tmp_private_dir, True)
+        if proc.returncode != 0 or 'file not found' in stderr:
+            raise RuntimeError('%s failed (rc=%d) with stderr:\n%s' % (
+                self.method, proc.returncode, stderr))
+
+        for line in stderr.splitlines():
+            logger.error(line)
+        if error is not None:
+            logger.error('Failed to load JSON output of %s', self.method)
+            raise error
+        return inventory
+
     def load(self):
         base_args = self.get_base_args()
         logger.info('Reading Ansible inventory source: %s', self.source)
 
-        data = self.command_to_json(base_args + ['--list'])
+        inventory = MemInventory(
+            group_filter_re=self.group_filter_re, host_filter_re=self.host_filter_re)
+        if getattr(settings, 'AWX_INVENTORY_IMPORT_SPILL_HOSTVARS', False):
+            hostvars = SpilledHostVars()
+        else:
+            hostvars = HostVars()
+        try:
+            self.command_to_mem_data(base_args + ['--list'], inventory, hostvars)
+        finally:
+            hostvars.close()
 
         # TODO: remove after we run custom scripts through ansible-inventory
-        if self.is_custom and '_meta' not in data or 'hostvars' not in data['_meta']:
-            # Invoke the executable once for each host name we've built up
-            # to set their variables
-            data.setdefault('_meta', {})
-            data['_meta'].setdefault('hostvars', {})
-            logger.warning('Re-calling script for hostvars individually.')
-            for group_name, group_data in data.iteritems():
-                if group_name == '_meta':
-                    continue
+        if self.is_custom and not hostvars.found:
+            self.load_hostvars(base_args, inventory)
 
-                if isinstance(group_data, dict):
-                    group_host_list = group_data.get('hosts', [])
-                elif isinstance(group_data, list):
-                    group_host_list = group_data
-                else:
-                    logger.warning('Group data for "%s" is not a dict or list',
-                                   group_name)
-                    group_host_list = []
-
-                for hostname in group_host_list:
-                    logger.debug('Obtaining hostvars for %s' % hostname.encode('utf-8'))
-                    hostdata = self.command_to_json(
-                        base_args + ['--host', hostname.encode("utf-8")]
-                    )
-                    if isinstance(hostdata, dict):
-                        data['_meta']['hostvars'][hostname] = hostdata
-                    else:
-                        logger.warning(
-                            'Expected dict of vars for host "%s" when '
-                            'calling with `--host`, got %s instead',
-                            k, str(type(data))
-                        )
+        return inventory
 
-        logger.info('Processing JSON output...')
-        inventory = MemInventory(
-            group_filter_re=self.group_filter_re, host_filter_re=self.host_filter_re)
-        inventory = dict_to_mem_data(data, inventory=inventory)
+    def load_hostvars(self, base_args, inventory):
+        '''
+        Invoke the executable once for each host name we've built up to set
+        their variables, running up to AWX_INVENTORY_HOSTVARS_CONCURRENCY
+        invocations at a time.
+        '''
+        logger.warning('Re-calling script for hostvars individually.')
+        all_hosts = inventory.all_group.all_hosts.items()
+        timeout = getattr(settings, 'AWX_INVENTORY_HOSTVARS_TIMEOUT', None)
+        concurrency = getattr(settings, 'AWX_INVENTORY_HOSTVARS_CONCURRENCY', 1)
+
+        def get_hostvars(item):
+            hostname, host = item
+            logger.debug('Obtaining hostvars for %s' % hostname.encode('utf-8'))
+            hostdata = self.command_to_json(
+                base_args + ['--host', hostname.encode("utf-8")],
+                timeout=timeout
+            )
+            return hostname, host, hostdata
 
-        return inventory
+        pool = ThreadPool(max(1, min(concurrency, len(all_hosts))))
+        try:
+            results = pool.imap_unordered(get_hostvars, all_hosts)
+            for count, (hostname, host, hostdata) in enumerate(results, 1):
+                if isinstance(hostdata, dict):
+                    host.variables.update(hostdata)
+                else:
+                    logger.warning(
+                        'Expected dict of vars for host "%s" when '
+                        'calling with `--host`, got %s instead',
+                        hostname, str(type(hostdata))
+                    )
+                if count % 100 == 0 or count == len(all_hosts):
+                    logger.info('Obtained hostvars for %d of %d hosts', count, len(all_hosts))
+        finally:
+            pool.terminate()
+            pool.join()
 
 
 def load_inventory_source(source, group_filter_re=None,
@@ -455,15 +547,11 @@ class Command(BaseCommand):
                 mem_host.instance_id = instance_id
                 self.mem_instance_id_map[instance_id] = mem_host.name
 
-    def _delete_hosts(self):
+    def _get_host_pks_to_delete(self):
         '''
-        For each host in the database that is NOT in the local list, delete
-        it. When importing from a cloud inventory source attached to a
-        specific group, only delete hosts beneath that group.  Delete each
-        host individually so signal handlers will run.
+        Return the sorted pks of the hosts from this inventory source that are
+        NOT in the local list.
         '''
-        if settings.SQL_DEBUG:
-            queries_before = len(connection.queries)
         hosts_qs = self.inventory_source.hosts
         # Build list of all host pks, remove all that should not be deleted.
         del_host_pks = set(hosts_qs.values_list('pk', flat=True))
@@ -483,8 +571,20 @@ class Command(BaseCommand):
             host_names = all_host_names[offset:(offset + self._batch_size)]
             for host_pk in hosts_qs.filter(name__in=host_names).values_list('pk', flat=True):
                 del_host_pks.discard(host_pk)
+        return sorted(list(del_host_pks))
+
+    def _delete_hosts(self):
+        '''
+        For each host in the database that is NOT in the local list, delete
+        it. When importing from a cloud inventory source attached to a
+        specific group, only delete hosts beneath that group.  Delete each
+        host individually so signal handlers will run.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        hosts_qs = self.inventory_source.hosts
         # Now delete all remaining hosts in batches.
-        all_del_pks = sorted(list(del_host_pks))
+        all_del_pks = self._get_host_pks_to_delete()
         for offset in xrange(0, len(all_del_pks), self._batch_size):
             del_pks = all_del_pks[offset:(offset + self._batch_size)]
             for host in hosts_qs.filter(pk__in=del_pks):
@@ -673,52 +773,58 @@ class Command(BaseCommand):
                            len(connection.queries) - queries_before,
                            len(self.all_group.all_groups))
 
-    def _update_db_host_from_mem_host(self, db_host, mem_host):
-        # Update host variables.
+    def _get_host_updates(self, db_host, mem_host):
+        '''
+        Return a dict of the fields (and new values) of db_host that need to
+        change to match the imported host.
+        '''
+        updates = {}
+        # Host variables.
         db_variables = db_host.variables_dict
         if self.overwrite_vars:
             db_variables = mem_host.variables
         else:
             db_variables.update(mem_host.variables)
-        update_fields = []
         if db_variables != db_host.variables_dict:
-            db_host.variables = json.dumps(db_variables)
-            update_fields.append('variables')
-        # Update host enabled flag.
+            updates['variables'] = json.dumps(db_variables)
+        # Host enabled flag.
         enabled = self._get_enabled(mem_host.variables)
         if enabled is not None and db_host.enabled != enabled:
-            db_host.enabled = enabled
-            update_fields.append('enabled')
-        # Update host name.
+            updates['enabled'] = enabled
+        # Host name.
         if mem_host.name != db_host.name:
-            old_name = db_host.name
-            db_host.name = mem_host.name
-            update_fields.append('name')
-        # Update host instance_id.
+            updates['name'] = mem_host.name
+        # Host instance_id.
         instance_id = self._get_instance_id(mem_host.variables)
         if instance_id != db_host.instance_id:
-            old_instance_id = db_host.instance_id
-            db_host.instance_id = instance_id
-            update_fields.append('instance_id')
+            updates['instance_id'] = instance_id
+        return updates
+
+    def _update_db_host_from_mem_host(self, db_host, mem_host):
+        old_name = db_host.name
+        old_instance_id = db_host.instance_id
+        updates = self._get_host_updates(db_host, mem_host)
         # Update host and display message(s) on what changed.
-        if update_fields:
-            db_host.save(update_fields=update_fields)
-        if 'name' in update_fields:
+        if updates:
+            for field, value in updates.items():
+                setattr(db_host, field, value)
+            db_host.save(update_fields=updates.keys())
+        if 'name' in updates:
             logger.info('Host renamed from "%s" to "%s"', old_name, mem_host.name)
-        if 'instance_id' in update_fields:
+        if 'instance_id' in updates:
             if old_instance_id:
                 logger.info('Host "%s" instance_id updated', mem_host.name)
             else:
                 logger.info('Host "%s" instance_id added', mem_host.name)
-        if 'variables' in update_fields:
+        if 'variables' in updates:
             if self.overwrite_vars:
                 logger.info('Host "%s" variables replaced', mem_host.name)
             else:
                 logger.info('Host "%s" variables updated', mem_host.name)
         else:
             logger.info('Host "%s" variables unmodified', mem_host.name)
-        if 'enabled' in update_fields:
-            if enabled:
+        if 'enabled' in updates:
+            if updates['enabled']:
                 logger.info('Host "%s" is now enabled', mem_host.name)
             else:
                 logger.info('Host "%s" is now disabled', mem_host.name)
@@ -871,6 +977,318 @@ class Command(BaseCommand):
             logger.warning('Group-host updates took %d queries for %d group-host relationships',
                            len(connection.queries) - queries_before, group_host_count)
 
+    def _bulk_add_to_inventory_source(self, through, field, pks):
+        '''
+        Associate the given host or group pks with the inventory source,
+        inserting only the missing rows of the through table.
+        '''
+        existing_pks = set(through.objects.filter(
+            inventorysource_id=self.inventory_source.pk).values_list(field, flat=True))
+        through.objects.bulk_create([
+            through(**{'inventorysource_id': self.inventory_source.pk, field: pk})
+            for pk in sorted(set(pks) - existing_pks)
+        ], batch_size=self._batch_size)
+
+    def _bulk_delete_hosts(self):
+        '''
+        Like _delete_hosts, but delete the hosts with one query per batch.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        all_del_pks = self._get_host_pks_to_delete()
+        for offset in xrange(0, len(all_del_pks), self._batch_size):
+            del_pks = all_del_pks[offset:(offset + self._batch_size)]
+            del_hosts_qs = Host.objects.filter(pk__in=del_pks)
+            self._changed_host_names.update(del_hosts_qs.values_list('name', flat=True))
+            del_hosts_qs.delete()
+        logger.info('%d hosts deleted', len(all_del_pks))
+        if settings.SQL_DEBUG:
+            logger.warning('host deletions took %d queries for %d hosts',
+                           len(connection.queries) - queries_before,
+                           len(all_del_pks))
+
+    def _bulk_delete_group_children_and_hosts(self):
+        '''
+        Like _delete_group_children_and_hosts, but diff the relationships of
+        all groups from this inventory source at once and delete the invalid
+        ones with one query per batch.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        db_group_pks = set(self.inventory_source.groups.values_list('pk', flat=True))
+        if self.inventory_source.deprecated_group_id in db_group_pks:  # TODO: remove in 3.3
+            logger.info(
+                'Group "%s" from v1 API child group/host connections preserved',
+                self.inventory_source.deprecated_group.name
+            )
+            db_group_pks.discard(self.inventory_source.deprecated_group_id)
+        group_names = dict(self.inventory.groups.values_list('pk', 'name'))
+        host_names = {}
+        host_pks_by_instance_id = {}
+        for host_pk, host_name, instance_id in self.inventory.hosts.values_list('pk', 'name', 'instance_id'):
+            host_names[host_pk] = host_name
+            host_pks_by_instance_id.setdefault(instance_id, set()).add(host_pk)
+        for instance_id, host_pk in self.db_instance_id_map.items():
+            host_pks_by_instance_id.setdefault(instance_id, set()).add(host_pk)
+
+        # Imported child group names, host names (of hosts without an
+        # instance_id) and host pks (of hosts with one) for each group.
+        mem_child_names = {}
+        mem_host_names = {}
+        mem_host_pks = {}
+        for group_pk in db_group_pks:
+            mem_group = self.all_group.all_groups[group_names[group_pk]]
+            mem_child_names[group_pk] = set(g.name for g in mem_group.children)
+            mem_host_names[group_pk] = set(h.name for h in mem_group.hosts if not h.instance_id)
+            mem_host_pks[group_pk] = set()
+            for mem_host in mem_group.hosts:
+                if mem_host.instance_id:
+                    mem_host_pks[group_pk].update(host_pks_by_instance_id.get(mem_host.instance_id, []))
+
+        # Delete child group relationships not present in imported data.
+        del_group_group_pks = []
+        all_db_group_pks = sorted(db_group_pks)
+        for offset in xrange(0, len(all_db_group_pks), self._batch_size):
+            group_pks = all_db_group_pks[offset:(offset + self._batch_size)]
+            group_parents_qs = Group.parents.through.objects.filter(to_group_id__in=group_pks)
+            for pk, child_pk, parent_pk in group_parents_qs.values_list('pk', 'from_group_id', 'to_group_id'):
+                if group_names.get(child_pk) not in mem_child_names[parent_pk]:
+                    del_group_group_pks.append(pk)
+        for offset in xrange(0, len(del_group_group_pks), self._batch_size):
+            del_pks = del_group_group_pks[offset:(offset + self._batch_size)]
+            Group.parents.through.objects.filter(pk__in=del_pks).delete()
+
+        # Delete group/host relationships not present in imported data.
+        del_group_host_pks = []
+        for offset in xrange(0, len(all_db_group_pks), self._batch_size):
+            group_pks = all_db_group_pks[offset:(offset + self._batch_size)]
+            group_hosts_qs = Group.hosts.through.objects.filter(group_id__in=group_pks)
+            for pk, group_pk, host_pk in group_hosts_qs.values_list('pk', 'group_id', 'host_id'):
+                if host_names.get(host_pk) in mem_host_names[group_pk]:
+                    continue
+                if host_pk in mem_host_pks[group_pk]:
+                    continue
+                del_group_host_pks.append(pk)
+        for offset in xrange(0, len(del_group_host_pks), self._batch_size):
+            del_pks = del_group_host_pks[offset:(offset + self._batch_size)]
+            Group.hosts.through.objects.filter(pk__in=del_pks).delete()
+
+        logger.info('%d child groups and %d hosts removed from groups',
+                    len(del_group_group_pks), len(del_group_host_pks))
+        if settings.SQL_DEBUG:
+            logger.warning('group-group and group-host deletions took %d queries for %d relationships',
+                           len(connection.queries) - queries_before,
+                           len(del_group_group_pks) + len(del_group_host_pks))
+
+    def _bulk_create_update_groups(self):
+        '''
+        Like _create_update_groups, but diff the imported groups against one
+        read of the inventory's groups and create/update them in bulk.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        db_groups = {}
+        for group in self.inventory.groups.only('pk', 'name', 'variables', 'variables_json'):
+            db_groups.setdefault(group.name, []).append(group)
+        modified = now()
+        updates = {}
+        new_groups = []
+        unmodified_count = 0
+        for group_name in sorted(self.all_group.all_groups.keys()):
+            mem_group = self.all_group.all_groups[group_name]
+            if group_name not in db_groups:
+                new_groups.append(Group(
+                    inventory=self.inventory,
+                    name=group_name,
+                    variables=json.dumps(mem_group.variables),
+                    description='imported',
+                    created=modified,
+                    modified=modified,
+                ))
+                continue
+            for group in db_groups[group_name]:
+                db_variables = group.variables_dict
+                if self.overwrite_vars:
+                    db_variables = mem_group.variables
+                else:
+                    db_variables.update(mem_group.variables)
+                if db_variables != group.variables_dict:
+                    updates[group.pk] = {'variables': json.dumps(db_variables), 'modified': modified}
+                else:
+                    unmodified_count += 1
+        bulk_update_fields(Group, updates, self._batch_size)
+        Group.objects.bulk_create(new_groups, batch_size=self._batch_size)
+        group_pks = self.inventory.groups.filter(
+            name__in=self.all_group.all_groups.keys()).values_list('pk', flat=True)
+        self._bulk_add_to_inventory_source(Group.inventory_sources.through, 'group_id', group_pks)
+        logger.info('%d groups added, %d groups variables %s, %d groups variables unmodified',
+                    len(new_groups), len(updates), 'replaced' if self.overwrite_vars else 'updated',
+                    unmodified_count)
+        if settings.SQL_DEBUG:
+            logger.warning('group updates took %d queries for %d groups',
+                           len(connection.queries) - queries_before,
+                           len(self.all_group.all_groups))
+
+    def _bulk_create_update_hosts(self):
+        '''
+        Like _create_update_hosts, but match the imported hosts to one read
+        of the inventory's hosts (by the pk found for their instance_id, then
+        by instance_id, then by name) and create/update them in bulk.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        db_hosts_by_pk = {}
+        db_hosts_by_instance_id = {}
+        db_hosts_by_name = {}
+        for db_host in self.inventory.hosts.only('pk', 'name', 'instance_id', 'variables', 'variables_json', 'enabled'):
+            db_hosts_by_pk[db_host.pk] = db_host
+            if db_host.instance_id:
+                db_hosts_by_instance_id.setdefault(db_host.instance_id, []).append(db_host)
+            db_hosts_by_name.setdefault(db_host.name, []).append(db_host)
+
+        mem_host_pk_map = {}
+        mem_host_instance_id_map = {}
+        for k,v in self.all_group.all_hosts.iteritems():
+            instance_id = self._get_instance_id(v.variables)
+            if instance_id in self.db_instance_id_map:
+                mem_host_pk_map[self.db_instance_id_map[instance_id]] = v
+            elif instance_id:
+                mem_host_instance_id_map[instance_id] = v
+
+        # Match existing hosts, in the same order of precedence as
+        # _create_update_hosts: a db host is only updated from one mem host.
+        matched_hosts = {}
+        for host_pk in sorted(mem_host_pk_map.keys()):
+            if host_pk in db_hosts_by_pk:
+                matched_hosts.setdefault(host_pk, mem_host_pk_map[host_pk])
+        for instance_id in sorted(mem_host_instance_id_map.keys()):
+            for db_host in db_hosts_by_instance_id.get(instance_id, []):
+                matched_hosts.setdefault(db_host.pk, mem_host_instance_id_map[instance_id])
+        for host_name in sorted(self.all_group.all_hosts.keys()):
+            for db_host in db_hosts_by_name.get(host_name, []):
+                matched_hosts.setdefault(db_host.pk, self.all_group.all_hosts[host_name])
+        mem_host_names_to_create = set(self.all_group.all_hosts.keys())
+        mem_host_names_to_create -= set(mem_host.name for mem_host in matched_hosts.values())
+
+        # Update existing hosts.
+        modified = now()
+        updates = {}
+        for host_pk, mem_host in matched_hosts.items():
+            host_updates = self._get_host_updates(db_hosts_by_pk[host_pk], mem_host)
+            if host_updates:
+                host_updates['modified'] = modified
+                updates[host_pk] = host_updates
+                self._changed_host_names.add(db_hosts_by_pk[host_pk].name)
+                self._changed_host_names.add(host_updates.get('name', db_hosts_by_pk[host_pk].name))
+        bulk_update_fields(Host, updates, self._batch_size)
+
+        # Create any new hosts.
+        new_hosts = []
+        for mem_host_name in sorted(mem_host_names_to_create):
+            mem_host = self.all_group.all_hosts[mem_host_name]
+            db_host = Host(inventory=self.inventory,
+                           name=mem_host_name,
+                           variables=json.dumps(mem_host.variables),
+                           description='imported',
+                           created=modified,
+                           modified=modified)
+            enabled = self._get_enabled(mem_host.variables)
+            if enabled is not None:
+                db_host.enabled = enabled
+            if self.instance_id_var:
+                db_host.instance_id = self._get_instance_id(mem_host.variables)
+            new_hosts.append(db_host)
+        Host.objects.bulk_create(new_hosts, batch_size=self._batch_size)
+
+        host_pks = set(matched_hosts.keys())
+        all_new_host_names = sorted(mem_host_names_to_create)
+        for offset in xrange(0, len(all_new_host_names), self._batch_size):
+            host_names = all_new_host_names[offset:(offset + self._batch_size)]
+            host_pks.update(self.inventory.hosts.filter(name__in=host_names).values_list('pk', flat=True))
+        self._bulk_add_to_inventory_source(Host.inventory_sources.through, 'host_id', host_pks)
+        self._changed_host_names.update(mem_host_names_to_create)
+
+        def count_updates(field, value=None):
+            return len([u for u in updates.values() if field in u and (value is None or u[field] == value)])
+        logger.info('%d hosts added (%d disabled), %d hosts updated, %d hosts unmodified',
+                    len(new_hosts), len([h for h in new_hosts if h.enabled is False]),
+                    len(updates), len(matched_hosts) - len(updates))
+        logger.info('%d hosts renamed, %d hosts instance_id changed, %d hosts variables %s, '
+                    '%d hosts enabled, %d hosts disabled',
+                    count_updates('name'), count_updates('instance_id'), count_updates('variables'),
+                    'replaced' if self.overwrite_vars else 'updated',
+                    count_updates('enabled', True), count_updates('enabled', False))
+        if settings.SQL_DEBUG:
+            logger.warning('host updates took %d queries for %d hosts',
+                           len(connection.queries) - queries_before,
+                           len(self.all_group.all_hosts))
+
+    def _bulk_create_update_group_children(self):
+        '''
+        Like _create_update_group_children, but insert all missing parent-child
+        group relationships in bulk.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        db_group_pks = {}
+        for group_pk, group_name in self.inventory.groups.values_list('pk', 'name'):
+            db_group_pks.setdefault(group_name, []).append(group_pk)
+        group_parents_qs = Group.parents.through.objects.filter(from_group__inventory_id=self.inventory.pk)
+        existing = set(group_parents_qs.values_list('from_group_id', 'to_group_id'))
+        new_relationships = set()
+        for mem_group in self.all_group.all_groups.values():
+            for parent_pk in db_group_pks.get(mem_group.name, []):
+                for mem_child in mem_group.children:
+                    for child_pk in db_group_pks.get(mem_child.name, []):
+                        if (child_pk, parent_pk) not in existing:
+                            new_relationships.add((child_pk, parent_pk))
+        Group.parents.through.objects.bulk_create([
+            Group.parents.through(from_group_id=child_pk, to_group_id=parent_pk)
+            for child_pk, parent_pk in sorted(new_relationships)
+        ], batch_size=self._batch_size)
+        logger.info('%d child groups added to groups', len(new_relationships))
+        if settings.SQL_DEBUG:
+            logger.warning('Group-group updates took %d queries for %d group-group relationships',
+                           len(connection.queries) - queries_before, len(new_relationships))
+
+    def _bulk_create_update_group_hosts(self):
+        '''
+        Like _create_update_group_hosts, but insert all missing group-host
+        relationships in bulk.
+        '''
+        if settings.SQL_DEBUG:
+            queries_before = len(connection.queries)
+        db_group_pks = {}
+        for group_pk, group_name in self.inventory.groups.values_list('pk', 'name'):
+            db_group_pks.setdefault(group_name, []).append(group_pk)
+        db_host_pks_by_name = {}
+        db_host_pks_by_instance_id = {}
+        for host_pk, host_name, instance_id in self.inventory.hosts.values_list('pk', 'name', 'instance_id'):
+            db_host_pks_by_name.setdefault(host_name, []).append(host_pk)
+            if instance_id:
+                db_host_pks_by_instance_id.setdefault(instance_id, []).append(host_pk)
+        group_hosts_qs = Group.hosts.through.objects.filter(group__inventory_id=self.inventory.pk)
+        existing = set(group_hosts_qs.values_list('group_id', 'host_id'))
+        new_relationships = set()
+        for mem_group in self.all_group.all_groups.values():
+            for group_pk in db_group_pks.get(mem_group.name, []):
+                for mem_host in mem_group.hosts:
+                    if mem_host.instance_id:
+                        host_pks = db_host_pks_by_instance_id.get(mem_host.instance_id, [])
+                    else:
+                        host_pks = db_host_pks_by_name.get(mem_host.name, [])
+                    for host_pk in host_pks:
+                        if (group_pk, host_pk) not in existing:
+                            new_relationships.add((group_pk, host_pk))
+        Group.hosts.through.objects.bulk_create([
+            Group.hosts.through(group_id=group_pk, host_id=host_pk)
+            for group_pk, host_pk in sorted(new_relationships)
+        ], batch_size=self._batch_size)
+        logger.info('%d hosts added to groups', len(new_relationships))
+        if settings.SQL_DEBUG:
+            logger.warning('Group-host updates took %d queries for %d group-host relationships',
+                           len(connection.queries) - queries_before, len(new_relationships))
+
     def load_into_database(self):
         '''
         Load inventory from in-memory groups to the database, overwriting or
@@ -891,6 +1309,34 @@ class Command(BaseCommand):
         self._create_update_group_children()
         self._create_update_group_hosts()
 
+    def bulk_load_into_database(self):
+        '''
+        Same as load_into_database, but diff the in-memory inventory against
+        the database as sets and apply the changes with bulk queries instead
+        of saving each host, group and relationship.  Bulk queries do not send
+        save or m2m_changed signals, so this is only used when the activity
+        stream is disabled for inventory syncs.
+        '''
+        self._batch_size = 500
+        self._changed_host_names = set()
+        self._build_db_instance_id_map()
+        self._build_mem_instance_id_map()
+        if self.overwrite:
+            self._bulk_delete_hosts()
+            self._delete_groups()
+            self._bulk_delete_group_children_and_hosts()
+        self._update_inventory()
+        self._bulk_create_update_groups()
+        self._bulk_create_update_hosts()
+        self._bulk_create_update_group_children()
+        self._bulk_create_update_group_hosts()
+        # Nor the signals that maintain the group closure, so rebuild it.
+        self.inventory.rebuild_group_closure()
+        if self._changed_host_names:
+            # Host.save() and Host.delete() would each have requested this.
+            from awx.main.tasks import schedule_update_host_smart_inventory_memberships
+            schedule_update_host_smart_inventory_memberships(host_names=self._changed_host_names)
+
     def check_license(self):
         license_info = get_licenser().validate()
         if license_info.get('license_key', 'UNLICENSED') == 'UNLICENSED':
@@ -1011,11 +1457,12 @@ class Command(BaseCommand):
                     if settings.SQL_DEBUG:
                         logger.warning('loading into database...')
                     with ignore_inventory_computed_fields():
-                        if getattr(settings, 'ACTIVITY_STREAM_ENABLED_FOR_INVENTORY_SYNC', True):
-                            self.load_into_database()
-                        else:
-                            with disable_activity_stream():
+                        with batch_group_closure_rebuilding():
+                            if getattr(settings, 'ACTIVITY_STREAM_ENABLED_FOR_INVENTORY_SYNC', True):
                                 self.load_into_database()
+                            else:
+                                with disable_activity_stream():
+                                    self.bulk_load_into_database()
                         if settings.SQL_DEBUG:
                             queries_before2 = len(connection.queries)
                         self.inventory.update_computed_fields()
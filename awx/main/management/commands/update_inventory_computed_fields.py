@@ -0,0 +1,37 @@
+# Copyright (c) 2017 Ansible, Inc.
+# All Rights Reserved
+
+from django.core.management.base import BaseCommand, CommandError
+
+from awx.main.models import Inventory
+from awx.main.utils import ignore_inventory_computed_fields
+
+
+class Command(BaseCommand):
+    """
+    Recompute all inventory computed fields from scratch
+    """
+
+    help = (
+        'Recompute the computed fields of every host and group in an inventory. '
+        'Specify `--inventory-id` or `--all` to use this command.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inventory-id', dest='inventory_id', type=int,
+                            help='Inventory to recompute')
+        parser.add_argument('--all', dest='all', action='store_true', default=False,
+                            help='Recompute every inventory')
+
+    def handle(self, *args, **options):
+        if bool(options.get('inventory_id')) == bool(options.get('all')):
+            raise CommandError('Specify exactly one of --inventory-id or --all.')
+        inventories = Inventory.objects.all()
+        if options.get('inventory_id'):
+            inventories = inventories.filter(pk=options['inventory_id'])
+            if not inventories.exists():
+                raise CommandError('No inventory found with id {}'.format(options['inventory_id']))
+        with ignore_inventory_computed_fields():
+            for inventory in inventories.order_by('pk').iterator():
+                inventory.update_computed_fields()
+                print('Updated computed fields of inventory {} ({})'.format(inventory.pk, inventory.name))
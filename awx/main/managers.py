@@ -40,9 +40,6 @@ class HostManager(models.Manager):
            hasattr(self.instance, 'host_filter') and
            hasattr(self.instance, 'kind')):
             if self.instance.kind == 'smart' and self.instance.host_filter is not None:
-                    q = SmartFilter.query_from_string(self.instance.host_filter)
-                    if self.instance.organization_id:
-                        q = q.filter(inventory__organization=self.instance.organization_id)
                     # If we are using host_filters, disable the core_filters, this allows
                     # us to access all of the available Host entries, not just the ones associated
                     # with a specific FK/relation.
@@ -51,6 +48,13 @@ class HostManager(models.Manager):
                     # injected by the related object mapper.
                     self.core_filters = {}
 
+                    if (settings.AWX_SMART_INVENTORY_MATERIALIZED_HOSTS and
+                            settings.AWX_REBUILD_SMART_MEMBERSHIP):
+                        # Serve the hosts recorded by update_host_smart_inventory_memberships
+                        # instead of running the filter; the memberships are only kept
+                        # up to date while AWX_REBUILD_SMART_MEMBERSHIP is enabled.
+                        return qs.filter(smart_inventories=self.instance.pk)
+                    q = SmartFilter.compiled_query(self.instance.host_filter, self.instance.organization_id)
                     qs = qs & q
                     unique_by_name = qs.order_by('name', 'pk').distinct('name')
                     return qs.filter(pk__in=unique_by_name)
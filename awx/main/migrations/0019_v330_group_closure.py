@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from awx.main.migrations import _group_closure as group_closure
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_add_additional_stdout_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAncestry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Group')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Group')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Inventory')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupHostMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Group')),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Host')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Inventory')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupancestry',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='groupancestry',
+            index_together=set([('descendant', 'ancestor')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='grouphostmembership',
+            unique_together=set([('group', 'host')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='grouphostmembership',
+            index_together=set([('host', 'group')]),
+        ),
+        migrations.RunPython(group_closure.build_group_closure, migrations.RunPython.noop),
+    ]
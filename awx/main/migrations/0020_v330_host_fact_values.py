@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_v330_group_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostFactValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=512)),
+                ('value', models.CharField(max_length=1024)),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Host')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='hostfactvalue',
+            index_together=set([('path', 'value')]),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_v330_host_fact_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HostAddress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=1024)),
+                ('is_name', models.BooleanField(default=False)),
+                ('resolved', models.DateTimeField(default=None, null=True)),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Host')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.Inventory')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='hostaddress',
+            index_together=set([('inventory', 'address')]),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from awx.main.migrations import _variables_json as variables_json
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_v330_host_addresses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='variables_json',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='host',
+            name='variables_json',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='variables_json',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(variables_json.store_variables_json, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_v330_variables_json'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='jobevent',
+            index_together=set([('job', 'event'), ('job', 'parent_uuid'), ('job', 'start_line'), ('job', 'uuid'), ('job', 'end_line'), ('job', 'counter')]),
+        ),
+    ]
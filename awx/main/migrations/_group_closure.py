@@ -0,0 +1,56 @@
+import logging
+
+logger = logging.getLogger('awx.main.migrations')
+
+
+def _get_group_depths(group_pk, group_parents_map):
+    group_depths = {}
+    pks_to_check = [group_pk]
+    depth = 0
+    while pks_to_check:
+        depth += 1
+        next_pks_to_check = []
+        for pk in pks_to_check:
+            for parent_pk in group_parents_map.get(pk, ()):
+                if parent_pk not in group_depths:
+                    group_depths[parent_pk] = depth
+                    next_pks_to_check.append(parent_pk)
+        pks_to_check = next_pks_to_check
+    return group_depths
+
+
+def build_group_closure(apps, schema_editor):
+    '''Populate the GroupAncestry and GroupHostMembership tables for existing
+    inventories, which are then maintained as group parents and hosts change.
+    '''
+    Inventory = apps.get_model('main', 'Inventory')
+    Group = apps.get_model('main', 'Group')
+    GroupAncestry = apps.get_model('main', 'GroupAncestry')
+    GroupHostMembership = apps.get_model('main', 'GroupHostMembership')
+    for inventory_pk in Inventory.objects.values_list('pk', flat=True).iterator():
+        group_parents_map = {}
+        group_parents_qs = Group.parents.through.objects.filter(from_group__inventory_id=inventory_pk,
+                                                                to_group__inventory_id=inventory_pk)
+        for from_group_id, to_group_id in group_parents_qs.values_list('from_group_id', 'to_group_id'):
+            group_parents_map.setdefault(from_group_id, set()).add(to_group_id)
+        group_hosts_map = {}
+        group_hosts_qs = Group.hosts.through.objects.filter(group__inventory_id=inventory_pk,
+                                                            host__inventory_id=inventory_pk)
+        for group_id, host_id in group_hosts_qs.values_list('group_id', 'host_id'):
+            group_hosts_map.setdefault(group_id, set()).add(host_id)
+        ancestry = []
+        memberships = set()
+        for group_pk in Group.objects.filter(inventory_id=inventory_pk).values_list('pk', flat=True):
+            host_pks = group_hosts_map.get(group_pk, set())
+            memberships.update((group_pk, host_pk) for host_pk in host_pks)
+            for ancestor_pk, depth in _get_group_depths(group_pk, group_parents_map).items():
+                ancestry.append(GroupAncestry(inventory_id=inventory_pk, ancestor_id=ancestor_pk,
+                                              descendant_id=group_pk, depth=depth))
+                memberships.update((ancestor_pk, host_pk) for host_pk in host_pks)
+        GroupAncestry.objects.bulk_create(ancestry, batch_size=500)
+        GroupHostMembership.objects.bulk_create([
+            GroupHostMembership(inventory_id=inventory_pk, group_id=group_pk, host_id=host_pk)
+            for group_pk, host_pk in memberships
+        ], batch_size=500)
+        logger.debug('Built group closure for inventory %d: %d ancestry rows, %d host memberships',
+                     inventory_pk, len(ancestry), len(memberships))
@@ -0,0 +1,14 @@
+from awx.main.models.base import VarsDictProperty
+
+
+def store_variables_json(apps, schema_editor):
+    '''Store the JSON text of the variables of existing inventories, hosts and
+    groups given as YAML; variables already stored as JSON need nothing.
+    '''
+    for model_name in ('Inventory', 'Host', 'Group'):
+        model = apps.get_model('main', model_name)
+        yaml_qs = model.objects.exclude(variables__startswith='{').exclude(variables__in=('', '---'))
+        for pk, variables in yaml_qs.values_list('pk', 'variables').iterator():
+            variables_json = VarsDictProperty.get_json_field_value(variables)
+            if variables_json:
+                model.objects.filter(pk=pk).update(variables_json=variables_json)
@@ -1,6 +1,10 @@
 # Copyright (c) 2015 Ansible, Inc.
 # All Rights Reserved.
 
+# Python
+import hashlib
+import json
+
 # Django
 from django.db import models
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
@@ -16,7 +20,7 @@ from crum import get_current_user
 # AWX
 from awx.main.utils import encrypt_field, parse_yaml_or_json
 
-__all__ = ['prevent_search', 'VarsDictProperty', 'BaseModel', 'CreatedModifiedModel',
+__all__ = ['prevent_search', 'vars_to_json', 'VarsDictProperty', 'BaseModel', 'CreatedModifiedModel',
            'PasswordFieldsModel', 'PrimordialModel', 'CommonModel',
            'CommonModelNameNotUnique', 'NotificationFieldsModel',
            'PERM_INVENTORY_DEPLOY', 'PERM_INVENTORY_SCAN',
@@ -62,14 +66,48 @@ VERBOSITY_CHOICES = [
 ]
 
 
+def vars_to_json(vars_str):
+    '''
+    Return a string of variables in YAML or JSON as the JSON text of the
+    dictionary they parse to: the string itself when it already is that, or
+    None if the variables cannot be represented as JSON (e.g. YAML dates or
+    integer keys).
+    '''
+    try:
+        if isinstance(json.loads(vars_str), dict):
+            return vars_str
+    except ValueError:
+        pass
+    vars_dict = parse_yaml_or_json(vars_str.encode('utf-8'))
+    try:
+        vars_json = json.dumps(vars_dict)
+    except (TypeError, ValueError):
+        return None
+    if json.loads(vars_json) != vars_dict:
+        return None
+    return vars_json
+
+
+def _vars_digest(vars_str):
+    return hashlib.md5(vars_str.encode('utf-8')).hexdigest()
+
+
 class VarsDictProperty(object):
     '''
     Retrieve a string of variables in YAML or JSON as a dictionary.
+
+    The variables are parsed once per instance (until the string changes) to
+    JSON text, which each access loads into a new dictionary, so YAML is not
+    parsed again.  If json_field is given, it names a field storing that JSON
+    text for variables given as YAML (see ParsedVariablesMixin), which is used
+    instead of parsing them at all.
     '''
 
-    def __init__(self, field='variables', key_value=False):
+    def __init__(self, field='variables', key_value=False, json_field=None):
         self.field = field
         self.key_value = key_value
+        self.json_field = json_field
+        self.cache_attr = '_%s_json_cache' % field
 
     def __get__(self, obj, type=None):
         if obj is None:
@@ -77,12 +115,44 @@ class VarsDictProperty(object):
         v = getattr(obj, self.field)
         if hasattr(v, 'items'):
             return v
-        v = v.encode('utf-8')
-        return parse_yaml_or_json(v)
+        cached = obj.__dict__.get(self.cache_attr)
+        if cached is None or not (cached[0] is v or cached[0] == v):
+            cached = (v, self._get_json(obj, v))
+            obj.__dict__[self.cache_attr] = cached
+        if cached[1] is None:
+            return parse_yaml_or_json(v.encode('utf-8'))
+        return json.loads(cached[1])
 
     def __set__(self, obj, value):
         raise AttributeError('readonly property')
 
+    def _get_json(self, obj, v):
+        # Only use the stored JSON if it is loaded already (not deferred) and
+        # was stored for the current variables.
+        stored = obj.__dict__.get(self.json_field) if self.json_field else None
+        if stored:
+            digest, _, stored_json = stored.partition(':')
+            if digest == _vars_digest(v):
+                return stored_json
+        return vars_to_json(v)
+
+    @staticmethod
+    def get_json_field_value(vars_str, stored=''):
+        '''
+        Return the value to store in a json_field for a string of variables:
+        their digest and JSON text if they are YAML, or an empty string if
+        they are JSON already (or cannot be represented as JSON).  The stored
+        value is returned as is if it is still current.
+        '''
+        if not isinstance(vars_str, basestring):
+            return ''
+        if stored and stored.partition(':')[0] == _vars_digest(vars_str):
+            return stored
+        vars_json = vars_to_json(vars_str)
+        if vars_json is None or vars_json is vars_str:
+            return ''
+        return '%s:%s' % (_vars_digest(vars_str), vars_json)
+
 
 class BaseModel(models.Model):
     '''
@@ -358,7 +358,9 @@ class BasePlaybookEvent(CreatedModifiedModel):
 
                 hostnames = self._hostnames()
                 self._update_host_summary_from_stats(hostnames)
-                self.job.inventory.update_computed_fields()
+                # Only the hosts in this play recap can have changed.
+                host_ids = self.job.inventory.hosts.filter(name__in=hostnames).values_list('id', flat=True)
+                self.job.inventory.update_computed_fields(host_ids=list(host_ids), group_ids=[])
 
 
 
@@ -378,6 +380,7 @@ class JobEvent(BasePlaybookEvent):
             ('job', 'start_line'),
             ('job', 'end_line'),
             ('job', 'parent_uuid'),
+            ('job', 'counter'),
         ]
 
     job = models.ForeignKey(
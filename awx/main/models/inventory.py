@@ -3,20 +3,25 @@
 
 # Python
 import datetime
+import hashlib
+import itertools
+import json
 import logging
 import re
 import copy
+import contextlib
 from urlparse import urljoin
 import os.path
 
 # Django
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models, connection
 from django.utils.translation import ugettext_lazy as _
 from django.db import transaction
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now
-from django.db.models import Q
+from django.db.models import Q, Count, Max
 
 # AWX
 from awx.api.versioning import reverse
@@ -31,20 +36,79 @@ from awx.main.managers import HostManager
 from awx.main.models.base import * # noqa
 from awx.main.models.events import InventoryUpdateEvent
 from awx.main.models.unified_jobs import * # noqa
-from awx.main.models.mixins import ResourceMixin, TaskManagerInventoryUpdateMixin
+from awx.main.models.mixins import ResourceMixin, ParsedVariablesMixin, TaskManagerInventoryUpdateMixin
 from awx.main.models.notifications import (
     NotificationTemplate,
     JobNotificationMixin,
 )
 from awx.main.utils import _inventory_updates
+from awx.main.utils.db import bulk_delete, bulk_update_fields
+from awx.main.utils.filters import (
+    FACT_VALUE_MAX_LENGTH,
+    SmartFilter,
+    get_fact_path_values,
+    get_indexed_fact_paths,
+)
+from awx.main.utils.resolver import resolve_host_names
 
 __all__ = ['Inventory', 'Host', 'Group', 'InventorySource', 'InventoryUpdate',
-           'CustomInventoryScript', 'SmartInventoryMembership']
+           'CustomInventoryScript', 'SmartInventoryMembership', 'GroupAncestry',
+           'GroupHostMembership', 'HostFactValue', 'HostFactPath', 'HostAddress',
+           'batch_group_closure_rebuilding']
 
 logger = logging.getLogger('awx.main.models.inventory')
 
 
-class Inventory(CommonModelNameNotUnique, ResourceMixin):
+def _chunks(items, size=500):
+    items = list(items)
+    for offset in xrange(0, len(items), size):
+        yield items[offset:(offset + size)]
+
+
+def _get_group_depths(group_pk, group_edges_map):
+    '''
+    Return a dictionary mapping each group reachable from the given group in
+    group_edges_map (a parents or children map) to the length of the shortest
+    path to it.  The group itself is only included if it is part of a cycle.
+    '''
+    group_depths = {}
+    pks_to_check = [group_pk]
+    depth = 0
+    while pks_to_check:
+        depth += 1
+        next_pks_to_check = []
+        for pk in pks_to_check:
+            for other_pk in group_edges_map.get(pk, ()):
+                if other_pk not in group_depths:
+                    group_depths[other_pk] = depth
+                    next_pks_to_check.append(other_pk)
+        pks_to_check = next_pks_to_check
+    return group_depths
+
+
+@contextlib.contextmanager
+def batch_group_closure_rebuilding():
+    '''
+    Defer the GroupAncestry and GroupHostMembership maintenance done whenever
+    group-group or group-host relations change, and rebuild the closure of
+    each affected inventory once on exit instead.  Used for bulk changes, like
+    inventory imports, that would otherwise update it one relation at a time.
+    '''
+    batch_inventory_pks = getattr(_inventory_updates, 'batch_group_closure', None)
+    try:
+        if batch_inventory_pks is None:
+            _inventory_updates.batch_group_closure = set()
+        yield
+        if batch_inventory_pks is None:
+            inventory_pks = _inventory_updates.batch_group_closure
+            _inventory_updates.batch_group_closure = None
+            for inventory in Inventory.objects.filter(pk__in=inventory_pks):
+                inventory.rebuild_group_closure()
+    finally:
+        _inventory_updates.batch_group_closure = batch_inventory_pks
+
+
+class Inventory(CommonModelNameNotUnique, ResourceMixin, ParsedVariablesMixin):
     '''
     an inventory source contains lists and hosts.
     '''
@@ -166,7 +230,7 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
     def get_absolute_url(self, request=None):
         return reverse('api:inventory_detail', kwargs={'pk': self.pk}, request=request)
 
-    variables_dict = VarsDictProperty('variables')
+    variables_dict = VarsDictProperty('variables', json_field='variables_json')
 
     def get_group_hosts_map(self):
         '''
@@ -210,6 +274,236 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
             group_children.add(from_group_id)
         return group_children_map
 
+    def _defer_group_closure(self):
+        batch_inventory_pks = getattr(_inventory_updates, 'batch_group_closure', None)
+        if batch_inventory_pks is None:
+            return False
+        batch_inventory_pks.add(self.pk)
+        return True
+
+    def _sync_group_ancestry(self, group_ancestry, existing):
+        '''
+        Given the {(ancestor_id, descendant_id): depth} rows that should exist
+        and the {(ancestor_id, descendant_id): (pk, depth)} rows that do, write
+        only the difference.
+        '''
+        stale_pks = [pk for key, (pk, depth) in existing.items() if key not in group_ancestry]
+        for chunk in _chunks(stale_pks):
+            GroupAncestry.objects.filter(pk__in=chunk).delete()
+        bulk_update_fields(GroupAncestry, dict(
+            (pk, {'depth': group_ancestry[key]}) for key, (pk, depth) in existing.items()
+            if key in group_ancestry and group_ancestry[key] != depth
+        ))
+        GroupAncestry.objects.bulk_create([
+            GroupAncestry(inventory_id=self.pk, ancestor_id=ancestor_pk, descendant_id=descendant_pk, depth=depth)
+            for (ancestor_pk, descendant_pk), depth in group_ancestry.items() if (ancestor_pk, descendant_pk) not in existing
+        ], batch_size=500)
+
+    def _sync_group_host_memberships(self, memberships, existing):
+        '''
+        Given the (group_id, host_id) rows that should exist and the
+        {(group_id, host_id): pk} rows that do, write only the difference.
+        '''
+        stale_pks = [pk for key, pk in existing.items() if key not in memberships]
+        for chunk in _chunks(stale_pks):
+            GroupHostMembership.objects.filter(pk__in=chunk).delete()
+        GroupHostMembership.objects.bulk_create([
+            GroupHostMembership(inventory_id=self.pk, group_id=group_pk, host_id=host_pk)
+            for group_pk, host_pk in memberships if (group_pk, host_pk) not in existing
+        ], batch_size=500)
+
+    def rebuild_group_closure(self):
+        '''
+        Rebuild the GroupAncestry and GroupHostMembership rows of this
+        inventory from its group parents and group hosts.
+        '''
+        if self._defer_group_closure():
+            return
+        group_parents_map = self.get_group_parents_map()
+        group_hosts_map = self.get_group_hosts_map()
+        group_ancestry = {}
+        memberships = set()
+        for group_pk in self.groups.values_list('pk', flat=True):
+            host_pks = group_hosts_map.get(group_pk, set())
+            memberships.update((group_pk, host_pk) for host_pk in host_pks)
+            for ancestor_pk, depth in _get_group_depths(group_pk, group_parents_map).items():
+                group_ancestry[(ancestor_pk, group_pk)] = depth
+                memberships.update((ancestor_pk, host_pk) for host_pk in host_pks)
+        ancestry_qs = GroupAncestry.objects.filter(inventory_id=self.pk)
+        self._sync_group_ancestry(group_ancestry, dict(
+            ((ancestor_pk, descendant_pk), (pk, depth)) for pk, ancestor_pk, descendant_pk, depth in
+            ancestry_qs.values_list('pk', 'ancestor_id', 'descendant_id', 'depth').iterator()
+        ))
+        memberships_qs = GroupHostMembership.objects.filter(inventory_id=self.pk)
+        self._sync_group_host_memberships(memberships, dict(
+            ((group_pk, host_pk), pk) for pk, group_pk, host_pk in
+            memberships_qs.values_list('pk', 'group_id', 'host_id').iterator()
+        ))
+
+    def update_group_ancestry(self, group_pks, stale_ancestor_pks=()):
+        '''
+        Update the GroupAncestry rows of the given groups and their
+        descendants after the parents of the given groups changed, then the
+        GroupHostMembership rows of their previous and current ancestors.
+        Ancestors of a deleted group that may have lost hosts can be passed
+        as stale_ancestor_pks.
+        '''
+        if self._defer_group_closure():
+            return
+        group_pks = set(group_pks)
+        # Only the given groups and their descendants can have gained or lost
+        # ancestors; a new parent doesn't give a group new descendants other
+        # than itself, in the case of a cycle.
+        descendant_pks = set(group_pks)
+        old_ancestor_pks = set(stale_ancestor_pks)
+        existing = {}
+        for chunk in _chunks(group_pks):
+            descendant_pks.update(GroupAncestry.objects.filter(
+                ancestor_id__in=chunk).values_list('descendant_id', flat=True))
+            old_ancestor_pks.update(GroupAncestry.objects.filter(
+                descendant_id__in=chunk).values_list('ancestor_id', flat=True))
+        for chunk in _chunks(descendant_pks):
+            ancestry_qs = GroupAncestry.objects.filter(descendant_id__in=chunk)
+            for pk, ancestor_pk, descendant_pk, depth in ancestry_qs.values_list('pk', 'ancestor_id', 'descendant_id', 'depth'):
+                existing[(ancestor_pk, descendant_pk)] = (pk, depth)
+        group_parents_map = {}
+        checked_pks = set()
+        pks_to_check = set(descendant_pks)
+        while pks_to_check:
+            checked_pks.update(pks_to_check)
+            parent_pks = set()
+            for chunk in _chunks(pks_to_check):
+                group_parents_qs = Group.parents.through.objects.filter(
+                    from_group_id__in=chunk, to_group__inventory_id=self.pk)
+                for from_group_id, to_group_id in group_parents_qs.values_list('from_group_id', 'to_group_id'):
+                    group_parents_map.setdefault(from_group_id, set()).add(to_group_id)
+                    parent_pks.add(to_group_id)
+            pks_to_check = parent_pks - checked_pks
+        group_ancestry = {}
+        new_ancestor_pks = set()
+        for descendant_pk in descendant_pks:
+            for ancestor_pk, depth in _get_group_depths(descendant_pk, group_parents_map).items():
+                group_ancestry[(ancestor_pk, descendant_pk)] = depth
+                if descendant_pk in group_pks:
+                    new_ancestor_pks.add(ancestor_pk)
+        self._sync_group_ancestry(group_ancestry, existing)
+        self.update_group_host_memberships(old_ancestor_pks | new_ancestor_pks)
+
+    def update_group_host_memberships(self, group_pks, host_pks=None):
+        '''
+        Update the GroupHostMembership rows of the given groups (only for the
+        given hosts, if any) from the GroupAncestry rows and group hosts.
+        '''
+        if self._defer_group_closure():
+            return
+        group_descendants_map = dict((group_pk, set([group_pk])) for group_pk in group_pks)
+        for chunk in _chunks(group_descendants_map):
+            ancestry_qs = GroupAncestry.objects.filter(ancestor_id__in=chunk)
+            for ancestor_pk, descendant_pk in ancestry_qs.values_list('ancestor_id', 'descendant_id'):
+                group_descendants_map[ancestor_pk].add(descendant_pk)
+        group_hosts_map = {}
+        for chunk in _chunks(set().union(*group_descendants_map.values())):
+            group_hosts_qs = Group.hosts.through.objects.filter(group_id__in=chunk, host__inventory_id=self.pk)
+            if host_pks is not None:
+                group_hosts_qs = group_hosts_qs.filter(host_id__in=host_pks)
+            for group_id, host_id in group_hosts_qs.values_list('group_id', 'host_id'):
+                group_hosts_map.setdefault(group_id, set()).add(host_id)
+        memberships = set()
+        existing = {}
+        for group_pk, descendant_pks in group_descendants_map.items():
+            for descendant_pk in descendant_pks:
+                memberships.update((group_pk, host_pk) for host_pk in group_hosts_map.get(descendant_pk, ()))
+        for chunk in _chunks(group_descendants_map):
+            memberships_qs = GroupHostMembership.objects.filter(group_id__in=chunk)
+            if host_pks is not None:
+                memberships_qs = memberships_qs.filter(host_id__in=host_pks)
+            for pk, group_pk, host_pk in memberships_qs.values_list('pk', 'group_id', 'host_id'):
+                existing[(group_pk, host_pk)] = pk
+        self._sync_group_host_memberships(memberships, existing)
+
+    def get_content_version(self):
+        '''
+        Return a digest of the rows read by get_script_data(), or None for
+        smart inventories (whose hosts come from other inventories).  The
+        rows themselves are digested (in the database on PostgreSQL), so any
+        change yields a new version, including QuerySet.update() calls that
+        leave modified alone.
+        '''
+        if self.kind == 'smart':
+            return None
+        sources = [
+            (Host.objects.filter(inventory_id=self.pk), ('id', 'name', 'enabled', 'variables')),
+            (Group.objects.filter(inventory_id=self.pk), ('id', 'name', 'variables')),
+            (Group.hosts.through.objects.filter(group__inventory_id=self.pk), ('group_id', 'host_id')),
+            (Group.parents.through.objects.filter(from_group__inventory_id=self.pk), ('from_group_id', 'to_group_id')),
+        ]
+        digest = hashlib.sha1(repr([self.pk, self.variables]))
+        for qs, fields in sources:
+            qs = qs.order_by().values_list(*fields)
+            if connection.vendor == 'postgresql':
+                sql, params = qs.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT md5(string_agg(md5(t::text), '' ORDER BY t.{}, t.{})) FROM ({}) t".format(
+                            fields[0], fields[1], sql),
+                        params)
+                    digest.update(repr(cursor.fetchone()[0]))
+            else:
+                for row in qs.order_by(*fields[:2]).iterator():
+                    digest.update(repr(row))
+        return digest.hexdigest()
+
+    def update_host_address_names(self):
+        '''
+        Update the HostAddress rows of the effective host names of this
+        inventory's hosts, if the hosts changed since the last update.  Rows
+        of hosts that were removed or whose name changed are replaced, along
+        with any IP addresses resolved for them.
+        '''
+        version_qs = Host.objects.filter(inventory_id=self.pk)
+        version = None if self.kind == 'smart' else hashlib.sha1(repr(sorted(version_qs.aggregate(
+            count=Count('id'), modified=Max('modified'), max_id=Max('id')).items()))).hexdigest()
+        version_key = 'inventory-{}-host-address-names'.format(self.pk)
+        if version is not None and cache.get(version_key) == version:
+            return
+        host_names = dict((host.pk, host.get_effective_host_name())
+                          for host in self.hosts.only('pk', 'name', 'variables', 'variables_json').iterator())
+        existing = dict(HostAddress.objects.filter(inventory_id=self.pk, is_name=True).values_list('host_id', 'address'))
+        stale_host_pks = [host_pk for host_pk, name in existing.items() if host_names.get(host_pk) != name]
+        for chunk in _chunks(stale_host_pks):
+            HostAddress.objects.filter(inventory_id=self.pk, host_id__in=chunk).delete()
+        HostAddress.objects.bulk_create([
+            HostAddress(inventory_id=self.pk, host_id=host_pk, address=name, is_name=True)
+            for host_pk, name in host_names.items()
+            if existing.get(host_pk) != name and len(name) <= HostAddress._meta.get_field('address').max_length
+        ], batch_size=500)
+        if version is not None:
+            cache.set(version_key, version, None)
+
+    def resolve_host_addresses(self, max_age=None):
+        '''
+        Update the HostAddress rows of the IP addresses that this inventory's
+        host names resolve to, for names never resolved or, given max_age (in
+        seconds), resolved longer ago than that.
+        '''
+        names_qs = HostAddress.objects.filter(inventory_id=self.pk, is_name=True)
+        if max_age is None:
+            names_qs = names_qs.filter(resolved__isnull=True)
+        else:
+            names_qs = names_qs.filter(Q(resolved__isnull=True) | Q(resolved__lt=now() - datetime.timedelta(seconds=max_age)))
+        host_names = dict(names_qs.values_list('host_id', 'address'))
+        if not host_names:
+            return
+        resolved = now()
+        addresses = resolve_host_names(host_names.values())
+        for chunk in _chunks(host_names):
+            HostAddress.objects.filter(inventory_id=self.pk, host_id__in=chunk, is_name=False).delete()
+            HostAddress.objects.filter(inventory_id=self.pk, host_id__in=chunk, is_name=True).update(resolved=resolved)
+        HostAddress.objects.bulk_create([
+            HostAddress(inventory_id=self.pk, host_id=host_pk, address=address, resolved=resolved)
+            for host_pk, name in host_names.items() for address in sorted(addresses.get(name, ()))
+        ], batch_size=500)
+
     def get_script_data(self, hostvars=False, towervars=False, show_all=False):
         if show_all:
             hosts_q = dict()
@@ -279,12 +573,124 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
 
         return data
 
-    def update_host_computed_fields(self):
+    def iter_script_data(self, hostvars=False, towervars=False, show_all=False, chunk_size=65536):
+        '''
+        Generate the JSON text of get_script_data() in chunks of roughly
+        chunk_size characters.  Hosts, groups and memberships are read with
+        server-side cursors and written as they are read, so peak memory does
+        not depend on the number of hosts in the inventory.
+        '''
+        buf = []
+        buf_len = 0
+        for piece in self._iter_script_data_pieces(hostvars=hostvars, towervars=towervars, show_all=show_all):
+            buf.append(piece)
+            buf_len += len(piece)
+            if buf_len >= chunk_size:
+                yield ''.join(buf)
+                buf = []
+                buf_len = 0
+        if buf:
+            yield ''.join(buf)
+
+    def _iter_script_data_pieces(self, hostvars=False, towervars=False, show_all=False):
+        def json_list(values):
+            yield '['
+            for n, value in enumerate(values):
+                if n:
+                    yield ', '
+                yield json.dumps(value)
+            yield ']'
+
+        if show_all:
+            hosts_q = dict()
+        else:
+            hosts_q = dict(enabled=True)
+        variables = self.variables_dict
+        if self.kind == 'smart':
+            if not self.hosts.exists():
+                yield '{}'
+                return
+            all_hosts = self.hosts.values_list('name', flat=True).iterator()
+        else:
+            all_hosts = self.hosts.filter(groups__isnull=True, **hosts_q).values_list('name', flat=True).iterator()
+        first_host = next(all_hosts, None)
+
+        yield '{'
+        sep = ''
+        if variables or first_host is not None:
+            yield '"all": {'
+            if variables:
+                yield '"vars": ' + json.dumps(variables)
+            if first_host is not None:
+                yield ', "hosts": ' if variables else '"hosts": '
+                for piece in json_list(itertools.chain([first_host], all_hosts)):
+                    yield piece
+            yield '}'
+            sep = ', '
+
+        if self.kind != 'smart':
+            group_hosts_kw = dict(group__inventory_id=self.id, host__inventory_id=self.id)
+            if 'enabled' in hosts_q:
+                group_hosts_kw['host__enabled'] = hosts_q['enabled']
+            group_hosts = itertools.groupby(
+                Group.hosts.through.objects.filter(**group_hosts_kw).order_by('group_id')
+                .values_list('group_id', 'host__name').iterator(),
+                key=lambda row: row[0])
+            group_children = itertools.groupby(
+                Group.parents.through.objects.filter(
+                    from_group__inventory_id=self.id,
+                    to_group__inventory_id=self.id,
+                ).order_by('to_group_id').values_list('to_group_id', 'from_group__name').iterator(),
+                key=lambda row: row[0])
+            # Both membership cursors are ordered by group id, so they can be
+            # merged with the groups (also in id order) one group at a time.
+            next_hosts = next(group_hosts, None)
+            next_children = next(group_children, None)
+            for group in self.groups.order_by('id').only('id', 'name', 'variables', 'variables_json').iterator():
+                while next_hosts is not None and next_hosts[0] < group.id:
+                    next_hosts = next(group_hosts, None)
+                while next_children is not None and next_children[0] < group.id:
+                    next_children = next(group_children, None)
+                yield sep + json.dumps(group.name) + ': {"hosts": '
+                sep = ', '
+                if next_hosts is not None and next_hosts[0] == group.id:
+                    for piece in json_list(name for group_id, name in next_hosts[1]):
+                        yield piece
+                    next_hosts = next(group_hosts, None)
+                else:
+                    yield '[]'
+                yield ', "children": '
+                if next_children is not None and next_children[0] == group.id:
+                    for piece in json_list(name for group_id, name in next_children[1]):
+                        yield piece
+                    next_children = next(group_children, None)
+                else:
+                    yield '[]'
+                yield ', "vars": ' + json.dumps(group.variables_dict) + '}'
+
+        if hostvars:
+            yield sep + '"_meta": {"hostvars": {'
+            host_sep = ''
+            hosts_qs = self.hosts.filter(**hosts_q).only('id', 'name', 'enabled', 'variables', 'variables_json')
+            for host in hosts_qs.iterator():
+                host_vars = host.variables_dict
+                if towervars:
+                    host_vars.update(dict(remote_tower_enabled=str(host.enabled).lower(),
+                                          remote_tower_id=host.id))
+                yield host_sep + json.dumps(host.name) + ': ' + json.dumps(host_vars)
+                host_sep = ', '
+            yield '}}'
+        yield '}'
+
+    def update_host_computed_fields(self, host_ids=None):
         '''
-        Update computed fields for all hosts in this inventory.
+        Update computed fields for all hosts in this inventory, or only for
+        the hosts in host_ids.
         '''
         hosts_to_update = {}
         hosts_qs = self.hosts
+        if host_ids is not None:
+            hosts_qs = hosts_qs.filter(pk__in=list(host_ids))
         # Define queryset of all hosts with active failures.
         hosts_with_active_failures = hosts_qs.filter(last_job_host_summary__isnull=False, last_job_host_summary__failed=True).values_list('pk', flat=True)
         # Find all hosts that need the has_active_failures flag set.
@@ -310,47 +716,85 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
             host_updates = hosts_to_update.setdefault(host_pk, {})
             host_updates['has_inventory_sources'] = False
         # Now apply updates to hosts where needed (in batches).
-        all_update_pks = hosts_to_update.keys()
-        for offset in xrange(0, len(all_update_pks), 500):
-            update_pks = all_update_pks[offset:(offset + 500)]
-            for host in hosts_qs.filter(pk__in=update_pks):
-                host_updates = hosts_to_update[host.pk]
-                for field, value in host_updates.items():
-                    setattr(host, field, value)
-                host.save(update_fields=host_updates.keys())
-
-    def update_group_computed_fields(self):
+        bulk_update_fields(Host, hosts_to_update)
+
+    def _get_affected_group_pks(self, host_ids, group_ids):
         '''
-        Update computed fields for all active groups in this inventory.
+        Return the pks of the groups whose computed fields depend on the given
+        hosts and groups: the groups themselves, the groups the hosts belong
+        to and all of their ancestors.
         '''
-        group_children_map = self.get_group_children_map()
-        group_hosts_map = self.get_group_hosts_map()
-        active_host_pks = set(self.hosts.values_list('pk', flat=True))
-        failed_host_pks = set(self.hosts.filter(last_job_host_summary__failed=True).values_list('pk', flat=True))
-        # active_group_pks = set(self.groups.values_list('pk', flat=True))
-        failed_group_pks = set() # Update below as we check each group.
-        groups_with_cloud_pks = set(self.groups.filter(inventory_sources__source__in=CLOUD_INVENTORY_SOURCES).values_list('pk', flat=True))
-        groups_to_update = {}
-
-        # Build list of group pks to check, starting with the groups at the
-        # deepest level within the tree.
-        root_group_pks = set(self.root_groups.values_list('pk', flat=True))
-        group_depths = {} # pk: max_depth
+        affected_pks = set()
+        for chunk in _chunks(group_ids):
+            affected_pks.update(self.groups.filter(pk__in=chunk).values_list('pk', flat=True))
+        for chunk in _chunks(host_ids):
+            affected_pks.update(Group.hosts.through.objects.filter(
+                host_id__in=chunk, group__inventory_id=self.pk).values_list('group_id', flat=True))
+        parent_pks_to_check = set(affected_pks)
+        while parent_pks_to_check:
+            parent_pks = set()
+            for chunk in _chunks(parent_pks_to_check):
+                parent_pks.update(Group.parents.through.objects.filter(
+                    from_group_id__in=chunk, to_group__inventory_id=self.pk).values_list('to_group_id', flat=True))
+            parent_pks_to_check = parent_pks - affected_pks
+            affected_pks.update(parent_pks)
+        return affected_pks
+
+    def _get_subtree_maps(self, group_pks):
+        '''
+        Like get_group_children_map() and get_group_hosts_map(), limited to
+        the given groups and their descendants.
+        '''
+        group_children_map = {}
+        subtree_pks = set(group_pks)
+        child_pks_to_check = set(group_pks)
+        while child_pks_to_check:
+            child_pks = set()
+            for chunk in _chunks(child_pks_to_check):
+                group_parents_qs = Group.parents.through.objects.filter(
+                    to_group_id__in=chunk, from_group__inventory_id=self.pk)
+                for from_group_id, to_group_id in group_parents_qs.values_list('from_group_id', 'to_group_id'):
+                    group_children_map.setdefault(to_group_id, set()).add(from_group_id)
+                    child_pks.add(from_group_id)
+            child_pks_to_check = child_pks - subtree_pks
+            subtree_pks.update(child_pks)
+        group_hosts_map = {}
+        for chunk in _chunks(subtree_pks):
+            group_hosts_qs = Group.hosts.through.objects.filter(group_id__in=chunk, host__inventory_id=self.pk)
+            for group_id, host_id in group_hosts_qs.values_list('group_id', 'host_id'):
+                group_hosts_map.setdefault(group_id, set()).add(host_id)
+        return group_children_map, group_hosts_map, subtree_pks
 
-        def update_group_depths(group_pk, current_depth=0):
-            max_depth = group_depths.get(group_pk, -1)
-            # Arbitrarily limit depth to avoid hitting Python recursion limit (which defaults to 1000).
-            if current_depth > 100:
+    def update_group_computed_fields(self, host_ids=None, group_ids=None):
+        '''
+        Update computed fields for all active groups in this inventory or,
+        given the hosts and groups that changed, only for the groups affected
+        by those changes (see _get_affected_group_pks).
+        '''
+        failed_host_pks = set(self.hosts.filter(last_job_host_summary__failed=True).values_list('pk', flat=True))
+        if host_ids is None and group_ids is None:
+            group_pks = set(self.groups.values_list('pk', flat=True))
+            group_children_map = self.get_group_children_map()
+            group_hosts_map = self.get_group_hosts_map()
+            failed_group_pks = set() # Update below as we check each group.
+        else:
+            group_pks = self._get_affected_group_pks(host_ids or [], group_ids or [])
+            if not group_pks:
                 return
-            if current_depth > max_depth:
-                group_depths[group_pk] = current_depth
-            for child_pk in group_children_map.get(group_pk, set()):
-                update_group_depths(child_pk, current_depth + 1)
-        for group_pk in root_group_pks:
-            update_group_depths(group_pk)
-        group_pks_to_check = [x[1] for x in sorted([(v,k) for k,v in group_depths.items()], reverse=True)]
-
-        for group_pk in group_pks_to_check:
+            group_children_map, group_hosts_map, subtree_pks = self._get_subtree_maps(group_pks)
+            # Descendant groups that are not affected keep their stored flag.
+            failed_group_pks = set()
+            for chunk in _chunks(subtree_pks - group_pks):
+                failed_group_pks.update(self.groups.filter(
+                    pk__in=chunk, has_active_failures=True).values_list('pk', flat=True))
+        groups_with_cloud_pks = set()
+        for chunk in _chunks(group_pks):
+            groups_with_cloud_pks.update(self.groups.filter(
+                pk__in=chunk, inventory_sources__source__in=CLOUD_INVENTORY_SOURCES).values_list('pk', flat=True))
+
+        groups_to_update = {}
+        group_child_pks = {}
+        for group_pk in group_pks:
             # Get all children and host pks for this group.
             parent_pks_to_check = set([group_pk])
             parent_pks_checked = set()
@@ -366,41 +810,45 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
                     h_ids = group_hosts_map.get(parent_pk, set())
                     host_pks.update(h_ids)
             # Define updates needed for this group.
-            group_updates = groups_to_update.setdefault(group_pk, {})
-            group_updates.update({
-                'total_hosts': len(active_host_pks & host_pks),
+            groups_to_update[group_pk] = {
+                'total_hosts': len(host_pks),
                 'has_active_failures': bool(failed_host_pks & host_pks),
                 'hosts_with_active_failures': len(failed_host_pks & host_pks),
                 'total_groups': len(child_pks),
-                'groups_with_active_failures': len(failed_group_pks & child_pks),
                 'has_inventory_sources': bool(group_pk in groups_with_cloud_pks),
-            })
-            if group_updates['has_active_failures']:
+            }
+            group_child_pks[group_pk] = child_pks
+            if groups_to_update[group_pk]['has_active_failures']:
                 failed_group_pks.add(group_pk)
-
-        # Now apply updates to each group as needed (in batches).
-        all_update_pks = groups_to_update.keys()
-        for offset in xrange(0, len(all_update_pks), 500):
-            update_pks = all_update_pks[offset:(offset + 500)]
-            for group in self.groups.filter(pk__in=update_pks):
-                group_updates = groups_to_update[group.pk]
-                for field, value in group_updates.items():
-                    if getattr(group, field) != value:
-                        setattr(group, field, value)
-                    else:
+        for group_pk, child_pks in group_child_pks.items():
+            groups_to_update[group_pk]['groups_with_active_failures'] = len(failed_group_pks & child_pks)
+
+        # Now apply only the values that changed (in batches).
+        fields = groups_to_update.values()[0].keys() if groups_to_update else []
+        for chunk in _chunks(groups_to_update.keys()):
+            for current in Group.objects.filter(pk__in=chunk).values('pk', *fields):
+                group_updates = groups_to_update[current['pk']]
+                for field in fields:
+                    if current[field] == group_updates[field]:
                         group_updates.pop(field)
-                if group_updates:
-                    group.save(update_fields=group_updates.keys())
+        bulk_update_fields(Group, dict((pk, updates) for pk, updates in groups_to_update.items() if updates))
 
-    def update_computed_fields(self, update_groups=True, update_hosts=True):
+    def update_computed_fields(self, update_groups=True, update_hosts=True, host_ids=None, group_ids=None):
         '''
         Update model fields that are computed from database relationships.
+
+        When host_ids and/or group_ids are given, only those hosts and the
+        groups affected by changes to them (or to their memberships) are
+        recomputed; otherwise every host and group is.
         '''
         logger.debug("Going to update inventory computed fields")
+        if host_ids is not None or group_ids is not None:
+            host_ids = set(host_ids or [])
+            group_ids = set(group_ids or [])
         if update_hosts:
-            self.update_host_computed_fields()
+            self.update_host_computed_fields(host_ids=host_ids)
         if update_groups:
-            self.update_group_computed_fields()
+            self.update_group_computed_fields(host_ids=host_ids, group_ids=group_ids)
         active_hosts = self.hosts
         failed_hosts = active_hosts.filter(has_active_failures=True)
         active_groups = self.groups
@@ -466,25 +914,78 @@ class Inventory(CommonModelNameNotUnique, ResourceMixin):
         self.websocket_emit_status('pending_deletion')
         delete_inventory.delay(self.pk, user_id)
 
+    def delete_in_bulk(self, progress=None):
+        '''
+        Delete this inventory, first deleting its hosts and groups, and the
+        rows depending on them, with batches of set-based queries (see
+        bulk_delete) rather than loading them all through Django's deletion
+        Collector.  Their activity stream entries are still recorded.  progress,
+        if given, is called with the model, the number of its rows deleted so
+        far and their total after each batch.
+        '''
+        from awx.main.signals import activity_stream_delete_many
+        for model in (Host, Group):
+            def record_deletion(queryset, model=model):
+                activity_stream_delete_many(model, queryset)
+
+            def report_progress(deleted, total, model=model):
+                if progress is not None:
+                    progress(model, deleted, total)
+
+            bulk_delete(model.objects.filter(inventory_id=self.pk),
+                        batch_size=settings.AWX_INVENTORY_DELETE_BATCH_SIZE,
+                        before_batch=record_deletion, progress=report_progress)
+        self.delete()
+
+    def update_smart_inventory_memberships(self, host_names=None):
+        '''
+        Update the SmartInventoryMembership rows of this smart inventory from
+        its host_filter, for all hosts or only for hosts with the given names
+        (a smart inventory includes one host per name, so a change to one host
+        can add or remove another with the same name).  Return True if any
+        rows were added or removed.
+        '''
+        # Not self.hosts, which may be served from these very rows (see
+        # AWX_SMART_INVENTORY_MATERIALIZED_HOSTS).
+        hosts_qs = SmartFilter.compiled_query(self.host_filter, self.organization_id)
+        membership_qs = SmartInventoryMembership.objects.filter(inventory_id=self.pk)
+        host_pks = set()
+        existing = {}
+        for chunk in ([None] if host_names is None else _chunks(host_names)):
+            chunk_hosts_qs, chunk_membership_qs = hosts_qs, membership_qs
+            if chunk is not None:
+                chunk_hosts_qs = hosts_qs.filter(name__in=chunk)
+                chunk_membership_qs = membership_qs.filter(host__name__in=chunk)
+            host_pks_by_name = {}
+            for name, pk in chunk_hosts_qs.order_by('name', 'pk').values_list('name', 'pk').iterator():
+                host_pks_by_name.setdefault(name, pk)
+            host_pks.update(host_pks_by_name.values())
+            existing.update(chunk_membership_qs.values_list('host_id', 'pk'))
+        stale_pks = [pk for host_pk, pk in existing.items() if host_pk not in host_pks]
+        for chunk in _chunks(stale_pks):
+            SmartInventoryMembership.objects.filter(pk__in=chunk).delete()
+        new_memberships = [
+            SmartInventoryMembership(inventory_id=self.pk, host_id=host_pk)
+            for host_pk in host_pks if host_pk not in existing
+        ]
+        SmartInventoryMembership.objects.bulk_create(new_memberships, batch_size=500)
+        return bool(stale_pks or new_memberships)
+
     def _update_host_smart_inventory_memeberships(self):
-        if self.kind == 'smart' and settings.AWX_REBUILD_SMART_MEMBERSHIP:
-            def on_commit():
-                from awx.main.tasks import update_host_smart_inventory_memberships
-                update_host_smart_inventory_memberships.delay()
-            connection.on_commit(on_commit)
+        if self.kind == 'smart':
+            from awx.main.tasks import schedule_update_host_smart_inventory_memberships
+            schedule_update_host_smart_inventory_memberships(inventory_id=self.pk)
 
     def save(self, *args, **kwargs):
-        self._update_host_smart_inventory_memeberships()
+        update_fields = kwargs.get('update_fields', None)
         super(Inventory, self).save(*args, **kwargs)
+        if not update_fields or set(update_fields) & set(['kind', 'host_filter', 'organization']):
+            self._update_host_smart_inventory_memeberships()
         if (self.kind == 'smart' and 'host_filter' in kwargs.get('update_fields', ['host_filter']) and
                 connection.vendor != 'sqlite'):
             # Minimal update of host_count for smart inventory host filter changes
             self.update_computed_fields(update_groups=False, update_hosts=False)
 
-    def delete(self, *args, **kwargs):
-        self._update_host_smart_inventory_memeberships()
-        super(Inventory, self).delete(*args, **kwargs)
-
 
 class SmartInventoryMembership(BaseModel):
     '''
@@ -499,7 +1000,111 @@ class SmartInventoryMembership(BaseModel):
     host = models.ForeignKey('Host', related_name='+', on_delete=models.CASCADE)
 
 
-class Host(CommonModelNameNotUnique):
+class GroupAncestry(BaseModel):
+    '''
+    A closure table of Group ancestry, with one row for each ancestor of each
+    group, maintained as group parents change.  A group is only its own
+    ancestor when it is part of a cycle.
+    '''
+
+    class Meta:
+        app_label = 'main'
+        unique_together = (('ancestor', 'descendant'),)
+        index_together = (('descendant', 'ancestor'),)
+
+    inventory = models.ForeignKey('Inventory', related_name='+', on_delete=models.CASCADE)
+    ancestor = models.ForeignKey('Group', related_name='+', on_delete=models.CASCADE)
+    descendant = models.ForeignKey('Group', related_name='+', on_delete=models.CASCADE)
+    # Length of the shortest path from the descendant to the ancestor.
+    depth = models.PositiveIntegerField()
+
+
+class GroupHostMembership(BaseModel):
+    '''
+    A lookup table for Host membership in Groups, directly or through any of
+    their children, maintained along with GroupAncestry.
+    '''
+
+    class Meta:
+        app_label = 'main'
+        unique_together = (('group', 'host'),)
+        index_together = (('host', 'group'),)
+
+    inventory = models.ForeignKey('Inventory', related_name='+', on_delete=models.CASCADE)
+    group = models.ForeignKey('Group', related_name='+', on_delete=models.CASCADE)
+    host = models.ForeignKey('Host', related_name='+', on_delete=models.CASCADE)
+
+
+class HostFactValue(BaseModel):
+    '''
+    A lookup table of the ansible_facts values of each Host at the paths
+    listed in AWX_INDEXED_ANSIBLE_FACTS, so that smart inventory filters on
+    those paths are an index lookup instead of a test of every host's facts.
+    '''
+
+    class Meta:
+        app_label = 'main'
+        index_together = (('path', 'value'),)
+
+    host = models.ForeignKey('Host', related_name='+', on_delete=models.CASCADE)
+    path = models.CharField(max_length=512)
+    # JSON encoded, see awx.main.utils.filters.get_fact_path_values.
+    value = models.CharField(max_length=FACT_VALUE_MAX_LENGTH)
+
+    @classmethod
+    def update_for_hosts(cls, hosts):
+        '''
+        Replace the indexed fact values of the given hosts with those of their
+        current ansible_facts.
+        '''
+        paths = get_indexed_fact_paths()
+        if not paths:
+            # Rows left from paths no longer listed are never looked up (and
+            # are removed by the index_ansible_facts command).
+            return
+        for chunk in _chunks([host.pk for host in hosts]):
+            cls.objects.filter(host_id__in=chunk).delete()
+        cls.objects.bulk_create([
+            cls(host_id=host.pk, path=path, value=value)
+            for host in hosts for path in sorted(paths)
+            for value in get_fact_path_values(host.ansible_facts or {}, path)
+        ], batch_size=500)
+
+
+class HostFactPath(BaseModel):
+    '''
+    An AWX_INDEXED_ANSIBLE_FACTS path whose HostFactValue rows have been built
+    for every host by the index_ansible_facts command.  Only these paths are
+    looked up by smart inventory filters.
+    '''
+
+    class Meta:
+        app_label = 'main'
+
+    path = models.CharField(max_length=512, unique=True)
+
+
+class HostAddress(BaseModel):
+    '''
+    A lookup table of the addresses of each Host in an inventory: its
+    effective host name and the IP addresses that name resolves to, used to
+    match provisioning callbacks to hosts.
+    '''
+
+    class Meta:
+        app_label = 'main'
+        index_together = (('inventory', 'address'),)
+
+    inventory = models.ForeignKey('Inventory', related_name='+', on_delete=models.CASCADE)
+    host = models.ForeignKey('Host', related_name='+', on_delete=models.CASCADE)
+    address = models.CharField(max_length=1024)
+    # The effective host name rather than an address it resolved to.
+    is_name = models.BooleanField(default=False)
+    # When the IP addresses of a host name were last resolved, if ever.
+    resolved = models.DateTimeField(null=True, default=None)
+
+
+class Host(CommonModelNameNotUnique, ParsedVariablesMixin):
     '''
     A managed node
     '''
@@ -622,27 +1227,16 @@ class Host(CommonModelNameNotUnique):
         #     self.inventory.update_computed_fields(update_groups=False,
         #                                           update_hosts=False)
         # Rebuild summary fields cache
-    variables_dict = VarsDictProperty('variables')
+    variables_dict = VarsDictProperty('variables', json_field='variables_json')
 
     @property
     def all_groups(self):
         '''
-        Return all groups of which this host is a member, avoiding infinite
-        recursion in the case of cyclical group relations.
+        Return all groups of which this host is a member, directly or through
+        any of their children.
         '''
-        group_parents_map = self.inventory.get_group_parents_map()
-        group_pks = set(self.groups.values_list('pk', flat=True))
-        child_pks_to_check = set()
-        child_pks_to_check.update(group_pks)
-        child_pks_checked = set()
-        while child_pks_to_check:
-            for child_pk in list(child_pks_to_check):
-                p_ids = group_parents_map.get(child_pk, set())
-                group_pks.update(p_ids)
-                child_pks_to_check.remove(child_pk)
-                child_pks_checked.add(child_pk)
-                child_pks_to_check.update(p_ids - child_pks_checked)
-        return Group.objects.filter(pk__in=group_pks).distinct()
+        group_pks = GroupHostMembership.objects.filter(host_id=self.pk).values('group_id')
+        return Group.objects.filter(pk__in=group_pks)
 
     # Use .job_host_summaries.all() to get jobs affecting this host.
     # Use .job_events.all() to get events affecting this host.
@@ -656,6 +1250,7 @@ class Host(CommonModelNameNotUnique):
         else:
             self.ansible_facts[module] = facts
         self.save()
+        HostFactValue.update_for_hosts([self])
 
     def get_effective_host_name(self):
         '''
@@ -669,23 +1264,34 @@ class Host(CommonModelNameNotUnique):
             host_name = self.variables_dict['ansible_host']
         return host_name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        host = super(Host, cls).from_db(db, field_names, values)
+        if 'name' in field_names:
+            # Remember the stored name, so a rename also re-evaluates the
+            # smart inventory memberships of the old name.
+            host._saved_name = host.name
+        return host
+
     def _update_host_smart_inventory_memeberships(self):
-        if settings.AWX_REBUILD_SMART_MEMBERSHIP:
-            def on_commit():
-                from awx.main.tasks import update_host_smart_inventory_memberships
-                update_host_smart_inventory_memberships.delay()
-            connection.on_commit(on_commit)
+        from awx.main.tasks import schedule_update_host_smart_inventory_memberships
+        host_names = [self.name]
+        saved_name = getattr(self, '_saved_name', None)
+        if saved_name is not None and saved_name != self.name:
+            host_names.append(saved_name)
+        schedule_update_host_smart_inventory_memberships(host_names=host_names)
 
     def save(self, *args, **kwargs):
-        self._update_host_smart_inventory_memeberships()
         super(Host, self).save(*args, **kwargs)
+        self._update_host_smart_inventory_memeberships()
+        self._saved_name = self.name
 
     def delete(self, *args, **kwargs):
         self._update_host_smart_inventory_memeberships()
         super(Host, self).delete(*args, **kwargs)
 
 
-class Group(CommonModelNameNotUnique):
+class Group(CommonModelNameNotUnique, ParsedVariablesMixin):
     '''
     A group containing managed hosts.  A group or host may belong to multiple
     groups.
@@ -765,7 +1371,7 @@ class Group(CommonModelNameNotUnique):
     @transaction.atomic
     def delete_recursive(self):
         from awx.main.utils import ignore_inventory_computed_fields
-        from awx.main.tasks import update_inventory_computed_fields
+        from awx.main.tasks import schedule_update_inventory_computed_fields
         from awx.main.signals import disable_activity_stream, activity_stream_delete
 
 
@@ -820,7 +1426,7 @@ class Group(CommonModelNameNotUnique):
                 marked_groups.append(group)
             Group.objects.filter(id__in=marked_groups).delete()
             Host.objects.filter(id__in=marked_hosts).delete()
-            update_inventory_computed_fields.delay(self.inventory.id)
+            schedule_update_inventory_computed_fields(self.inventory.id)
         with ignore_inventory_computed_fields():
             with disable_activity_stream():
                 mark_actual()
@@ -852,25 +1458,15 @@ class Group(CommonModelNameNotUnique):
         if computed_fields:
             self.save(update_fields=computed_fields.keys())
 
-    variables_dict = VarsDictProperty('variables')
+    variables_dict = VarsDictProperty('variables', json_field='variables_json')
 
     def get_all_parents(self, except_pks=None):
         '''
         Return all parents of this group recursively.  The group itself will
         be excluded unless there is a cycle leading back to it.
         '''
-        group_parents_map = self.inventory.get_group_parents_map()
-        child_pks_to_check = set([self.pk])
-        child_pks_checked = set()
-        parent_pks = set()
-        while child_pks_to_check:
-            for child_pk in list(child_pks_to_check):
-                p_ids = group_parents_map.get(child_pk, set())
-                parent_pks.update(p_ids)
-                child_pks_to_check.remove(child_pk)
-                child_pks_checked.add(child_pk)
-                child_pks_to_check.update(p_ids - child_pks_checked)
-        return Group.objects.filter(pk__in=parent_pks).distinct()
+        parent_pks = GroupAncestry.objects.filter(descendant_id=self.pk).values('ancestor_id')
+        return Group.objects.filter(pk__in=parent_pks)
 
     @property
     def all_parents(self):
@@ -881,18 +1477,8 @@ class Group(CommonModelNameNotUnique):
         Return all children of this group recursively.  The group itself will
         be excluded unless there is a cycle leading back to it.
         '''
-        group_children_map = self.inventory.get_group_children_map()
-        parent_pks_to_check = set([self.pk])
-        parent_pks_checked = set()
-        child_pks = set()
-        while parent_pks_to_check:
-            for parent_pk in list(parent_pks_to_check):
-                c_ids = group_children_map.get(parent_pk, set())
-                child_pks.update(c_ids)
-                parent_pks_to_check.remove(parent_pk)
-                parent_pks_checked.add(parent_pk)
-                parent_pks_to_check.update(c_ids - parent_pks_checked)
-        return Group.objects.filter(pk__in=child_pks).distinct()
+        child_pks = GroupAncestry.objects.filter(ancestor_id=self.pk).values('descendant_id')
+        return Group.objects.filter(pk__in=child_pks)
 
     @property
     def all_children(self):
@@ -902,20 +1488,8 @@ class Group(CommonModelNameNotUnique):
         '''
         Return all hosts associated with this group or any of its children.
         '''
-        group_children_map = self.inventory.get_group_children_map()
-        group_hosts_map = self.inventory.get_group_hosts_map()
-        parent_pks_to_check = set([self.pk])
-        parent_pks_checked = set()
-        host_pks = set()
-        while parent_pks_to_check:
-            for parent_pk in list(parent_pks_to_check):
-                c_ids = group_children_map.get(parent_pk, set())
-                parent_pks_to_check.remove(parent_pk)
-                parent_pks_checked.add(parent_pk)
-                parent_pks_to_check.update(c_ids - parent_pks_checked)
-                h_ids = group_hosts_map.get(parent_pk, set())
-                host_pks.update(h_ids)
-        return Host.objects.filter(pk__in=host_pks).distinct()
+        host_pks = GroupHostMembership.objects.filter(group_id=self.pk).values('host_id')
+        return Host.objects.filter(pk__in=host_pks)
 
     @property
     def all_hosts(self):
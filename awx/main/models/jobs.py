@@ -2,8 +2,12 @@
 # All Rights Reserved.
 
 # Python
+import calendar
+import codecs
 import datetime
 import logging
+import os
+import re
 import time
 import json
 import base64
@@ -11,7 +15,7 @@ from urlparse import urljoin
 
 # Django
 from django.conf import settings
-from django.db import models
+from django.db import models, connection
 #from django.core.cache import cache
 import memcache
 from dateutil import parser
@@ -727,75 +731,232 @@ class Job(UnifiedJob, JobOptions, SurveyJobMixin, JobNotificationMixin, TaskMana
     def memcached_fact_modified_key(self, host_name):
         return '{}-{}-modified'.format(self.inventory.id, base64.b64encode(host_name.encode('utf-8')))
 
-    def _get_inventory_hosts(self, only=['name', 'ansible_facts', 'modified',]):
-        return self.inventory.hosts.only(*only)
+    def _get_limit_terms(self):
+        '''
+        Split the limit into host patterns as Ansible does: on commas or,
+        when there are none, on the colons separating patterns (a single
+        IPv6 address or host:port is one pattern).  Returns None unless every
+        pattern is a plain host or group name.
+        '''
+        limit = (self.limit or '').strip()
+        if ',' in limit:
+            terms = limit.split(',')
+        elif ':' in limit:
+            terms = limit.split(':')
+            if any(not term.strip() for term in terms) or terms[-1].strip().isdigit() or all(
+                    re.match(r'^[0-9A-Fa-f.]+$', term.strip()) for term in terms):
+                # an IPv6 address or host:port rather than a list of patterns
+                return None
+        else:
+            terms = [limit]
+        terms = [term.strip() for term in terms if term.strip()]
+        if not terms:
+            return None
+        for term in terms:
+            if term in ('all', '*', 'ungrouped') or term.startswith('@') or re.search(r'[!&~*?\[\]]', term):
+                return None
+        return terms
+
+    def _get_limit_hosts_q(self):
+        '''
+        Return a Q matching the hosts selected by a limit made of plain host
+        and group names, or None if the limit selects every host, uses
+        patterns (wildcards, ranges, regexes, exclusions, intersections,
+        @retry files) that are left to Ansible to evaluate, or names a host
+        or group this inventory does not have.
+        '''
+        terms = self._get_limit_terms()
+        if terms is None:
+            return None
+        groups = dict(self.inventory.groups.filter(name__in=terms).values_list('name', 'id'))
+        host_names = set(self.inventory.hosts.filter(name__in=terms).values_list('name', flat=True))
+        if any(term not in groups and term not in host_names for term in terms):
+            return None
+        group_children_map = self.inventory.get_group_children_map()
+        group_ids = set(groups.values())
+        pending = list(group_ids)
+        while pending:
+            for child_id in group_children_map.get(pending.pop(), set()):
+                if child_id not in group_ids:
+                    group_ids.add(child_id)
+                    pending.append(child_id)
+        return models.Q(name__in=host_names) | models.Q(groups__in=group_ids)
+
+    def _get_inventory_hosts(self, only=['name', 'ansible_facts', 'ansible_facts_modified', 'modified',
+                                         'insights_system_id', 'inventory_id']):
+        hosts = self.inventory.hosts.only(*only)
+        limit_q = self._get_limit_hosts_q()
+        if limit_q is not None:
+            hosts = hosts.filter(limit_q).distinct()
+        return hosts
 
     def _get_memcache_connection(self):
         return memcache.Client([settings.CACHES['default']['LOCATION']], debug=0)
 
-    def start_job_fact_cache(self):
+    def _get_fact_cache_file(self, destination, host_name):
+        if os.sep in host_name or host_name.startswith('.'):
+            return None
+        return os.path.join(destination, smart_str(host_name))
+
+    def start_job_fact_cache(self, destination=None):
+        '''
+        Prime the fact cache read by the job with the facts stored for the
+        hosts it targets: memcached by default, or, given a destination
+        directory, one file per host for Ansible's jsonfile cache plugin.
+        '''
         if not self.inventory:
             return
 
-        cache = self._get_memcache_connection()
-
-        host_names = []
+        hosts = list(self._get_inventory_hosts())
+        if destination is not None:
+            return self._start_file_fact_cache(destination, hosts)
 
-        for host in self._get_inventory_hosts():
-            host_key = self.memcached_fact_host_key(host.name)
-            modified_key = self.memcached_fact_modified_key(host.name)
+        cache = self._get_memcache_connection()
 
-            if cache.get(modified_key) is None:
+        modified_keys = [self.memcached_fact_modified_key(host.name) for host in hosts]
+        cached_modified = cache.get_multi(modified_keys)
+        to_set = {}
+        for host, modified_key in zip(hosts, modified_keys):
+            if cached_modified.get(modified_key) is None:
                 if host.ansible_facts_modified:
                     host_modified = host.ansible_facts_modified.replace(tzinfo=tzutc()).isoformat()
                 else:
                     host_modified = datetime.datetime.now(tzutc()).isoformat()
-                cache.set(host_key, json.dumps(host.ansible_facts))
-                cache.set(modified_key, host_modified)
-
-            host_names.append(host.name)
+                to_set[self.memcached_fact_host_key(host.name)] = json.dumps(host.ansible_facts)
+                to_set[modified_key] = host_modified
+        if to_set:
+            cache.set_multi(to_set)
 
-        cache.set(self.memcached_fact_key, host_names)
+        cache.set(self.memcached_fact_key, [host.name for host in hosts])
 
-    def finish_job_fact_cache(self):
+    def _start_file_fact_cache(self, destination, hosts):
+        if not os.path.exists(destination):
+            os.mkdir(destination, 0700)
+        for host in hosts:
+            filepath = self._get_fact_cache_file(destination, host.name)
+            if filepath is None:
+                continue
+            with codecs.open(filepath, 'w', encoding='utf-8') as f:
+                os.chmod(f.name, 0600)
+                json.dump(host.ansible_facts, f)
+            # The jsonfile plugin expires entries by file modification time.
+            if host.ansible_facts_modified:
+                modified = calendar.timegm(host.ansible_facts_modified.utctimetuple())
+                os.utime(filepath, (modified, modified))
+
+    def finish_job_fact_cache(self, destination=None):
+        '''
+        Save facts that the job added to the fact cache back to the hosts.
+        '''
         if not self.inventory:
             return
 
-        cache = self._get_memcache_connection()
+        hosts = list(self._get_inventory_hosts())
+        if destination is not None:
+            return self._save_host_facts(self._finish_file_fact_cache(destination, hosts))
 
-        hosts = self._get_inventory_hosts()
-        for host in hosts:
-            host_key = self.memcached_fact_host_key(host.name)
-            modified_key = self.memcached_fact_modified_key(host.name)
+        cache = self._get_memcache_connection()
 
-            modified = cache.get(modified_key)
+        modified_keys = dict((self.memcached_fact_modified_key(host.name), host) for host in hosts)
+        cached_modified = cache.get_multi(modified_keys.keys())
+        expired_keys = []
+        candidates = []
+        for modified_key, host in modified_keys.items():
+            modified = cached_modified.get(modified_key)
             if modified is None:
-                cache.delete(host_key)
+                expired_keys.append(self.memcached_fact_host_key(host.name))
                 continue
-
             # Save facts if cache is newer than DB
             modified = parser.parse(modified, tzinfos=[tzutc()])
             if not host.ansible_facts_modified or modified > host.ansible_facts_modified:
-                ansible_facts = cache.get(host_key)
-                try:
-                    ansible_facts = json.loads(ansible_facts)
-                except Exception:
-                    ansible_facts = None
-
-                if ansible_facts is None:
-                    cache.delete(host_key)
-                    continue
-                host.ansible_facts = ansible_facts
-                host.ansible_facts_modified = modified
-                if 'insights' in ansible_facts and 'system_id' in ansible_facts['insights']:
-                    host.insights_system_id = ansible_facts['insights']['system_id']
-                host.save()
-                system_tracking_logger.info(
-                    'New fact for inventory {} host {}'.format(
-                        smart_str(host.inventory.name), smart_str(host.name)),
-                    extra=dict(inventory_id=host.inventory.id, host_name=host.name,
-                               ansible_facts=host.ansible_facts,
-                               ansible_facts_modified=host.ansible_facts_modified.isoformat()))
+                candidates.append((host, modified))
+
+        cached_facts = cache.get_multi([self.memcached_fact_host_key(candidate[0].name) for candidate in candidates])
+        changed_hosts = []
+        for host, modified in candidates:
+            host_key = self.memcached_fact_host_key(host.name)
+            try:
+                ansible_facts = json.loads(cached_facts.get(host_key))
+            except Exception:
+                ansible_facts = None
+
+            if ansible_facts is None:
+                expired_keys.append(host_key)
+                continue
+            host.ansible_facts = ansible_facts
+            host.ansible_facts_modified = modified
+            changed_hosts.append(host)
+        if expired_keys:
+            cache.delete_multi(expired_keys)
+        self._save_host_facts(changed_hosts)
+
+    def _finish_file_fact_cache(self, destination, hosts):
+        changed_hosts = []
+        for host in hosts:
+            filepath = self._get_fact_cache_file(destination, host.name)
+            if filepath is None or not os.path.exists(filepath):
+                continue
+            modified = datetime.datetime.fromtimestamp(os.path.getmtime(filepath), tzutc())
+            if host.ansible_facts_modified and modified <= host.ansible_facts_modified:
+                continue
+            try:
+                with codecs.open(filepath, 'r', encoding='utf-8') as f:
+                    ansible_facts = json.load(f)
+            except (IOError, ValueError):
+                continue
+            if not isinstance(ansible_facts, dict):
+                continue
+            host.ansible_facts = ansible_facts
+            host.ansible_facts_modified = modified
+            changed_hosts.append(host)
+        return changed_hosts
+
+    def _save_host_facts(self, hosts):
+        '''
+        Write the facts of changed hosts with a few set-based UPDATEs rather
+        than saving each host.
+        '''
+        if not hosts:
+            return
+        for host in hosts:
+            if 'insights' in host.ansible_facts and 'system_id' in host.ansible_facts['insights']:
+                host.insights_system_id = host.ansible_facts['insights']['system_id']
+        from awx.main.models.inventory import Host, HostFactValue
+        if connection.vendor == 'postgresql':
+            for start in range(0, len(hosts), 500):
+                batch = hosts[start:start + 500]
+                params = []
+                for host in batch:
+                    params.extend([host.pk, json.dumps(host.ansible_facts),
+                                   host.ansible_facts_modified, host.insights_system_id])
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'UPDATE {table} SET ansible_facts = v.facts::jsonb, '
+                        'ansible_facts_modified = v.facts_modified::timestamptz, '
+                        'insights_system_id = v.system_id '
+                        'FROM (VALUES {values}) AS v(id, facts, facts_modified, system_id) '
+                        'WHERE {table}.id = v.id'.format(
+                            table=Host._meta.db_table,
+                            values=', '.join(['(%s::integer, %s, %s, %s::text)'] * len(batch))),
+                        params)
+        else:
+            for host in hosts:
+                Host.objects.filter(pk=host.pk).update(
+                    ansible_facts=host.ansible_facts,
+                    ansible_facts_modified=host.ansible_facts_modified,
+                    insights_system_id=host.insights_system_id)
+        HostFactValue.update_for_hosts(hosts)
+        for host in hosts:
+            system_tracking_logger.info(
+                'New fact for inventory {} host {}'.format(
+                    smart_str(self.inventory.name), smart_str(host.name)),
+                extra=dict(inventory_id=self.inventory.id, host_name=host.name,
+                           ansible_facts=host.ansible_facts,
+                           ansible_facts_modified=host.ansible_facts_modified.isoformat()))
+        # Bulk updates bypass Host.save(), which would otherwise schedule the
+        # smart inventory membership update (smart filters can match facts).
+        from awx.main.tasks import schedule_update_host_smart_inventory_memberships
+        schedule_update_host_smart_inventory_memberships(host_names=[host.name for host in hosts])
 
 
 # Add on aliases for the non-related-model fields
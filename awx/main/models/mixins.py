@@ -9,9 +9,9 @@ from django.contrib.auth.models import User # noqa
 from django.utils.translation import ugettext_lazy as _
 
 # AWX
-from awx.main.models.base import prevent_search
+from awx.main.models.base import prevent_search, VarsDictProperty
 from awx.main.models.rbac import (
-    Role, RoleAncestorEntry, get_roles_on_resource
+    Role, RoleAncestorEntry, get_roles_on_resource, get_cached_accessible_ids
 )
 from awx.main.utils import parse_yaml_or_json
 from awx.main.utils.encryption import decrypt_value, get_encryption_key, is_encrypted
@@ -20,7 +20,7 @@ from awx.main.fields import JSONField, AskForField
 
 __all__ = ['ResourceMixin', 'SurveyJobTemplateMixin', 'SurveyJobMixin',
            'TaskManagerUnifiedJobMixin', 'TaskManagerJobMixin', 'TaskManagerProjectUpdateMixin',
-           'TaskManagerInventoryUpdateMixin',]
+           'TaskManagerInventoryUpdateMixin', 'ParsedVariablesMixin',]
 
 
 class ResourceMixin(models.Model):
@@ -43,7 +43,7 @@ class ResourceMixin(models.Model):
 
     @classmethod
     def accessible_pk_qs(cls, accessor, role_field):
-        return ResourceMixin._accessible_pk_qs(cls, accessor, role_field)
+        return ResourceMixin._accessible_pks(cls, accessor, role_field)
 
     @staticmethod
     def _accessible_pk_qs(cls, accessor, role_field, content_types=None):
@@ -68,9 +68,24 @@ class ResourceMixin(models.Model):
         ).values_list('object_id').distinct()
 
 
+    @staticmethod
+    def _accessible_pks(cls, accessor, role_field, content_types=None):
+        '''
+        Like _accessible_pk_qs, but for a user return a list of the ids from
+        the per-user cache of accessible ids when there are not too many.
+        '''
+        pk_qs = ResourceMixin._accessible_pk_qs(cls, accessor, role_field, content_types=content_types)
+        if type(accessor) == User:
+            if content_types is None:
+                content_types = [ContentType.objects.get_for_model(cls).id]
+            pks = get_cached_accessible_ids(accessor, role_field, content_types, pk_qs)
+            if pks is not None:
+                return pks
+        return pk_qs
+
     @staticmethod
     def _accessible_objects(cls, accessor, role_field):
-        return cls.objects.filter(pk__in = ResourceMixin._accessible_pk_qs(cls, accessor, role_field))
+        return cls.objects.filter(pk__in = ResourceMixin._accessible_pks(cls, accessor, role_field))
 
 
     def get_permissions(self, accessor):
@@ -416,3 +431,30 @@ class TaskManagerProjectUpdateMixin(TaskManagerUpdateOnLaunchMixin):
 class TaskManagerInventoryUpdateMixin(TaskManagerUpdateOnLaunchMixin):
     class Meta:
         abstract = True
+
+
+class ParsedVariablesMixin(models.Model):
+    '''
+    Store the variables of a model as JSON text when they are given as YAML,
+    for a VarsDictProperty with json_field='variables_json' to use instead of
+    parsing YAML.
+    '''
+
+    class Meta:
+        abstract = True
+
+    # The digest of the variables and their JSON text, or blank if they are
+    # JSON already; see VarsDictProperty.
+    variables_json = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+    )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields', [])
+        if not update_fields or 'variables' in update_fields:
+            self.variables_json = VarsDictProperty.get_json_field_value(self.variables, self.variables_json)
+            if update_fields and 'variables_json' not in update_fields:
+                update_fields.append('variables_json')
+        super(ParsedVariablesMixin, self).save(*args, **kwargs)
@@ -3,14 +3,18 @@
 
 # Python
 import datetime
+import json
+import logging
 import os
+import shutil
+import tempfile
 import urlparse
 
 # Django
 from django.conf import settings
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
-from django.utils.encoding import smart_str, smart_text
+from django.utils.encoding import smart_str
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now, make_aware, get_default_timezone
@@ -25,8 +29,8 @@ from awx.main.models.notifications import (
 )
 from awx.main.models.unified_jobs import * # noqa
 from awx.main.models.mixins import ResourceMixin, TaskManagerProjectUpdateMixin
-from awx.main.utils import update_scm_url
-from awx.main.utils.ansible import skip_directory, could_be_inventory, could_be_playbook
+from awx.main.utils import update_scm_url, link_copy_tree
+from awx.main.utils.ansible import scan_project_files
 from awx.main.fields import ImplicitRoleField
 from awx.main.models.rbac import (
     ROLE_SINGLETON_SYSTEM_ADMINISTRATOR,
@@ -36,6 +40,8 @@ from awx.main.fields import JSONField
 
 __all__ = ['Project', 'ProjectUpdate']
 
+logger = logging.getLogger('awx.main.models.projects')
+
 
 class ProjectOptions(models.Model):
 
@@ -177,40 +183,55 @@ class ProjectOptions(models.Model):
             if not check_if_exists or os.path.exists(smart_str(proj_path)):
                 return proj_path
 
-    @property
-    def playbooks(self):
-        results = []
+    def get_index_file(self):
+        '''
+        Path of the node-local index of the playbooks and inventory files
+        found in the project path, kept next to it like the lock file.
+        '''
+        proj_path = self.get_project_path(check_if_exists=False)
+        if not proj_path:
+            return None
+        return proj_path + '.index'
+
+    def scan_project_files(self):
+        '''
+        Return the (playbooks, inventories) found in the project path.  Only
+        files added or changed since the last scan on this node are read.
+        '''
         project_path = self.get_project_path()
-        if project_path:
-            for dirpath, dirnames, filenames in os.walk(smart_str(project_path)):
-                if skip_directory(dirpath):
-                    continue
-                for filename in filenames:
-                    playbook = could_be_playbook(project_path, dirpath, filename)
-                    if playbook is not None:
-                        results.append(smart_text(playbook))
-        return sorted(results, key=lambda x: smart_str(x).lower())
+        if not project_path:
+            return [], []
+        index_file = smart_str(self.get_index_file())
+        try:
+            with open(index_file, 'r') as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            index = None
+        if not isinstance(index, dict):
+            index = None
+        playbooks, inventories, new_index = scan_project_files(
+            project_path, index, max_bytes=getattr(settings, 'AWX_PROJECT_SCAN_MAX_BYTES', None))
+        if new_index != index:
+            try:
+                tmp_file = '{}.{}.tmp'.format(index_file, os.getpid())
+                with open(tmp_file, 'w') as f:
+                    json.dump(new_index, f)
+                os.rename(tmp_file, index_file)
+            except (IOError, OSError) as e:
+                logger.warning('Could not write project index {}: {}'.format(index_file, e))
+        # Cap the number of inventory results, because it could include lots
+        max_inventory_listing = 50
+        inventories = inventories[:max_inventory_listing]
+        return (sorted(playbooks, key=lambda x: smart_str(x).lower()),
+                sorted(inventories, key=lambda x: smart_str(x).lower()))
 
+    @property
+    def playbooks(self):
+        return self.scan_project_files()[0]
 
     @property
     def inventories(self):
-        results = []
-        project_path = self.get_project_path()
-        if project_path:
-            # Cap the number of results, because it could include lots
-            max_inventory_listing = 50
-            for dirpath, dirnames, filenames in os.walk(smart_str(project_path)):
-                if skip_directory(dirpath):
-                    continue
-                for filename in filenames:
-                    inv_path = could_be_inventory(project_path, dirpath, filename)
-                    if inv_path is not None:
-                        results.append(smart_text(inv_path))
-                        if len(results) > max_inventory_listing:
-                            break
-                if len(results) > max_inventory_listing:
-                    break
-        return sorted(results, key=lambda x: smart_str(x).lower())
+        return self.scan_project_files()[1]
 
     def get_lock_file(self):
         '''
@@ -222,6 +243,106 @@ class ProjectOptions(models.Model):
             return None
         return proj_path + '.lock'
 
+    def get_revision_file(self):
+        '''
+        Path of the node-local record of the revision last fully checked out
+        into the project path by a sync project update.
+        '''
+        proj_path = self.get_project_path(check_if_exists=False)
+        if not proj_path:
+            return None
+        return proj_path + '.revision'
+
+    def get_local_scm_revision(self):
+        '''
+        Return the revision recorded for this node's checkout, or None if the
+        checkout has not been synced (or was changed by a check update since).
+        '''
+        revision_file = self.get_revision_file()
+        if not revision_file:
+            return None
+        try:
+            with open(smart_str(revision_file), 'r') as f:
+                return f.read().strip() or None
+        except (IOError, OSError):
+            return None
+
+    def set_local_scm_revision(self, revision):
+        revision_file = self.get_revision_file()
+        if not revision_file:
+            return
+        if not revision:
+            if os.path.exists(smart_str(revision_file)):
+                os.remove(smart_str(revision_file))
+            return
+        with open(smart_str(revision_file), 'w') as f:
+            f.write(revision)
+
+    def get_snapshot_root(self):
+        '''
+        Directory holding the per-revision snapshots of this
+        project's checkout on this node.
+        '''
+        local_path = os.path.basename(self.local_path)
+        if not local_path or local_path.startswith('.'):
+            return None
+        return os.path.join(settings.PROJECTS_ROOT, '.__awx_snapshots', local_path)
+
+    def get_snapshot_path(self, revision, check_if_exists=True):
+        snapshot_root = self.get_snapshot_root()
+        if not snapshot_root or not revision or os.sep in revision or revision.startswith('.'):
+            return None
+        snapshot_path = os.path.join(snapshot_root, revision)
+        if not check_if_exists or os.path.isdir(smart_str(snapshot_path)):
+            return snapshot_path
+
+    def create_snapshot(self, revision):
+        '''
+        Snapshot the current checkout as the given revision.  Files are
+        hardlinked, and the snapshot only becomes visible once it is complete,
+        so jobs can run from it while the checkout itself moves on.
+        '''
+        snapshot_path = self.get_snapshot_path(revision, check_if_exists=False)
+        project_path = self.get_project_path()
+        if not snapshot_path or not project_path:
+            return None
+        if os.path.isdir(smart_str(snapshot_path)):
+            return snapshot_path
+        snapshot_root = self.get_snapshot_root()
+        if not os.path.isdir(smart_str(snapshot_root)):
+            os.makedirs(smart_str(snapshot_root))
+        tmp_path = tempfile.mkdtemp(prefix='.tmp_', dir=smart_str(snapshot_root))
+        try:
+            link_copy_tree(project_path, tmp_path, ignore_dirs=('.git', '.hg', '.svn'))
+            os.rename(tmp_path, smart_str(snapshot_path))
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(smart_str(snapshot_path)):
+                raise
+        return snapshot_path
+
+    def prune_snapshots(self, keep, in_use=()):
+        '''
+        Remove all but the `keep` most recently used snapshots, never removing
+        the revisions listed in `in_use`.
+        '''
+        snapshot_root = self.get_snapshot_root()
+        if not snapshot_root or not os.path.isdir(smart_str(snapshot_root)):
+            return []
+        snapshots = []
+        for name in os.listdir(smart_str(snapshot_root)):
+            path = os.path.join(smart_str(snapshot_root), name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            snapshots.append((os.path.getmtime(path), name, path))
+        removed = []
+        for mtime, name, path in sorted(snapshots, reverse=True)[keep:]:
+            if name in in_use:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+        return removed
+
 
 class Project(UnifiedJobTemplate, ProjectOptions, ResourceMixin):
     '''
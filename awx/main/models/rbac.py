@@ -6,8 +6,11 @@ import logging
 import threading
 import contextlib
 import re
+import uuid
 
 # Django
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models, transaction, connection
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -22,6 +25,9 @@ __all__ = [
     'Role',
     'batch_role_ancestor_rebuilding',
     'get_roles_on_resource',
+    'get_cached_accessible_ids',
+    'expire_accessible_ids',
+    'prefetch_role_membership',
     'ROLE_SINGLETON_SYSTEM_ADMINISTRATOR',
     'ROLE_SINGLETON_SYSTEM_AUDITOR',
     'role_summary_fields_generator'
@@ -149,6 +155,9 @@ class Role(models.Model):
 
     def __contains__(self, accessor):
         if type(accessor) == User:
+            membership_cache = getattr(self, '_user_membership_cache', {})
+            if accessor.pk in membership_cache:
+                return membership_cache[accessor.pk]
             return self.ancestors.filter(members=accessor).exists()
         elif accessor.__class__.__name__ == 'Team':
             return self.ancestors.filter(pk=accessor.member_role.id).exists()
@@ -268,6 +277,12 @@ class Role(models.Model):
             getattr(tls, 'removals').update(set(removals))
             return
 
+        # Users who are members of an ancestor of these roles, before or after
+        # the rebuild, may gain or lose access to objects through them.
+        changed_role_ids = list(set(additions) | set(removals))
+        affected_user_ids = Role._get_ancestor_member_ids(changed_role_ids)
+        any_changes = False
+
         cursor = connection.cursor()
         loop_ct = 0
 
@@ -353,6 +368,7 @@ class Role(models.Model):
 
                 if insert_ct == 0 and delete_ct == 0:
                     break
+                any_changes = True
 
                 new_additions = set()
                 for ids in split_ids_for_sqlite(additions):
@@ -370,6 +386,19 @@ class Role(models.Model):
                     new_removals.update([row[0] for row in cursor.fetchall()])
                 removals = list(new_removals)
 
+        if any_changes:
+            affected_user_ids.update(Role._get_ancestor_member_ids(changed_role_ids))
+            expire_accessible_ids(affected_user_ids)
+
+    @staticmethod
+    def _get_ancestor_member_ids(role_ids):
+        user_ids = set()
+        for offset in xrange(0, len(role_ids), 500):
+            ancestor_qs = RoleAncestorEntry.objects.filter(
+                descendent_id__in=role_ids[offset:(offset + 500)]).values('ancestor_id')
+            user_ids.update(Role.members.through.objects.filter(
+                role_id__in=ancestor_qs).values_list('user_id', flat=True).distinct())
+        return user_ids
 
     @staticmethod
     def visible_roles(user):
@@ -424,6 +453,111 @@ class RoleAncestorEntry(models.Model):
     object_id       = models.PositiveIntegerField(null=False)
 
 
+def _accessible_ids_version_key(user_id):
+    return 'rbac-accessible-ids-version-{}'.format(user_id)
+
+
+def get_cached_accessible_ids(user, role_field, content_type_ids, pk_qs):
+    '''
+    Return the ids of the objects of the given content types on which user
+    has role_field, from a cache kept per user and invalidated whenever the
+    roles of the user or their ancestry change (see expire_accessible_ids).
+    pk_qs is the query for the ids, run on a cache miss.  Return None if
+    there are more than AWX_ACCESSIBLE_IDS_CACHE_MAX ids, for pk_qs to be
+    used as a subquery instead.
+    '''
+    if not settings.AWX_ACCESSIBLE_IDS_CACHE_MAX or not user.pk:
+        return None
+    version_key = _accessible_ids_version_key(user.pk)
+    cache.add(version_key, uuid.uuid4().hex, None)
+    version = cache.get(version_key)
+    if version is None:
+        return None
+    ids_key = 'rbac-accessible-ids-{}-{}-{}-{}'.format(
+        user.pk, version, role_field, '.'.join(str(x) for x in sorted(content_type_ids)))
+    ids = cache.get(ids_key)
+    if ids is None:
+        ids = list(pk_qs.values_list('object_id', flat=True)[:settings.AWX_ACCESSIBLE_IDS_CACHE_MAX + 1])
+        if len(ids) > settings.AWX_ACCESSIBLE_IDS_CACHE_MAX:
+            ids = False
+        cache.set(ids_key, ids, settings.AWX_ACCESSIBLE_IDS_CACHE_TIMEOUT)
+    return ids if ids is not False else None
+
+
+def expire_accessible_ids(user_ids):
+    '''
+    Invalidate the cached accessible object ids of the given users, now and
+    again once the current transaction commits (so that ids cached from the
+    uncommitted state in the meantime are not used either).
+    '''
+    version_keys = [_accessible_ids_version_key(user_id) for user_id in user_ids]
+    if not version_keys:
+        return
+
+    def expire():
+        cache.set_many(dict((key, uuid.uuid4().hex) for key in version_keys), None)
+
+    expire()
+    connection.on_commit(expire)
+
+
+def prefetch_role_membership(user, objs):
+    '''
+    Load the implicit roles of objs, and of the related objects already
+    cached on them (select_related or prefetch_related), in two queries and
+    record on each role whether user holds it, so that checks like
+    `user in obj.inventory.admin_role` made afterwards on these instances do
+    not each query the role ancestry.
+    '''
+    owners = []
+    seen = set()
+
+    def add_owner(obj):
+        if obj is not None and id(obj) not in seen:
+            seen.add(id(obj))
+            owners.append(obj)
+
+    for obj in objs:
+        add_owner(obj)
+        for field in obj._meta.concrete_fields:
+            if field.is_relation and hasattr(obj, field.get_cache_name()):
+                add_owner(getattr(obj, field.get_cache_name()))
+        for related in getattr(obj, '_prefetched_objects_cache', {}).values():
+            for related_obj in related:
+                add_owner(related_obj)
+
+    owner_roles = []
+    role_ids = set()
+    for owner in owners:
+        for field in getattr(type(owner), '__implicit_role_fields', []):
+            # Do not trigger a query per object for deferred role fields
+            role_id = owner.__dict__.get(field.attname)
+            if role_id is not None:
+                owner_roles.append((owner, field, role_id))
+                role_ids.add(role_id)
+    if not role_ids or not user.pk:
+        return
+
+    role_ids = list(role_ids)
+    roles = Role.objects.in_bulk(role_ids)
+    held_role_ids = set()
+    for offset in xrange(0, len(role_ids), 500):
+        held_role_ids.update(RoleAncestorEntry.objects.filter(
+            descendent_id__in=role_ids[offset:(offset + 500)],
+            ancestor__members=user
+        ).values_list('descendent_id', flat=True).distinct())
+
+    for owner, field, role_id in owner_roles:
+        cache_name = field.get_cache_name()
+        role = getattr(owner, cache_name, None) or roles.get(role_id)
+        if role is None:
+            continue
+        setattr(owner, cache_name, role)
+        if '_user_membership_cache' not in role.__dict__:
+            role._user_membership_cache = {}
+        role._user_membership_cache[user.pk] = role_id in held_role_ids
+
+
 def get_roles_on_resource(resource, accessor):
     '''
     Returns a string list of the roles a accessor has for a given resource.
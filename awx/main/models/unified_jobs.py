@@ -38,6 +38,7 @@ from awx.main.utils import (
     copy_model_by_class, copy_m2m_relationships,
     get_type_for_model, parse_yaml_or_json
 )
+from awx.main.utils.pgnotify import pg_notify, CANCEL_CHANNEL
 from awx.main.redact import UriCleaner, REPLACE_STR
 from awx.main.consumers import emit_channel_notification
 from awx.main.fields import JSONField, AskForField
@@ -203,7 +204,7 @@ class UnifiedJobTemplate(PolymorphicModel, CommonModelNameNotUnique, Notificatio
         # do not use this if in a subclass
         if cls != UnifiedJobTemplate:
             return super(UnifiedJobTemplate, cls).accessible_pk_qs(accessor, role_field)
-        return ResourceMixin._accessible_pk_qs(
+        return ResourceMixin._accessible_pks(
             cls, accessor, role_field, content_types=cls._submodels_with_roles())
 
     def _perform_unique_checks(self, unique_checks):
@@ -1252,8 +1253,8 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
         self.update_fields(start_args=json.dumps(kwargs), status='pending')
         self.websocket_emit_status("pending")
 
-        from awx.main.scheduler.tasks import run_job_launch
-        connection.on_commit(lambda: run_job_launch.delay(self.id))
+        from awx.main.scheduler.tasks import schedule_job_launch
+        connection.on_commit(lambda: schedule_job_launch(self.id))
 
         # Each type of unified job has a different Task class; get the
         # appropirate one.
@@ -1330,6 +1331,10 @@ class UnifiedJob(PolymorphicModel, PasswordFieldsModel, CommonModelNameNotUnique
                     self.job_explanation = job_explanation
                     cancel_fields.append('job_explanation')
                 self.save(update_fields=cancel_fields)
+                if self.status == 'running':
+                    # Wake up the task running this job so it notices the
+                    # cancel without waiting for its next database poll.
+                    pg_notify(CANCEL_CHANNEL, str(self.pk))
                 self.websocket_emit_status("canceled")
             if settings.CELERY_BROKER_URL.startswith('amqp://'):
                 self._force_cancel()
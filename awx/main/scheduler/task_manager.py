@@ -47,6 +47,11 @@ from celery.app.control import Inspect
 
 logger = logging.getLogger('awx.main.scheduler')
 
+# Set by every task manager pass before it tries the lock, and cleared by the
+# pass that acquires it; still being set when that pass finishes means another
+# pass was requested while it ran.
+TASK_MANAGER_DIRTY_KEY = 'awx_task_manager_dirty'
+
 
 class TaskManager():
 
@@ -621,8 +626,9 @@ class TaskManager():
             with advisory_lock('task_manager_lock', wait=False) as acquired:
                 if acquired is False:
                     logger.debug("Not running scheduler, another task holds lock")
-                    return
+                    return False
                 logger.debug("Starting Scheduler")
+                cache.delete(TASK_MANAGER_DIRTY_KEY)
 
                 self.cleanup_inconsistent_celery_tasks()
                 finished_wfjs = self._schedule()
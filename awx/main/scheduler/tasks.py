@@ -2,11 +2,16 @@
 # Python
 import logging
 
+# Django
+from django.conf import settings
+from django.core.cache import cache
+
 # Celery
 from celery import Task, shared_task
 
 # AWX
 from awx.main.scheduler import TaskManager
+from awx.main.scheduler.task_manager import TASK_MANAGER_DIRTY_KEY
 
 logger = logging.getLogger('awx.main.scheduler')
 
@@ -14,6 +19,10 @@ logger = logging.getLogger('awx.main.scheduler')
 # Would we need the request loop then? I think so. Even if we get the in-memory
 # updated model, the call to schedule() may get stale data.
 
+# Set while a task manager pass is queued but has not started yet; any further
+# launch/complete notifications are folded into that pass.
+TASK_MANAGER_PENDING_KEY = 'awx_task_manager_pending'
+
 
 class LogErrorsTask(Task):
     def on_failure(self, exc, task_id, args, kwargs, einfo):
@@ -21,17 +30,58 @@ class LogErrorsTask(Task):
         super(LogErrorsTask, self).on_failure(exc, task_id, args, kwargs, einfo)
 
 
+def _queue_task_manager(task, job_id):
+    if cache.add(TASK_MANAGER_PENDING_KEY, job_id, settings.AWX_TASK_MANAGER_PENDING_TIMEOUT):
+        task.delay(job_id)
+    else:
+        logger.debug("Task manager pass already pending, coalescing request for job {}".format(job_id))
+
+
+def schedule_job_launch(job_id):
+    '''
+    Request a task manager pass after a job launch.  At most one pass is
+    queued at a time, and that pass picks up every change made before it runs.
+    '''
+    _queue_task_manager(run_job_launch, job_id)
+
+
+def schedule_job_complete(job_id):
+    '''
+    Request a task manager pass after a job finishes; see schedule_job_launch.
+    '''
+    _queue_task_manager(run_job_complete, job_id)
+
+
+def _run_pending_task_manager(job_id):
+    # Clear the pending flag before scheduling so that changes made while this
+    # pass runs queue a fresh one.
+    cache.delete(TASK_MANAGER_PENDING_KEY)
+    _run_task_manager(job_id)
+
+
+def _run_task_manager(job_id=None):
+    # Mark the scheduler dirty before trying the lock.  The pass holding the
+    # lock clears the flag as soon as it acquires it, so if the flag is set
+    # again once it is done, a pass that could not get the lock was requested
+    # during the run, and one more run is queued for it.
+    cache.set(TASK_MANAGER_DIRTY_KEY, True, None)
+    if TaskManager().schedule() is False:
+        return
+    if cache.get(TASK_MANAGER_DIRTY_KEY):
+        schedule_job_complete(job_id)
+
+
 @shared_task
 def run_job_launch(job_id):
-    TaskManager().schedule()
+    _run_pending_task_manager(job_id)
 
 
 @shared_task
 def run_job_complete(job_id):
-    TaskManager().schedule()
+    _run_pending_task_manager(job_id)
 
 
 @shared_task(base=LogErrorsTask)
 def run_task_manager():
     logger.debug("Running Tower task manager.")
-    TaskManager().schedule()
+    _run_task_manager()
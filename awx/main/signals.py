@@ -21,7 +21,7 @@ from awx.main.models import * # noqa
 from awx.api.serializers import * # noqa
 from awx.main.utils import model_instance_diff, model_to_dict, camelcase_to_underscore
 from awx.main.utils import ignore_inventory_computed_fields, ignore_inventory_group_removal, _inventory_updates
-from awx.main.tasks import update_inventory_computed_fields
+from awx.main.tasks import schedule_update_inventory_computed_fields
 from awx.main.fields import is_implicit_parent
 
 from awx.main import consumers
@@ -74,6 +74,28 @@ def emit_system_job_event_detail(sender, **kwargs):
     emit_event_detail(SystemJobEventWebSocketSerializer, 'system_job_id', **kwargs)
 
 
+def _m2m_computed_fields_delta(sender, instance, **kwargs):
+    '''
+    Return the (host_ids, group_ids) whose computed fields may change because
+    of an m2m change, or (None, None) if that is not known.
+    '''
+    pk_set = kwargs.get('pk_set')
+    if pk_set is None:
+        # post_clear does not say what was removed.
+        return None, None
+    if sender == Group.parents.through:
+        return set(), set(pk_set) | set([instance.pk])
+    if sender == Group.hosts.through:
+        if kwargs.get('reverse'):
+            return set([instance.pk]), set(pk_set)
+        return set(pk_set), set([instance.pk])
+    if sender == Host.inventory_sources.through:
+        return (set(pk_set), set()) if kwargs.get('reverse') else (set([instance.pk]), set())
+    if sender == Group.inventory_sources.through:
+        return (set(), set(pk_set)) if kwargs.get('reverse') else (set(), set([instance.pk]))
+    return None, None
+
+
 def emit_update_inventory_computed_fields(sender, **kwargs):
     logger.debug("In update inventory computed fields")
     if getattr(_inventory_updates, 'is_updating', False):
@@ -101,12 +123,16 @@ def emit_update_inventory_computed_fields(sender, **kwargs):
         return
     logger.debug('%s %s, updating inventory computed fields: %r %r',
                  sender_name, sender_action, sender, kwargs)
+    if sender_action == 'changed':
+        host_ids, group_ids = _m2m_computed_fields_delta(sender, **kwargs)
+    else:
+        host_ids, group_ids = None, None
     try:
         inventory = instance.inventory
     except Inventory.DoesNotExist:
         pass
     else:
-        update_inventory_computed_fields.delay(inventory.id, True)
+        schedule_update_inventory_computed_fields(inventory.id, True, host_ids=host_ids, group_ids=group_ids)
 
 
 def emit_update_inventory_on_created_or_deleted(sender, **kwargs):
@@ -127,7 +153,13 @@ def emit_update_inventory_on_created_or_deleted(sender, **kwargs):
         pass
     else:
         if inventory is not None:
-            update_inventory_computed_fields.delay(inventory.id, True)
+            host_ids, group_ids = None, None
+            if kwargs['signal'] == post_save:
+                # A new host or group only affects itself; a new job or
+                # inventory source only the inventory-wide counts.
+                host_ids = set([instance.pk]) if isinstance(instance, Host) else set()
+                group_ids = set([instance.pk]) if isinstance(instance, Group) else set()
+            schedule_update_inventory_computed_fields(inventory.id, True, host_ids=host_ids, group_ids=group_ids)
 
 
 def rebuild_role_ancestor_list(reverse, model, instance, pk_set, action, **kwargs):
@@ -145,6 +177,17 @@ def rebuild_role_ancestor_list(reverse, model, instance, pk_set, action, **kwarg
             model.rebuild_role_ancestor_list([], [instance.id])
 
 
+def expire_accessible_ids_on_members_changed(reverse, instance, pk_set, action, **kwargs):
+    'When users are added to or removed from a role, drop their cached accessible object ids'
+    if action in ['post_add', 'post_remove']:
+        user_ids = [instance.pk] if reverse else pk_set
+    elif action == 'pre_clear':
+        user_ids = [instance.pk] if reverse else instance.members.values_list('pk', flat=True)
+    else:
+        return
+    expire_accessible_ids(user_ids)
+
+
 def sync_superuser_status_to_rbac(instance, **kwargs):
     'When the is_superuser flag is changed on a user, reflect that in the membership of the System Admnistrator role'
     update_fields = kwargs.get('update_fields', None)
@@ -217,6 +260,35 @@ def cleanup_detached_labels_on_deleted_parent(sender, instance, **kwargs):
             l.delete()
 
 
+def update_group_closure_on_parents_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    'When a group parent is added or removed, update the group ancestry and host membership closure'
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        group_pks = [instance.pk]
+    elif action == 'post_clear':
+        # The children are gone, but are still the direct descendants in the closure.
+        group_pks = GroupAncestry.objects.filter(ancestor_id=instance.pk, depth=1).values_list('descendant_id', flat=True)
+    else:
+        group_pks = pk_set
+    instance.inventory.update_group_ancestry(group_pks)
+
+
+def update_group_closure_on_hosts_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    'When a group host is added or removed, update the host membership closure'
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        group_pks, host_pks = [instance.pk], pk_set
+    elif action == 'post_clear':
+        group_pks, host_pks = GroupHostMembership.objects.filter(host_id=instance.pk).values_list('group_id', flat=True), [instance.pk]
+    else:
+        group_pks, host_pks = pk_set, [instance.pk]
+    group_pks = set(group_pks)
+    group_pks.update(GroupAncestry.objects.filter(descendant_id__in=group_pks).values_list('ancestor_id', flat=True))
+    instance.inventory.update_group_host_memberships(group_pks, host_pks=host_pks)
+
+
 def connect_computed_field_signals():
     post_save.connect(emit_update_inventory_on_created_or_deleted, sender=Host)
     post_delete.connect(emit_update_inventory_on_created_or_deleted, sender=Host)
@@ -241,7 +313,10 @@ post_save.connect(emit_project_update_event_detail, sender=ProjectUpdateEvent)
 post_save.connect(emit_inventory_update_event_detail, sender=InventoryUpdateEvent)
 post_save.connect(emit_system_job_event_detail, sender=SystemJobEvent)
 m2m_changed.connect(rebuild_role_ancestor_list, Role.parents.through)
+m2m_changed.connect(update_group_closure_on_parents_changed, Group.parents.through)
+m2m_changed.connect(update_group_closure_on_hosts_changed, Group.hosts.through)
 m2m_changed.connect(org_admin_edit_members, Role.members.through)
+m2m_changed.connect(expire_accessible_ids_on_members_changed, Role.members.through)
 m2m_changed.connect(rbac_activity_stream, Role.members.through)
 m2m_changed.connect(rbac_activity_stream, Role.parents.through)
 post_save.connect(sync_superuser_status_to_rbac, sender=User)
@@ -261,6 +336,7 @@ def save_related_pks_before_group_delete(sender, **kwargs):
     instance._saved_parents_pks = set(instance.parents.values_list('pk', flat=True))
     instance._saved_hosts_pks = set(instance.hosts.values_list('pk', flat=True))
     instance._saved_children_pks = set(instance.children.values_list('pk', flat=True))
+    instance._saved_ancestor_pks = set(instance.all_parents.values_list('pk', flat=True))
 
 
 @receiver(post_delete, sender=Group)
@@ -294,6 +370,21 @@ def migrate_children_from_deleted_group_to_parent_groups(sender, **kwargs):
                         pass
 
 
+@receiver(post_delete, sender=Group)
+def update_group_closure_after_group_delete(sender, **kwargs):
+    if getattr(_inventory_updates, 'is_removing', False):
+        return
+    instance = kwargs['instance']
+    try:
+        inventory = Inventory.objects.get(pk=getattr(instance, '_saved_inventory_pk', None))
+    except Inventory.DoesNotExist:
+        return
+    # Rows for the deleted group itself went with it; its children lost it
+    # (and possibly more) as an ancestor, and its ancestors may have lost hosts.
+    inventory.update_group_ancestry(getattr(instance, '_saved_children_pks', []),
+                                    stale_ancestor_pks=getattr(instance, '_saved_ancestor_pks', []))
+
+
 # Update host pointers to last_job and last_job_host_summary when a job is deleted
 
 
@@ -485,6 +576,25 @@ def activity_stream_delete(sender, instance, **kwargs):
     activity_entry.save()
 
 
+def activity_stream_delete_many(sender, queryset):
+    '''
+    Record the deletion of each instance of a queryset, as activity_stream_delete
+    would, for instances deleted in bulk without their pre_delete signals.
+    '''
+    if not activity_stream_enabled:
+        return
+    object1 = camelcase_to_underscore(sender.__name__)
+    actor = get_current_user_or_none()
+    ActivityStream.objects.bulk_create([
+        ActivityStream(
+            operation='delete',
+            changes=json.dumps(model_to_dict(instance)),
+            object1=object1,
+            actor=actor)
+        for instance in queryset.iterator()
+    ])
+
+
 def activity_stream_associate(sender, instance, **kwargs):
     if not activity_stream_enabled:
         return
@@ -4,15 +4,19 @@
 # Python
 from collections import OrderedDict
 import ConfigParser
+import contextlib
 import cStringIO
 import functools
+import glob
 import json
 import logging
 import os
 import re
 import shutil
 import stat
+import subprocess
 import tempfile
+import threading
 import time
 import traceback
 import urlparse
@@ -30,7 +34,7 @@ from celery.signals import celeryd_init, worker_process_init, worker_shutdown
 
 # Django
 from django.conf import settings
-from django.db import transaction, DatabaseError, IntegrityError
+from django.db import connection, transaction, DatabaseError, IntegrityError
 from django.utils.timezone import now, timedelta
 from django.utils.encoding import smart_str
 from django.core.mail import send_mail
@@ -57,6 +61,8 @@ from awx.main.utils import (get_ansible_version, get_ssh_version, decrypt_field,
                             ignore_inventory_computed_fields, ignore_inventory_group_removal,
                             get_type_for_model, extract_ansible_vars)
 from awx.main.utils.reload import restart_local_services, stop_local_services
+from awx.main.utils.ansible import script_data_to_static_inventory
+from awx.main.utils.pgnotify import cancel_notifications
 from awx.main.utils.handlers import configure_external_logger
 from awx.main.consumers import emit_channel_notification
 from awx.conf import settings_registry
@@ -64,6 +70,8 @@ from awx.conf import settings_registry
 __all__ = ['RunJob', 'RunSystemJob', 'RunProjectUpdate', 'RunInventoryUpdate',
            'RunAdHocCommand', 'handle_work_error', 'handle_work_success',
            'update_inventory_computed_fields', 'update_host_smart_inventory_memberships',
+           'schedule_update_host_smart_inventory_memberships', 'update_inventory_host_addresses',
+           'schedule_update_inventory_host_addresses',
            'send_notifications', 'run_administrative_checks', 'purge_old_stdout_files']
 
 HIDDEN_PASSWORD = '**********'
@@ -356,8 +364,8 @@ def handle_work_success(self, result, task_actual):
 
     _send_notification_templates(instance, 'succeeded')
 
-    from awx.main.scheduler.tasks import run_job_complete
-    run_job_complete.delay(instance.id)
+    from awx.main.scheduler.tasks import schedule_job_complete
+    schedule_job_complete(instance.id)
 
 
 @shared_task(queue='tower', base=LogErrorsTask)
@@ -399,48 +407,255 @@ def handle_work_error(task_id, *args, **kwargs):
     # what the job complete message handler does then we may want to send a
     # completion event for each job here.
     if first_instance:
-        from awx.main.scheduler.tasks import run_job_complete
-        run_job_complete.delay(first_instance.id)
+        from awx.main.scheduler.tasks import schedule_job_complete
+        schedule_job_complete(first_instance.id)
         pass
 
 
+def _computed_fields_key(state, inventory_id):
+    return 'awx_inventory_computed_fields_{}_{}'.format(state, inventory_id)
+
+
+@contextlib.contextmanager
+def _refreshed_cache_key(key, timeout):
+    '''
+    Keep `key` set in the cache while the block runs, however long it takes;
+    the timeout only matters if the worker dies without deleting it.
+    '''
+    stop = threading.Event()
+
+    def refresh():
+        while not stop.wait(timeout / 3.0):
+            cache.set(key, True, timeout)
+
+    refresher = threading.Thread(target=refresh)
+    refresher.daemon = True
+    refresher.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        refresher.join()
+
+
+def _acquire_computed_fields_delta_lock(inventory_id):
+    lock_key = _computed_fields_key('delta_lock', inventory_id)
+    for attempt in range(50):
+        if cache.add(lock_key, True, 5):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _merge_computed_fields_delta(inventory_id, host_ids=None, group_ids=None):
+    '''
+    Record the hosts and groups whose changes the next recompute of this
+    inventory has to account for.  Passing neither (or a delta that cannot be
+    recorded) marks the inventory for a full recompute.
+    '''
+    delta_key = _computed_fields_key('delta', inventory_id)
+    if host_ids is None and group_ids is None:
+        cache.set(delta_key, 'full', None)
+        return
+    if not _acquire_computed_fields_delta_lock(inventory_id):
+        cache.set(delta_key, 'full', None)
+        return
+    try:
+        delta = cache.get(delta_key)
+        if delta is None or delta == 'full':
+            # Never recorded (or evicted), so earlier changes may be missing.
+            cache.set(delta_key, 'full', None)
+            return
+        delta.setdefault('hosts', set()).update(host_ids or [])
+        delta.setdefault('groups', set()).update(group_ids or [])
+        if len(delta['hosts']) + len(delta['groups']) > settings.AWX_INVENTORY_COMPUTED_FIELDS_MAX_DELTA:
+            delta = 'full'
+        cache.set(delta_key, delta, None)
+    finally:
+        cache.delete(_computed_fields_key('delta_lock', inventory_id))
+
+
+def _pop_computed_fields_delta(inventory_id):
+    '''
+    Return (host_ids, group_ids) changed since the last recompute of this
+    inventory and start a new delta, or (None, None) if everything has to be
+    recomputed.
+    '''
+    if not _acquire_computed_fields_delta_lock(inventory_id):
+        # Leave the delta for the next run; recomputing everything is safe.
+        return None, None
+    try:
+        delta = cache.get(_computed_fields_key('delta', inventory_id))
+        cache.set(_computed_fields_key('delta', inventory_id), {}, None)
+    finally:
+        cache.delete(_computed_fields_key('delta_lock', inventory_id))
+    if delta is None or delta == 'full':
+        return None, None
+    return delta.get('hosts', set()), delta.get('groups', set())
+
+
+def schedule_update_inventory_computed_fields(inventory_id, should_update_hosts=True, host_ids=None, group_ids=None):
+    '''
+    Request a recompute of an inventory's computed fields once the current
+    transaction commits.  At most one recompute per inventory is queued at a
+    time; requests made while one is queued (or while one is running and
+    another is already queued) are merged into it.
+
+    host_ids and group_ids name the hosts and groups that changed, so that
+    only the affected hosts and groups are recomputed; when both are omitted
+    the whole inventory is.  They are only recorded on commit, so that a
+    recompute cannot consume them before the changes are visible to it.
+    '''
+    def on_commit():
+        timeout = settings.AWX_INVENTORY_COMPUTED_FIELDS_PENDING_TIMEOUT
+        _merge_computed_fields_delta(inventory_id, host_ids, group_ids)
+        if cache.add(_computed_fields_key('pending', inventory_id), True, timeout):
+            update_inventory_computed_fields.delay(inventory_id, should_update_hosts)
+            return
+        if should_update_hosts:
+            cache.set(_computed_fields_key('hosts', inventory_id), True, timeout)
+        # counted for the log message of the next run
+        merged_key = _computed_fields_key('merged', inventory_id)
+        cache.add(merged_key, 0, timeout)
+        try:
+            cache.incr(merged_key)
+        except ValueError:
+            # the counter was reset since it was added
+            pass
+        logger.debug('Inventory {} computed fields update already pending, merging request.'.format(inventory_id))
+    connection.on_commit(on_commit)
+
+
 @shared_task(queue='tower', base=LogErrorsTask)
 def update_inventory_computed_fields(inventory_id, should_update_hosts=True):
     '''
     Signal handler and wrapper around inventory.update_computed_fields to
     prevent unnecessary recursive calls.
     '''
+    timeout = settings.AWX_INVENTORY_COMPUTED_FIELDS_PENDING_TIMEOUT
+    # Clear the pending flag first so that changes made from now on queue a
+    # follow-up run.
+    cache.delete(_computed_fields_key('pending', inventory_id))
+    if cache.get(_computed_fields_key('hosts', inventory_id)):
+        cache.delete(_computed_fields_key('hosts', inventory_id))
+        should_update_hosts = True
+    merged = cache.get(_computed_fields_key('merged', inventory_id)) or 0
+    cache.delete(_computed_fields_key('merged', inventory_id))
+
+    running_key = _computed_fields_key('running', inventory_id)
+    if not cache.add(running_key, True, timeout):
+        # Another worker is recomputing this inventory; it runs once more
+        # when it finishes.
+        cache.set(_computed_fields_key('dirty', inventory_id), True, timeout)
+        if should_update_hosts:
+            cache.set(_computed_fields_key('hosts', inventory_id), True, timeout)
+        return
+    try:
+        with _refreshed_cache_key(running_key, timeout):
+            _update_inventory_computed_fields(inventory_id, should_update_hosts, merged)
+    finally:
+        cache.delete(running_key)
+        if cache.get(_computed_fields_key('dirty', inventory_id)):
+            cache.delete(_computed_fields_key('dirty', inventory_id))
+            schedule_update_inventory_computed_fields(inventory_id, False, host_ids=(), group_ids=())
+
+
+def _update_inventory_computed_fields(inventory_id, should_update_hosts, merged):
     i = Inventory.objects.filter(id=inventory_id)
     if not i.exists():
         logger.error("Update Inventory Computed Fields failed due to missing inventory: " + str(inventory_id))
         return
     i = i[0]
+    host_ids, group_ids = _pop_computed_fields_delta(inventory_id)
+    logger.debug('Updating inventory {} computed fields ({} merged requests, {}).'.format(
+        inventory_id, merged,
+        'full' if host_ids is None else '{} hosts, {} groups'.format(len(host_ids), len(group_ids))))
     try:
-        i.update_computed_fields(update_hosts=should_update_hosts)
+        i.update_computed_fields(update_hosts=should_update_hosts, host_ids=host_ids, group_ids=group_ids)
     except DatabaseError as e:
         if 'did not affect any rows' in str(e):
             logger.debug('Exiting duplicate update_inventory_computed_fields task.')
+            # Put the popped delta back for the next run.
+            _merge_computed_fields_delta(inventory_id, host_ids, group_ids)
             return
+        # The popped delta is lost; make the next run recompute everything.
+        _merge_computed_fields_delta(inventory_id)
+        raise
+    except Exception:
+        _merge_computed_fields_delta(inventory_id)
         raise
 
 
+_smart_membership_changes = threading.local()
+
+
+def schedule_update_host_smart_inventory_memberships(host_names=None, inventory_id=None):
+    '''
+    Request an update of smart inventory memberships once the current
+    transaction commits.  Requests made in one transaction are merged into
+    a single task.
+
+    host_names names the hosts that were created, changed or deleted, so
+    that only those names are re-evaluated against each smart inventory;
+    inventory_id names a smart inventory whose host_filter changed.  When
+    both are omitted (or too many hosts changed) every membership is
+    reconciled.
+    '''
+    if not settings.AWX_REBUILD_SMART_MEMBERSHIP:
+        return
+    changes = getattr(_smart_membership_changes, 'changes', None)
+    if changes is None:
+        changes = _smart_membership_changes.changes = {'host_names': set(), 'inventory_ids': set()}
+    if changes != 'full':
+        if host_names is None and inventory_id is None:
+            changes = 'full'
+        else:
+            changes['host_names'].update(host_names or [])
+            if inventory_id is not None:
+                changes['inventory_ids'].add(inventory_id)
+            if len(changes['host_names']) > settings.AWX_SMART_MEMBERSHIP_MAX_HOSTS:
+                changes = 'full'
+        _smart_membership_changes.changes = changes
+
+    def on_commit():
+        # The first callback to run sends every change made so far; changes
+        # left over from a rolled back transaction are harmlessly re-checked.
+        changes = getattr(_smart_membership_changes, 'changes', None)
+        _smart_membership_changes.changes = None
+        if changes == 'full':
+            update_host_smart_inventory_memberships.delay()
+        elif changes:
+            if changes['host_names']:
+                update_host_smart_inventory_memberships.delay(host_names=sorted(changes['host_names']))
+            for inventory_id in sorted(changes['inventory_ids']):
+                update_host_smart_inventory_memberships.delay(inventory_id=inventory_id)
+    connection.on_commit(on_commit)
+
+
 @shared_task(queue='tower', base=LogErrorsTask)
-def update_host_smart_inventory_memberships():
+def update_host_smart_inventory_memberships(host_names=None, inventory_id=None):
+    '''
+    Reconcile the SmartInventoryMembership rows of every smart inventory
+    with its host_filter or, given the names of the hosts that changed (or
+    a smart inventory whose host_filter changed), only those rows.  Also
+    run periodically to catch changes made without a request.
+    '''
+    if not settings.AWX_REBUILD_SMART_MEMBERSHIP:
+        return
+    changed_inventories = []
     try:
         with transaction.atomic():
             smart_inventories = Inventory.objects.filter(kind='smart', host_filter__isnull=False, pending_deletion=False)
-            SmartInventoryMembership.objects.all().delete()
-            memberships = []
-            changed_inventories = set([])
+            if inventory_id is not None:
+                smart_inventories = smart_inventories.filter(pk=inventory_id)
+                host_names = None
+            elif host_names is None:
+                # Inventories that are no longer smart (or have no filter).
+                SmartInventoryMembership.objects.exclude(
+                    inventory_id__in=smart_inventories.values('pk')).delete()
             for smart_inventory in smart_inventories:
-                add_for_inventory = [
-                    SmartInventoryMembership(inventory_id=smart_inventory.id, host_id=host_id[0])
-                    for host_id in smart_inventory.hosts.values_list('id')
-                ]
-                memberships.extend(add_for_inventory)
-                if add_for_inventory:
-                    changed_inventories.add(smart_inventory)
-            SmartInventoryMembership.objects.bulk_create(memberships)
+                if smart_inventory.update_smart_inventory_memberships(host_names=host_names):
+                    changed_inventories.append(smart_inventory)
     except IntegrityError as e:
         logger.error("Update Host Smart Inventory Memberships failed due to an exception: " + str(e))
         return
@@ -449,6 +664,34 @@ def update_host_smart_inventory_memberships():
         smart_inventory.update_computed_fields(update_groups=False, update_hosts=False)
 
 
+def schedule_update_inventory_host_addresses(inventory_id):
+    '''
+    Request a refresh of an inventory's host addresses if any were resolved
+    longer ago than AWX_CALLBACK_ADDRESS_TTL, unless one is already pending.
+    '''
+    ttl = settings.AWX_CALLBACK_ADDRESS_TTL
+    stale_qs = HostAddress.objects.filter(inventory_id=inventory_id, is_name=True,
+                                          resolved__lt=now() - timedelta(seconds=ttl))
+    if stale_qs.exists() and cache.add('inventory-{}-host-addresses-pending'.format(inventory_id), True, ttl):
+        update_inventory_host_addresses.delay(inventory_id)
+
+
+@shared_task(queue='tower', base=LogErrorsTask)
+def update_inventory_host_addresses(inventory_id):
+    '''
+    Refresh the HostAddress rows used to match provisioning callbacks to the
+    hosts of an inventory, re-resolving names resolved longer ago than
+    AWX_CALLBACK_ADDRESS_TTL.
+    '''
+    cache.delete('inventory-{}-host-addresses-pending'.format(inventory_id))
+    try:
+        inventory = Inventory.objects.get(pk=inventory_id)
+    except Inventory.DoesNotExist:
+        return
+    inventory.update_host_address_names()
+    inventory.resolve_host_addresses(max_age=settings.AWX_CALLBACK_ADDRESS_TTL)
+
+
 @shared_task(bind=True, queue='tower', base=LogErrorsTask, max_retries=5)
 def delete_inventory(self, inventory_id, user_id):
     # Delete inventory as user
@@ -462,7 +705,13 @@ def delete_inventory(self, inventory_id, user_id):
     with ignore_inventory_computed_fields(), ignore_inventory_group_removal(), impersonate(user):
         try:
             i = Inventory.objects.get(id=inventory_id)
-            i.delete()
+
+            def log_progress(model, deleted, total):
+                logger.info('Deleted {} of {} {} of inventory {}.'.format(
+                    deleted, total, model._meta.verbose_name_plural, inventory_id))
+
+            i.delete_in_bulk(progress=log_progress)
+            purge_static_inventory_cache.delay(inventory_id)
             emit_channel_notification(
                 'inventories-status_changed',
                 {'group_name': 'inventories', 'inventory_id': inventory_id, 'status': 'deleted'}
@@ -476,6 +725,29 @@ def delete_inventory(self, inventory_id, user_id):
             self.retry(countdown=10)
 
 
+def remove_static_inventory_cache(inventory_id):
+    '''
+    Remove the static inventory files cached on this node for an inventory.
+    '''
+    cache_root = getattr(settings, 'AWX_INVENTORY_CACHE_ROOT', None)
+    if not cache_root:
+        return
+    for path in glob.glob(os.path.join(cache_root, '{}_*.json'.format(inventory_id))):
+        try:
+            os.remove(path)
+        except OSError:
+            logger.exception('Could not remove cached static inventory {}.'.format(path))
+
+
+@shared_task(queue='tower_broadcast_all', base=LogErrorsTask)
+def purge_static_inventory_cache(inventory_id):
+    '''
+    Remove the static inventory files (which hold host variables) cached on
+    every node for a deleted inventory.
+    '''
+    remove_static_inventory_cache(inventory_id)
+
+
 def with_path_cleanup(f):
     @functools.wraps(f)
     def _wrapped(self, *args, **kwargs):
@@ -494,6 +766,52 @@ def with_path_cleanup(f):
     return _wrapped
 
 
+class CancelWatcher(object):
+    '''
+    Cancel callback for run_pexpect.  The job's cancel_flag is only read from
+    the database when a cancel notification arrives (Postgres LISTEN/NOTIFY),
+    or every AWX_CANCEL_POLL_INTERVAL seconds as a fallback.  Notifications
+    for all jobs in this worker arrive over one shared connection (see
+    PGNotificationDispatcher).  Without notification support, or once that
+    connection is lost, it reads the flag on every call.
+    '''
+
+    def __init__(self, task, pk):
+        self.task = task
+        self.pk = pk
+        self.listening = cancel_notifications.register(str(pk))
+        self.last_poll = 0
+
+    def __call__(self):
+        if self.listening:
+            notified = cancel_notifications.received(str(self.pk))
+            if notified is None:
+                logger.warning('Lost cancel notifications for job {}, '
+                               'falling back to polling.'.format(self.pk))
+                self.close()
+                return self.task.update_model(self.pk).cancel_flag
+            poll_interval = getattr(settings, 'AWX_CANCEL_POLL_INTERVAL', 30)
+            if not notified and time.time() - self.last_poll < poll_interval:
+                return False
+        self.last_poll = time.time()
+        return self.task.update_model(self.pk).cancel_flag
+
+    def close(self):
+        if self.listening:
+            cancel_notifications.unregister(str(self.pk))
+            self.listening = False
+
+
+def project_snapshots_enabled():
+    '''
+    Whether jobs run from per-revision project snapshots.  Snapshot files are
+    hardlinked to the shared checkout, so they are only used when jobs run
+    under process isolation, where the snapshot is mounted read-only.
+    '''
+    return bool(getattr(settings, 'AWX_PROJECT_SNAPSHOTS_ENABLED', False) and
+                getattr(settings, 'AWX_PROOT_ENABLED', False))
+
+
 class BaseTask(LogErrorsTask):
     name = None
     model = None
@@ -689,11 +1007,71 @@ class BaseTask(LogErrorsTask):
         '''
         return False
 
+    def use_static_inventory(self, **kwargs):
+        '''
+        Whether the local Ansible can read a static JSON inventory file (via
+        the yaml inventory plugin) instead of an executable script.
+        '''
+        if kwargs.get('isolated') or not getattr(settings, 'AWX_STATIC_INVENTORY_ENABLED', False):
+            return False
+        ansible_version = kwargs.get('ansible_version') or get_ansible_version()
+        try:
+            return Version(ansible_version.split()[0]) >= Version('2.4')
+        except (ValueError, IndexError, AttributeError):
+            return False
+
+    def build_static_inventory(self, inventory, **kwargs):
+        '''
+        Write the inventory as a static JSON file in the private data dir,
+        reusing a node-local cached copy keyed by the inventory content
+        version when one exists.  Returns None if the inventory cannot be
+        represented statically.
+        '''
+        cache_root = getattr(settings, 'AWX_INVENTORY_CACHE_ROOT', None)
+        version = inventory.get_content_version() if cache_root else None
+        cached_path = None
+        if version:
+            cached_path = os.path.join(cache_root, '{}_{}.json'.format(inventory.pk, version))
+        handle, path = tempfile.mkstemp(suffix='.json', dir=kwargs.get('private_data_dir', None))
+        os.close(handle)
+        if cached_path and os.path.exists(cached_path):
+            logger.debug('Reusing cached static inventory {} for {}.'.format(cached_path, inventory.name))
+            shutil.copyfile(cached_path, path)
+            return path
+        data = script_data_to_static_inventory(inventory.get_script_data(hostvars=True))
+        if data is None:
+            os.remove(path)
+            return None
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        os.chmod(path, stat.S_IRUSR | stat.S_IWUSR)
+        if cached_path:
+            try:
+                if not os.path.exists(cache_root):
+                    os.makedirs(cache_root)
+                remove_static_inventory_cache(inventory.pk)
+                # Publish atomically so concurrent jobs never read a partial file.
+                tmp_handle, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cache_root)
+                os.close(tmp_handle)
+                shutil.copyfile(path, tmp_path)
+                os.rename(tmp_path, cached_path)
+            except (IOError, OSError):
+                logger.exception('Could not cache static inventory for {}.'.format(inventory.name))
+        return path
+
     def build_inventory(self, instance, **kwargs):
-        json_data = json.dumps(instance.inventory.get_script_data(hostvars=True))
+        if self.use_static_inventory(**kwargs):
+            path = self.build_static_inventory(instance.inventory, **kwargs)
+            if path:
+                return path
         handle, path = tempfile.mkstemp(dir=kwargs.get('private_data_dir', None))
         f = os.fdopen(handle, 'w')
-        f.write('#! /usr/bin/env python\n# -*- coding: utf-8 -*-\nprint %r\n' % json_data)
+        # Write the JSON as adjacent string literals, one per chunk, so the
+        # inventory never has to be held in memory as a whole.
+        f.write('#! /usr/bin/env python\n# -*- coding: utf-8 -*-\nprint (\n')
+        for chunk in instance.inventory.iter_script_data(hostvars=True):
+            f.write('%r\n' % chunk)
+        f.write(')\n')
         f.close()
         os.chmod(path, stat.S_IRUSR | stat.S_IXUSR | stat.S_IWUSR)
         return path
@@ -707,6 +1085,9 @@ class BaseTask(LogErrorsTask):
     def build_cwd(self, instance, **kwargs):
         raise NotImplementedError
 
+    def build_proot_ro_show_paths(self, instance, cwd, **kwargs):
+        return []
+
     def build_output_replacements(self, instance, **kwargs):
         return []
 
@@ -778,6 +1159,7 @@ class BaseTask(LogErrorsTask):
         status, rc, tb = 'error', None, ''
         output_replacements = []
         extra_update_fields = {}
+        cancel_watcher = None
         try:
             kwargs['isolated'] = isolated_host is not None
             self.pre_run_hook(instance, **kwargs)
@@ -835,6 +1217,7 @@ class BaseTask(LogErrorsTask):
                     raise RuntimeError('bubblewrap is not installed')
                 kwargs['proot_temp_dir'] = build_proot_temp_dir()
                 self.cleanup_paths.append(kwargs['proot_temp_dir'])
+                kwargs['proot_ro_show_paths'] = self.build_proot_ro_show_paths(instance, cwd, **kwargs)
                 args = wrap_args_with_proot(args, cwd, **kwargs)
                 safe_args = wrap_args_with_proot(safe_args, cwd, **kwargs)
             # If there is an SSH key path defined, wrap args with ssh-agent.
@@ -851,9 +1234,10 @@ class BaseTask(LogErrorsTask):
             expect_passwords = {}
             for k, v in self.get_password_prompts(**kwargs).items():
                 expect_passwords[k] = kwargs['passwords'].get(v, '') or ''
+            cancel_watcher = CancelWatcher(self, instance.pk)
             _kw = dict(
                 expect_passwords=expect_passwords,
-                cancelled_callback=lambda: self.update_model(instance.pk).cancel_flag,
+                cancelled_callback=cancel_watcher,
                 job_timeout=self.get_instance_timeout(instance),
                 idle_timeout=self.get_idle_timeout(),
                 extra_update_fields=extra_update_fields,
@@ -879,6 +1263,8 @@ class BaseTask(LogErrorsTask):
                 if settings.DEBUG:
                     logger.exception('%s Exception occurred while running task', instance.log_format)
         finally:
+            if cancel_watcher is not None:
+                cancel_watcher.close()
             try:
                 stdout_handle.flush()
                 stdout_handle.close()
@@ -1028,10 +1414,14 @@ class RunJob(BaseTask):
         env['INVENTORY_ID'] = str(job.inventory.pk)
         if job.use_fact_cache and not kwargs.get('isolated'):
             env['ANSIBLE_LIBRARY'] = self.get_path_to('..', 'plugins', 'library')
-            env['ANSIBLE_CACHE_PLUGINS'] = self.get_path_to('..', 'plugins', 'fact_caching')
-            env['ANSIBLE_CACHE_PLUGIN'] = "awx"
             env['ANSIBLE_CACHE_PLUGIN_TIMEOUT'] = str(settings.ANSIBLE_FACT_CACHE_TIMEOUT)
-            env['ANSIBLE_CACHE_PLUGIN_CONNECTION'] = settings.CACHES['default']['LOCATION'] if 'LOCATION' in settings.CACHES['default'] else ''
+            if settings.AWX_FACT_CACHE_FILE_BASED:
+                env['ANSIBLE_CACHE_PLUGIN'] = "jsonfile"
+                env['ANSIBLE_CACHE_PLUGIN_CONNECTION'] = self.get_fact_cache_path(**kwargs)
+            else:
+                env['ANSIBLE_CACHE_PLUGINS'] = self.get_path_to('..', 'plugins', 'fact_caching')
+                env['ANSIBLE_CACHE_PLUGIN'] = "awx"
+                env['ANSIBLE_CACHE_PLUGIN_CONNECTION'] = settings.CACHES['default']['LOCATION'] if 'LOCATION' in settings.CACHES['default'] else ''
         if job.project:
             env['PROJECT_REVISION'] = job.project.scm_revision
         env['ANSIBLE_RETRY_FILES_ENABLED'] = "False"
@@ -1181,6 +1571,12 @@ class RunJob(BaseTask):
         return self.build_args(job, display=True, **kwargs)
 
     def build_cwd(self, job, **kwargs):
+        if project_snapshots_enabled():
+            snapshot_path = job.project.get_snapshot_path(job.scm_revision)
+            if snapshot_path:
+                # Mark the snapshot as recently used for garbage collection.
+                os.utime(smart_str(snapshot_path), None)
+                return snapshot_path
         cwd = job.project.get_project_path()
         if not cwd:
             root = settings.PROJECTS_ROOT
@@ -1188,6 +1584,13 @@ class RunJob(BaseTask):
                                (job.project.local_path, root))
         return cwd
 
+    def build_proot_ro_show_paths(self, job, cwd, **kwargs):
+        # Snapshot files are hardlinked to the shared checkout, so the job
+        # must not be able to write through them.
+        if cwd == job.project.get_snapshot_path(job.scm_revision):
+            return [cwd]
+        return []
+
     def get_idle_timeout(self):
         return getattr(settings, 'JOB_RUN_IDLE_TIMEOUT', None)
 
@@ -1213,8 +1616,50 @@ class RunJob(BaseTask):
         '''
         return getattr(settings, 'AWX_PROOT_ENABLED', False)
 
+    def _project_checkout_is_current(self, project):
+        '''
+        Return whether this node's checkout of the project already matches
+        project.scm_revision, so the local sync project update can be skipped.
+        The check holds a shared lock so concurrent jobs are not serialized,
+        while a running sync (exclusive lock) is waited on.
+        '''
+        if not project.scm_revision:
+            return False
+        if project_snapshots_enabled() and project.get_snapshot_path(project.scm_revision):
+            # Snapshots are never rewritten once published, so no lock is
+            # needed to read them.
+            return True
+        lock_path = project.get_lock_file()
+        if lock_path is None or not project.get_project_path():
+            return False
+        try:
+            lock_fd = os.open(lock_path, os.O_RDONLY | os.O_CREAT)
+        except OSError as e:
+            logger.error("I/O error({0}) while trying to open lock file [{1}]: {2}".format(e.errno, lock_path, e.strerror))
+            return False
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_SH)
+            if project.get_local_scm_revision() != project.scm_revision:
+                return False
+            if project.scm_type == 'git':
+                try:
+                    head = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                                   cwd=project.get_project_path(),
+                                                   stderr=subprocess.STDOUT).strip()
+                except (OSError, subprocess.CalledProcessError):
+                    return False
+                return head == project.scm_revision
+            return True
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+
     def pre_run_hook(self, job, **kwargs):
-        if job.project and job.project.scm_type:
+        if job.project and job.project.scm_type and self._project_checkout_is_current(job.project):
+            logger.debug('{} Skipping local project sync, checkout already at revision {}.'.format(
+                job.log_format, job.project.scm_revision))
+            job = self.update_model(job.pk, scm_revision=job.project.scm_revision)
+        elif job.project and job.project.scm_type:
             job_request_id = '' if self.request.id is None else self.request.id
             pu_ig = job.instance_group
             pu_en = job.execution_node
@@ -1247,20 +1692,34 @@ class RunJob(BaseTask):
                                                              ('project_update', local_project_sync.name, local_project_sync.id)))
                     raise
 
-        if job.use_fact_cache and not kwargs.get('isolated'):
+        if job.use_fact_cache and not kwargs.get('isolated') and not settings.AWX_FACT_CACHE_FILE_BASED:
             job.start_job_fact_cache()
 
+    def get_fact_cache_path(self, **kwargs):
+        return os.path.join(kwargs['private_data_dir'], 'fact_cache')
+
+    def build_private_data_dir(self, job, **kwargs):
+        path = super(RunJob, self).build_private_data_dir(job, **kwargs)
+        if job.use_fact_cache and not kwargs.get('isolated') and settings.AWX_FACT_CACHE_FILE_BASED:
+            job.start_job_fact_cache(self.get_fact_cache_path(private_data_dir=path))
+        return path
 
     def final_run_hook(self, job, status, **kwargs):
         super(RunJob, self).final_run_hook(job, status, **kwargs)
         if job.use_fact_cache and not kwargs.get('isolated'):
-            job.finish_job_fact_cache()
+            if settings.AWX_FACT_CACHE_FILE_BASED:
+                if kwargs.get('private_data_dir'):
+                    job.finish_job_fact_cache(self.get_fact_cache_path(**kwargs))
+            else:
+                job.finish_job_fact_cache()
         try:
             inventory = job.inventory
         except Inventory.DoesNotExist:
             pass
         else:
-            update_inventory_computed_fields.delay(inventory.id, True)
+            # Only the hosts this job ran against can have changed.
+            host_ids = job.job_host_summaries.filter(host__isnull=False).values_list('host_id', flat=True)
+            schedule_update_inventory_computed_fields(inventory.id, True, host_ids=set(host_ids), group_ids=())
 
 
 class RunProjectUpdate(BaseTask):
@@ -1517,6 +1976,20 @@ class RunProjectUpdate(BaseTask):
                 inv_src.scm_last_revision = scm_revision
                 inv_src.save(update_fields=['scm_last_revision'])
 
+    def _snapshot_project(self, project):
+        try:
+            project.create_snapshot(project.scm_revision)
+            in_use = set(Job.objects.filter(
+                project=project, status__in=ACTIVE_STATES
+            ).values_list('scm_revision', flat=True))
+            in_use.add(project.scm_revision)
+            removed = project.prune_snapshots(settings.AWX_PROJECT_SNAPSHOTS_KEEP, in_use=in_use)
+            if removed:
+                logger.debug('Removed unused snapshots {} of project {}.'.format(removed, project.name))
+        except (IOError, OSError):
+            logger.exception('Could not snapshot revision {} of project {}.'.format(
+                project.scm_revision, project.name))
+
     def release_lock(self, instance):
         try:
             fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
@@ -1557,9 +2030,18 @@ class RunProjectUpdate(BaseTask):
             self.acquire_lock(instance)
 
     def post_run_hook(self, instance, status, **kwargs):
+        p = instance.project
         if instance.launch_type == 'sync':
+            # Record the fully checked out revision (while still holding the
+            # exclusive lock) so later jobs on this node can skip the sync.
+            if status == 'successful' and p.scm_revision:
+                p.set_local_scm_revision(p.scm_revision)
+                if project_snapshots_enabled():
+                    self._snapshot_project(p)
             self.release_lock(instance)
-        p = instance.project
+        elif instance.job_type == 'check':
+            # A check update moves the checkout without a full sync.
+            p.set_local_scm_revision(None)
         if instance.job_type == 'check' and status not in ('failed', 'canceled',):
             fd = open(self.revision_path, 'r')
             lines = fd.readlines()
@@ -1567,8 +2049,7 @@ class RunProjectUpdate(BaseTask):
                 p.scm_revision = lines[0].strip()
             else:
                 logger.info("%s Could not find scm revision in check", instance.log_format)
-            p.playbook_files = p.playbooks
-            p.inventory_files = p.inventories
+            p.playbook_files, p.inventory_files = p.scan_project_files()
             p.save()
 
         # Update any inventories that depend on this project
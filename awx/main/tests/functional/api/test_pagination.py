@@ -1,5 +1,7 @@
 import pytest
 
+from awx.api.versioning import reverse
+from awx.main.models import JobEvent
 from awx.main.models.inventory import Group, Host
 from awx.api.pagination import Pagination
 
@@ -38,3 +40,25 @@ def test_pagination_backend_output_correct_total_count(group, host):
     p = Pagination().django_paginator_class(queryset, 10)
     p.page(1)
     assert p.count == 1
+
+
+@pytest.mark.django_db
+def test_cursor_pagination(get, admin, job_factory):
+    job = job_factory()
+    for counter in (3, 1, 2, 5, 4):
+        JobEvent.objects.create(job=job, event='runner_on_ok', counter=counter)
+    url = reverse('api:job_job_events_list', kwargs={'pk': job.pk})
+
+    # Without a cursor, pages are numbered and counted
+    response = get(url + '?page_size=2', user=admin, expect=200)
+    assert response.data['count'] == 5
+
+    counters = []
+    url += '?cursor=&page_size=2&order_by=-id'
+    while url:
+        response = get(url, user=admin, expect=200)
+        assert 'count' not in response.data
+        assert len(response.data['results']) <= 2
+        counters.extend(event['counter'] for event in response.data['results'])
+        url = response.data['next']
+    assert counters == [1, 2, 3, 4, 5]
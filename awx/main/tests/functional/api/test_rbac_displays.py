@@ -1,10 +1,15 @@
 import pytest
 
 from awx.api.versioning import reverse
+from django.db import connection
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
-from awx.main.models import Role, Group, UnifiedJobTemplate, JobTemplate
-from awx.main.access import access_registry
+from awx.main.models import Role, Group, UnifiedJobTemplate, JobTemplate, Job
+from awx.main.access import (
+    access_registry, get_user_capabilities, prefetch_user_capabilities,
+    JobTemplateAccess, ActiveJobConflict
+)
 from awx.main.utils import cache_list_capabilities
 from awx.api.serializers import JobTemplateSerializer
 
@@ -305,6 +310,42 @@ def test_prefetch_jt_copy_capability(job_template, project, inventory, rando):
     assert qs[0].capabilities_cache == {'copy': True}
 
 
+@pytest.mark.django_db
+def test_prefetch_user_capabilities(job_template, project, inventory, rando):
+    job_template.project = project
+    job_template.inventory = inventory
+    job_template.save()
+    job_template.execute_role.members.add(rando)
+    project.use_role.members.add(rando)
+    inventory.use_role.members.add(rando)
+
+    qs = list(JobTemplate.objects.select_related('project', 'inventory'))
+    prefetch_user_capabilities(rando, qs)
+    with CaptureQueriesContext(connection) as captured:
+        capabilities = get_user_capabilities(rando, qs[0], method_list=JobTemplateSerializer.show_capabilities)
+    assert capabilities == {'start': True, 'schedule': True, 'copy': True, 'edit': False, 'delete': False}
+    assert len(captured) == 0
+
+
+@pytest.mark.django_db
+def test_prefetch_active_jobs(job_template, rando):
+    other_template = JobTemplate.objects.create(name='other-template')
+    job = Job.objects.create(job_template=job_template, status='running')
+    Job.objects.create(job_template=other_template, status='successful')
+    job_template.admin_role.members.add(rando)
+    other_template.admin_role.members.add(rando)
+
+    qs = list(JobTemplate.objects.order_by('pk'))
+    prefetch_user_capabilities(rando, qs)
+    access = JobTemplateAccess(rando)
+    with CaptureQueriesContext(connection) as captured:
+        with pytest.raises(ActiveJobConflict):
+            access.can_delete(qs[0])
+        assert access.can_delete(qs[1])
+        assert access.get_active_jobs(qs[0]) == [dict(type='job', id=job.pk)]
+    assert len(captured) == 1
+
+
 @pytest.mark.django_db
 def test_manual_projects_no_update(manual_project, get, admin_user):
     response = get(reverse('api:project_detail', kwargs={'pk': manual_project.pk}), admin_user, expect=200)
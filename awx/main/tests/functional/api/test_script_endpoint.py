@@ -30,3 +30,16 @@ def test_ungrouped_hosts(post, get, admin_user, organization, group_factory):
     jdata = json.loads(resp.content)
     assert inventory.hosts.count() == 2
     assert len(jdata['all']['hosts']) == 2
+
+
+@pytest.mark.django_db
+def test_hostvars_streamed(get, admin_user, organization):
+    inventory = Inventory.objects.create(name='basic_inventory', organization=organization)
+    Host.objects.create(name='first_host', inventory=inventory, variables='foo: bar')
+    url = reverse('api:inventory_script_view', kwargs={'version': 'v2', 'pk': inventory.pk})
+    resp = get(url + '?hostvars=1', admin_user)
+    jdata = json.loads(''.join(resp.streaming_content))
+    assert jdata == {
+        'all': {'hosts': ['first_host']},
+        '_meta': {'hostvars': {'first_host': {'foo': 'bar'}}},
+    }
@@ -221,6 +221,48 @@ class TestINIImports:
         cmd = inventory_import.Command()
         cmd.handle(inventory_id=inventory.pk, source='doesnt matter')
 
+    @pytest.mark.parametrize('activity_stream', [True, False])
+    def test_overwrite(self, inventory, settings, activity_stream):
+        # activity_stream=False uses the bulk loader
+        settings.ACTIVITY_STREAM_ENABLED_FOR_INVENTORY_SYNC = activity_stream
+        cmd = inventory_import.Command()
+        with mock.patch.object(inventory_import, 'load_inventory_source',
+                               return_value=dict_to_mem_data(TEST_INVENTORY_CONTENT).all_group):
+            cmd.handle(inventory_id=inventory.pk, source='doesnt matter', overwrite=True, overwrite_vars=True)
+        inventory.hosts.create(name='manual.example.com')
+        with mock.patch.object(inventory_import, 'load_inventory_source', return_value=dict_to_mem_data({
+            "_meta": {
+                "hostvars": {"web1.example.com": {"foo": "bar"}}
+            },
+            "all": {
+                "children": ["webservers", "others"]
+            },
+            "webservers": {
+                "hosts": ["web1.example.com", "web4.example.com"]
+            },
+            "others": {
+                "hosts": ["web1.example.com"]
+            }
+        }).all_group):
+            inventory_import.Command().handle(
+                inventory_id=inventory.pk, source='doesnt matter', overwrite=True, overwrite_vars=True)
+
+        assert set(inventory.groups.values_list('name', flat=True)) == set(['webservers', 'others'])
+        assert set(inventory.hosts.values_list('name', flat=True)) == set([
+            'web1.example.com', 'web4.example.com', 'manual.example.com'])
+        assert Host.objects.get(name='web1.example.com').variables_dict == {'foo': 'bar'}
+        webservers = Group.objects.get(name='webservers')
+        assert webservers.variables_dict == {}
+        assert set(webservers.hosts.values_list('name', flat=True)) == set([
+            'web1.example.com', 'web4.example.com'])
+        others = Group.objects.get(name='others')
+        assert set(others.hosts.values_list('name', flat=True)) == set(['web1.example.com'])
+        assert others.children.count() == 0
+        invsrc = inventory.inventory_sources.get()
+        assert set(invsrc.hosts.values_list('name', flat=True)) == set([
+            'web1.example.com', 'web4.example.com'])
+        assert set(invsrc.groups.values_list('name', flat=True)) == set(['webservers', 'others'])
+
 
 @pytest.mark.django_db
 @pytest.mark.inventory_import
@@ -1,5 +1,7 @@
 import pytest
 
+from django.db import connection
+
 # AWX context managers for testing
 from awx.main.models.rbac import batch_role_ancestor_rebuilding
 from awx.main.signals import (
@@ -34,6 +36,8 @@ class TestComputedFields:
 
     def test_computed_fields_normal_use(self, mocker, inventory):
         job = Job.objects.create(name='fake-job', inventory=inventory)
+        # the update is requested when the test transaction would commit
+        mocker.patch.object(connection, 'on_commit', side_effect=lambda func: func())
         with mocker.patch.object(update_inventory_computed_fields, 'delay'):
             job.delete()
             update_inventory_computed_fields.delay.assert_called_once_with(inventory.id, True)
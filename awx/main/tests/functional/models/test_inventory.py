@@ -1,14 +1,22 @@
 import pytest
 import mock
+import json
 
 from django.core.exceptions import ValidationError
 
 # AWX
 from awx.main.models import (
+    ActivityStream,
+    Group,
+    GroupAncestry,
+    GroupHostMembership,
     Host,
+    HostAddress,
     Inventory,
+    JobHostSummary,
     InventorySource,
     InventoryUpdate,
+    SmartInventoryMembership,
 )
 from awx.main.utils.filters import SmartFilter
 
@@ -34,6 +42,46 @@ class TestInventoryScript:
             'remote_tower_id': host.id
         }
 
+    @pytest.mark.parametrize('show_all', [True, False])
+    def test_streamed_script_data(self, inventory, show_all):
+        inventory.variables = '{"inv": 1}'
+        inventory.save()
+        parent = inventory.groups.create(name='parent', variables={"group": "var"})
+        child = inventory.groups.create(name='child')
+        inventory.groups.create(name='empty')
+        parent.children.add(child)
+        for i in range(5):
+            host = inventory.hosts.create(name='host%d' % i, variables={"i": i}, enabled=bool(i % 2))
+            if i < 2:
+                parent.hosts.add(host)
+            elif i < 4:
+                child.hosts.add(host)
+
+        def normalized(data):
+            for group_info in data.values():
+                for key in ('hosts', 'children'):
+                    if key in group_info:
+                        group_info[key] = sorted(group_info[key])
+            return data
+
+        streamed = ''.join(inventory.iter_script_data(hostvars=True, towervars=True,
+                                                      show_all=show_all, chunk_size=16))
+        assert normalized(json.loads(streamed)) == normalized(
+            inventory.get_script_data(hostvars=True, towervars=True, show_all=show_all))
+
+    def test_content_version(self, inventory):
+        group = inventory.groups.create(name='group')
+        host = inventory.hosts.create(name='ahost', variables={"foo": "bar"})
+        version = inventory.get_content_version()
+        assert inventory.get_content_version() == version
+
+        # changes that do not touch modified are seen too
+        Host.objects.filter(pk=host.pk).update(variables='{"foo": "baz"}')
+        assert inventory.get_content_version() != version
+        version = inventory.get_content_version()
+        group.hosts.add(host)
+        assert inventory.get_content_version() != version
+
 
 @pytest.mark.django_db
 class TestActiveCount:
@@ -165,6 +213,205 @@ def test_inventory_update_excessively_long_name(inventory, inventory_source):
     assert iu.name.startswith(inventory.name)
 
 
+@pytest.mark.django_db
+class TestComputedFields:
+
+    FIELDS = ('total_hosts', 'has_active_failures', 'hosts_with_active_failures',
+              'total_groups', 'groups_with_active_failures', 'has_inventory_sources')
+
+    def snapshot(self, inventory):
+        return (
+            dict((g['pk'], g) for g in Group.objects.filter(inventory=inventory).values('pk', *self.FIELDS)),
+            dict(Host.objects.filter(inventory=inventory).values_list('pk', 'has_active_failures'))
+        )
+
+    def test_incremental_matches_full_update(self, inventory, job_factory):
+        root = inventory.groups.create(name='root')
+        mid = inventory.groups.create(name='mid')
+        leaf = inventory.groups.create(name='leaf')
+        other = inventory.groups.create(name='other')
+        root.children.add(mid)
+        mid.children.add(leaf)
+        host1 = leaf.hosts.create(name='host1', inventory=inventory)
+        mid.hosts.create(name='host2', inventory=inventory)
+        other.hosts.create(name='host3', inventory=inventory)
+        inventory.update_computed_fields()
+
+        JobHostSummary.objects.create(job=job_factory(), host=host1, host_name=host1.name, failed=True)
+        inventory.update_computed_fields(host_ids=[host1.pk], group_ids=[])
+        incremental = self.snapshot(inventory)
+        inventory.update_computed_fields()
+        assert incremental == self.snapshot(inventory)
+
+        groups, hosts = incremental
+        assert hosts[host1.pk] is True
+        assert groups[root.pk]['hosts_with_active_failures'] == 1
+        assert groups[root.pk]['groups_with_active_failures'] == 2
+        assert groups[mid.pk]['total_hosts'] == 2
+        assert groups[other.pk]['has_active_failures'] is False
+
+        mid.children.remove(leaf)
+        inventory.update_computed_fields(host_ids=[], group_ids=[mid.pk, leaf.pk])
+        incremental = self.snapshot(inventory)
+        inventory.update_computed_fields()
+        assert incremental == self.snapshot(inventory)
+        assert incremental[0][root.pk]['has_active_failures'] is False
+
+
+@pytest.mark.django_db
+class TestGroupClosure:
+
+    def snapshot(self, inventory):
+        return (
+            set(GroupAncestry.objects.filter(inventory=inventory).values_list('ancestor_id', 'descendant_id', 'depth')),
+            set(GroupHostMembership.objects.filter(inventory=inventory).values_list('group_id', 'host_id'))
+        )
+
+    def assert_closure(self, inventory):
+        incremental = self.snapshot(inventory)
+        inventory.rebuild_group_closure()
+        assert incremental == self.snapshot(inventory)
+
+    def test_incremental_matches_rebuild(self, inventory):
+        root = inventory.groups.create(name='root')
+        mid = inventory.groups.create(name='mid')
+        leaf = inventory.groups.create(name='leaf')
+        host1 = leaf.hosts.create(name='host1', inventory=inventory)
+        host2 = mid.hosts.create(name='host2', inventory=inventory)
+        root.children.add(mid)
+        mid.children.add(leaf)
+        self.assert_closure(inventory)
+        assert set(root.all_children) == set([mid, leaf])
+        assert set(leaf.all_parents) == set([root, mid])
+        assert set(root.all_hosts) == set([host1, host2])
+        assert set(host1.all_groups) == set([root, mid, leaf])
+        assert GroupAncestry.objects.get(ancestor=root, descendant=leaf).depth == 2
+
+        # A cycle makes each group its own parent and child.
+        leaf.children.add(root)
+        self.assert_closure(inventory)
+        assert set(root.all_children) == set([root, mid, leaf])
+        assert set(host2.all_groups) == set([root, mid, leaf])
+
+        mid.children.remove(leaf)
+        self.assert_closure(inventory)
+        assert set(root.all_children) == set([mid])
+        assert set(leaf.all_hosts) == set([host1, host2])
+
+        host1.groups.clear()
+        mid.hosts.add(host1)
+        self.assert_closure(inventory)
+        assert set(host1.all_groups) == set([root, mid, leaf])
+
+        root.children.clear()
+        self.assert_closure(inventory)
+        assert set(mid.all_parents) == set()
+
+    def test_group_delete(self, inventory):
+        root = inventory.groups.create(name='root')
+        mid = inventory.groups.create(name='mid')
+        leaf = inventory.groups.create(name='leaf')
+        root.children.add(mid)
+        mid.children.add(leaf)
+        host = mid.hosts.create(name='host', inventory=inventory)
+        mid.delete()
+        self.assert_closure(inventory)
+        # The children of the deleted group move to its parents.
+        assert set(leaf.all_parents) == set([root])
+        assert set(root.all_hosts) == set([host])
+
+
+@pytest.mark.django_db
+class TestSmartInventoryMemberships:
+
+    def memberships(self, inventory):
+        return set(SmartInventoryMembership.objects.filter(inventory=inventory).values_list('host_id', flat=True))
+
+    def test_update_for_host_names(self, organization, inventory):
+        smart_inventory = Inventory.objects.create(name='smart', kind='smart', organization=organization,
+                                                   host_filter='description=match')
+        other_inventory = organization.inventories.create(name='other-inv')
+        host1 = inventory.hosts.create(name='host1', description='match')
+        host2 = inventory.hosts.create(name='host2', description='other')
+        duplicate = other_inventory.hosts.create(name='host1', description='match')
+        assert smart_inventory.update_smart_inventory_memberships() is True
+        assert self.memberships(smart_inventory) == set([host1.pk])
+
+        host2.description = 'match'
+        host2.save()
+        host1.delete()
+        assert smart_inventory.update_smart_inventory_memberships(host_names=['host1', 'host2']) is True
+        # One host is included per name, so the other host1 takes its place.
+        assert self.memberships(smart_inventory) == set([host2.pk, duplicate.pk])
+        assert smart_inventory.update_smart_inventory_memberships(host_names=['host1', 'host2']) is False
+        assert smart_inventory.update_smart_inventory_memberships() is False
+
+    def test_host_rename_updates_both_names(self, inventory, mocker):
+        host = inventory.hosts.create(name='host1')
+        host = Host.objects.get(pk=host.pk)
+        schedule = mocker.patch('awx.main.tasks.schedule_update_host_smart_inventory_memberships')
+        host.name = 'host2'
+        host.save()
+        schedule.assert_called_once_with(host_names=['host2', 'host1'])
+        host.save()
+        assert schedule.call_args == mock.call(host_names=['host2'])
+
+
+@pytest.mark.django_db
+class TestHostAddresses:
+
+    def addresses(self, inventory):
+        return set(HostAddress.objects.filter(inventory=inventory).values_list('host__name', 'address', 'is_name'))
+
+    def test_update_and_resolve(self, inventory, mocker):
+        resolve = mocker.patch('awx.main.models.inventory.resolve_host_names',
+                               side_effect=lambda names: dict((name, set(['10.0.0.1'])) for name in names))
+        host = inventory.hosts.create(name='host1', variables={'ansible_host': 'host1.example.com'})
+        inventory.update_host_address_names()
+        inventory.resolve_host_addresses()
+        assert self.addresses(inventory) == set([('host1', 'host1.example.com', True), ('host1', '10.0.0.1', False)])
+
+        # Names resolved already are only resolved again once older than max_age.
+        inventory.resolve_host_addresses()
+        inventory.resolve_host_addresses(max_age=60)
+        assert resolve.call_count == 1
+
+        host.variables = {'ansible_host': 'host1.example.org'}
+        host.save()
+        inventory.update_host_address_names()
+        assert self.addresses(inventory) == set([('host1', 'host1.example.org', True)])
+
+
+@pytest.mark.django_db
+class TestInventoryDeleteInBulk:
+
+    def test_delete_in_bulk(self, inventory, job_factory, settings):
+        settings.AWX_INVENTORY_DELETE_BATCH_SIZE = 2
+        parent = inventory.groups.create(name='parent')
+        child = inventory.groups.create(name='child')
+        parent.children.add(child)
+        hosts = [inventory.hosts.create(name='host%d' % i) for i in range(5)]
+        child.hosts.add(*hosts)
+        job = job_factory()
+        summary = JobHostSummary.objects.create(job=job, host=hosts[0], host_name='host0')
+        progress = mock.Mock()
+
+        inventory.delete_in_bulk(progress=progress)
+        assert not Inventory.objects.filter(pk=inventory.pk).exists()
+        assert not Host.objects.filter(pk__in=[host.pk for host in hosts]).exists()
+        assert not Group.objects.filter(pk__in=[parent.pk, child.pk]).exists()
+        assert not Group.hosts.through.objects.filter(host_id__in=[host.pk for host in hosts]).exists()
+        assert not GroupAncestry.objects.filter(inventory_id=inventory.pk).exists()
+        # Rows which only referred to the hosts are kept.
+        summary.refresh_from_db()
+        assert summary.host is None
+        assert summary.host_name == 'host0'
+        assert ActivityStream.objects.filter(operation='delete', object1='host').count() == 5
+        assert ActivityStream.objects.filter(operation='delete', object1='group').count() == 2
+        progress.assert_any_call(Host, 5, 5)
+        progress.assert_any_call(Group, 2, 2)
+
+
 @pytest.mark.django_db
 class TestHostManager:
     def test_host_filter_not_smart(self, setup_ec2_gce, organization):
@@ -182,6 +429,19 @@ class TestHostManager:
             [Host.objects.get(name='single_host')]
         )
 
+    def test_materialized_hosts_require_rebuild(self, organization, settings, mocker):
+        compiled_query = mocker.patch('awx.main.managers.SmartFilter.compiled_query', return_value=Host.objects.all())
+        smart_inventory = Inventory(name='smart', kind='smart', organization=organization,
+                                    host_filter='name=host1', pk=1)
+        settings.AWX_SMART_INVENTORY_MATERIALIZED_HOSTS = True
+        settings.AWX_REBUILD_SMART_MEMBERSHIP = True
+        assert 'smartinventorymembership' in str(smart_inventory.hosts.all().query)
+        assert not compiled_query.called
+        # without rebuilds the memberships may be stale, so the filter is run
+        settings.AWX_REBUILD_SMART_MEMBERSHIP = False
+        smart_inventory.hosts.all()
+        assert compiled_query.called
+
     # Things we can not easily test due to SQLite backend:
     # 2 organizations with host of same name only has 1 entry in smart inventory
     # smart inventory in 1 organization does not include host from another
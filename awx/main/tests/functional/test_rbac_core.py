@@ -1,9 +1,13 @@
 import pytest
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from awx.main.models import (
     Role,
     Organization,
     Project,
+    prefetch_role_membership,
 )
 
 
@@ -202,3 +206,43 @@ def test_auto_parenting():
     assert org1.admin_role.is_ancestor_of(prj2.admin_role) is False
     assert org2.admin_role.is_ancestor_of(prj1.admin_role)
     assert org2.admin_role.is_ancestor_of(prj2.admin_role)
+
+
+@pytest.mark.django_db
+def test_accessible_objects_cache(organization, alice, settings):
+    team = organization.teams.create(name='team')
+    project = Project.objects.create(name='project', organization=organization)
+    assert list(Project.accessible_objects(alice, 'read_role')) == []
+
+    # Cached ids are dropped as alice's roles, or their ancestry, change.
+    team.member_role.members.add(alice)
+    assert list(Project.accessible_objects(alice, 'read_role')) == []
+    project.read_role.parents.add(team.member_role)
+    assert list(Project.accessible_objects(alice, 'read_role')) == [project]
+    assert list(Project.accessible_pk_qs(alice, 'read_role')) == [project.pk]
+    team.delete()
+    assert list(Project.accessible_objects(alice, 'read_role')) == []
+
+    # Beyond AWX_ACCESSIBLE_IDS_CACHE_MAX ids the role ancestry table is queried.
+    settings.AWX_ACCESSIBLE_IDS_CACHE_MAX = 1
+    project2 = Project.objects.create(name='project2', organization=organization)
+    organization.admin_role.members.add(alice)
+    assert set(Project.accessible_objects(alice, 'read_role')) == set([project, project2])
+    assert not isinstance(Project.accessible_pk_qs(alice, 'read_role'), list)
+
+
+@pytest.mark.django_db
+def test_prefetch_role_membership(organization, alice):
+    projects = [Project.objects.create(name='project%d' % i, organization=organization) for i in range(3)]
+    projects[1].admin_role.members.add(alice)
+    projects = list(Project.objects.select_related('organization').order_by('name'))
+
+    with CaptureQueriesContext(connection) as captured:
+        prefetch_role_membership(alice, projects)
+    assert len(captured) == 2
+
+    with CaptureQueriesContext(connection) as captured:
+        assert [alice in p.admin_role for p in projects] == [False, True, False]
+        assert [alice in p.read_role for p in projects] == [False, True, False]
+        assert alice not in projects[0].organization.admin_role
+    assert len(captured) == 0
@@ -150,6 +150,26 @@ class TestIsolatedManagementTask:
         assert iso_instance.last_isolated_check > original_isolated_instance.last_isolated_check
         assert iso_instance.modified == original_isolated_instance.modified
 
+    def test_health_check(self, control_instance, needs_updating):
+        iso_instance = needs_updating.instances.first()
+        lost_instance = needs_updating.instances.create(hostname='isolated-lost', capacity=103)
+        Instance.objects.filter(pk=lost_instance.pk).update(modified=now() - timedelta(days=1))
+        lost_instance.refresh_from_db()
+        results = [
+            (iso_instance, {'capacity': 250, 'version': '5.0.0-isolated'}),
+            (lost_instance, {'msg': 'ssh: connect to host isolated-lost port 22: Connection refused'}),
+        ]
+        with mock.patch.object(isolated_manager.IsolatedManager, 'probe', return_value=results):
+            with mock.patch.object(Instance, 'save') as save:
+                isolated_manager.IsolatedManager.health_check([iso_instance, lost_instance], '5.0.0')
+        save.assert_not_called()
+        iso_instance.refresh_from_db()
+        lost_instance.refresh_from_db()
+        assert (iso_instance.capacity, iso_instance.version) == (250, '5.0.0-isolated')
+        assert iso_instance.modified > now() - timedelta(minutes=1)
+        assert lost_instance.capacity == 0
+        assert lost_instance.modified < now() - timedelta(hours=1)
+
     def test_does_not_take_action(self, control_instance, just_updated):
         with mock.patch('awx.main.tasks.settings', MockSettings()):
             with mock.patch.object(isolated_manager.IsolatedManager, 'health_check') as check_mock:
@@ -2,15 +2,20 @@
 # All Rights Reserved
 
 # Python
+import mock
 import pytest
+import threading
+import time
 
 # Django
 from django.core.management.base import CommandError
 
 # AWX
 from awx.main.management.commands.inventory_import import (
+    AnsibleInventoryLoader,
     Command
 )
+from awx.main.utils.mem_inventory import MemInventory
 
 
 @pytest.mark.inventory_import
@@ -66,3 +71,51 @@ class TestInvalidOptions:
         assert '--source' in err.value.message
         assert 'required' in err.value.message
 
+
+@pytest.mark.inventory_import
+class TestHostvars:
+
+    @pytest.fixture
+    def loader(self):
+        return AnsibleInventoryLoader(source=__file__, is_custom=True)
+
+    def test_hostvars_loaded_concurrently(self, loader, settings):
+        settings.AWX_INVENTORY_HOSTVARS_CONCURRENCY = 4
+        inventory = MemInventory()
+        for i in range(10):
+            inventory.get_host('host%d' % i)
+        seen_threads = set()
+
+        def command_to_json(cmd, timeout=None):
+            seen_threads.add(threading.current_thread().ident)
+            time.sleep(0.05)
+            return {'name': cmd[-1]}
+
+        with mock.patch.object(loader, 'command_to_json', side_effect=command_to_json):
+            loader.load_hostvars(['script'], inventory)
+        for i in range(10):
+            assert inventory.get_host('host%d' % i).variables == {'name': 'host%d' % i}
+        assert 1 < len(seen_threads) <= 4
+
+    def test_host_call_timeout(self, loader, settings):
+        settings.AWX_PROOT_ENABLED = False
+        with pytest.raises(RuntimeError) as e:
+            loader.command_to_json(['sleep', '5'], timeout=0.1)
+        assert 'timed out' in str(e.value)
+
+    def test_host_call_timeout_kills_children(self, loader, settings, tmpdir):
+        settings.AWX_PROOT_ENABLED = False
+        pid_file = tmpdir.join('pid')
+        with pytest.raises(RuntimeError):
+            loader.command_to_json(['sh', '-c', 'sleep 5 & echo $! > {}; wait'.format(pid_file)], timeout=0.5)
+        pid = int(pid_file.read())
+        for attempt in range(50):
+            try:
+                with open('/proc/{}/stat'.format(pid)) as f:
+                    if f.read().split(')')[-1].split()[0] == 'Z':
+                        break
+            except IOError:
+                break
+            time.sleep(0.1)
+        else:
+            pytest.fail('child process {} is still running'.format(pid))
@@ -1,4 +1,5 @@
 import cStringIO
+import json
 import mock
 import os
 import pytest
@@ -15,8 +16,6 @@ from cryptography.hazmat.primitives import serialization
 
 from awx.main.expect import run, isolated_manager
 
-from django.conf import settings
-
 HERE, FILENAME = os.path.split(__file__)
 
 
@@ -263,7 +262,8 @@ def test_run_isolated_adhoc_command(private_data_dir, rsa_key):
     assert env['AWX_ISOLATED_DATA_DIR'] == private_data_dir
 
 
-def test_check_isolated_job(private_data_dir, rsa_key):
+def test_check_isolated_job(private_data_dir, rsa_key, settings):
+    settings.AWX_ISOLATED_STREAMING = False
     pem, passphrase = rsa_key
     stdout = cStringIO.StringIO()
     mgr = isolated_manager.IsolatedManager(['ls', '-la'], HERE, {}, stdout, '')
@@ -313,7 +313,8 @@ def test_check_isolated_job(private_data_dir, rsa_key):
         )
 
 
-def test_check_isolated_job_timeout(private_data_dir, rsa_key):
+def test_check_isolated_job_timeout(private_data_dir, rsa_key, settings):
+    settings.AWX_ISOLATED_STREAMING = False
     pem, passphrase = rsa_key
     stdout = cStringIO.StringIO()
     extra_update_fields = {}
@@ -339,3 +340,152 @@ def test_check_isolated_job_timeout(private_data_dir, rsa_key):
         assert stdout.getvalue() == 'checking job status...'
 
     assert extra_update_fields['job_explanation'] == 'Job terminated due to timeout'
+
+
+def test_stream_artifacts(private_data_dir):
+    artifacts = os.path.join(private_data_dir, 'artifacts')
+    os.makedirs(os.path.join(artifacts, 'job_events'))
+    for filename, data in (
+        ['stdout', 'Hello, World!'],
+        ['job_events/abc-partial.json', '{"event": "playbook_on_start"}'],
+        ['job_events/def-partial.json.tmp', '{}'],
+        ['status', 'successful'],
+        ['rc', '0'],
+    ):
+        with open(os.path.join(artifacts, filename), 'w') as f:
+            f.write(data)
+
+    # the job has exited (there's no pidfile and a status was written)
+    stdout = cStringIO.StringIO()
+    run.stream_artifacts(private_data_dir, stdout)
+    messages = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert messages == [
+        {'artifact': 'job_events/abc-partial.json', 'data': '{"event": "playbook_on_start"}'},
+        {'stdout': 'Hello, World!', 'offset': 13},
+        {'artifact': 'status', 'data': 'successful'},
+        {'artifact': 'rc', 'data': '0'},
+        {'eof': True},
+    ]
+
+
+def test_stream_isolated_job(private_data_dir, settings):
+    settings.AWX_ISOLATED_STREAMING = True
+    stdout = cStringIO.StringIO()
+    mgr = isolated_manager.IsolatedManager(['ls', '-la'], HERE, {}, stdout, '')
+    mgr.private_data_dir = private_data_dir
+    mgr.instance = mock.Mock(id=123, pk=123, verbosity=0, spec_set=['id', 'pk', 'verbosity'])
+    mgr.started_at = time.time()
+    mgr.host = 'isolated-host'
+    os.makedirs(os.path.join(private_data_dir, 'artifacts', 'job_events'))
+
+    with mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+
+        def _stream(args, cwd, env, reader, **kw):
+            # messages may be split across reads and arrive with CRLFs
+            data = '\r\n'.join(json.dumps(m) for m in (
+                {'artifact': 'job_events/abc-partial.json', 'data': '{}'},
+                {'stdout': 'KABOOM!', 'offset': 7},
+                {'artifact': 'status', 'data': 'failed'},
+                {'artifact': 'rc', 'data': '1'},
+                {'artifact': '../../escape', 'data': 'nope'},
+                {'eof': True},
+            )) + '\r\n'
+            for i in range(0, len(data), 10):
+                reader.write(data[i:i + 10])
+            return ('successful', 0)
+
+        run_pexpect.side_effect = _stream
+        status, rc = mgr.check(interval=0)
+
+    assert status == 'failed'
+    assert rc == 1
+    assert stdout.getvalue() == 'KABOOM!'
+    assert os.path.exists(os.path.join(private_data_dir, 'artifacts', 'job_events', 'abc-partial.json'))
+    assert not os.path.exists(os.path.join(os.path.dirname(private_data_dir), 'escape'))
+
+    # the check playbook was never needed
+    assert run_pexpect.call_count == 1
+    args = run_pexpect.call_args[0][0]
+    assert args[0] == 'ssh'
+    assert 'ControlMaster=auto' in args
+    assert args[-2:] == ['isolated-host', 'awx-expect stream %s' % private_data_dir]
+
+
+def test_stream_isolated_job_falls_back_to_polling(private_data_dir, settings):
+    settings.AWX_ISOLATED_STREAMING = True
+    stdout = cStringIO.StringIO()
+    mgr = isolated_manager.IsolatedManager(['ls', '-la'], HERE, {}, stdout, '')
+    mgr.private_data_dir = private_data_dir
+    mgr.instance = mock.Mock(id=123, pk=123, verbosity=0, spec_set=['id', 'pk', 'verbosity'])
+    mgr.started_at = time.time()
+    mgr.host = 'isolated-host'
+    os.mkdir(os.path.join(private_data_dir, 'artifacts'))
+
+    with mock.patch('awx.main.expect.run.run_pexpect') as run_pexpect:
+
+        def _run(args, cwd, env, buff, **kw):
+            if args[0] == 'ssh':
+                # the connection drops after the first few bytes of stdout
+                buff.write(json.dumps({'stdout': 'KA', 'offset': 2}) + '\r\n')
+                return ('failed', 255)
+            for filename, data in (
+                ['status', 'successful'],
+                ['rc', '0'],
+                ['stdout', 'KABOOM!'],
+            ):
+                with open(os.path.join(private_data_dir, 'artifacts', filename), 'w') as f:
+                    f.write(data)
+            return ('successful', 0)
+
+        run_pexpect.side_effect = _run
+        with mock.patch.object(mgr, '_missing_artifacts') as missing_artifacts:
+            missing_artifacts.return_value = False
+            status, rc = mgr.check(interval=0)
+
+    assert status == 'successful'
+    assert rc == 0
+    assert stdout.getvalue() == 'KABOOM!'
+    assert run_pexpect.call_args[0][0][1] == 'check_isolated.yml'
+
+
+def test_isolated_probe(settings):
+    settings.AWX_ISOLATED_KEY_GENERATION = False
+    commands = {
+        'fast': ['echo', '{"capacity": 50, "version": "1.0.0-isolated"}'],
+        'broken': ['echo', 'Permission denied (publickey).'],
+        'unreachable': ['sleep', '30'],
+    }
+    instances = [mock.Mock(hostname=hostname) for hostname in ('unreachable', 'broken', 'fast')]
+    with mock.patch.object(isolated_manager.IsolatedManager, '_build_ssh_args',
+                           side_effect=lambda host, command: commands[host]):
+        results = dict(
+            (instance.hostname, result)
+            for instance, result in isolated_manager.IsolatedManager.probe(instances, timeout=1)
+        )
+    assert results == {
+        'fast': {'capacity': 50, 'version': '1.0.0-isolated'},
+        'broken': {'msg': 'Permission denied (publickey).'},
+        'unreachable': {'msg': 'timed out after 1 seconds'},
+    }
+
+
+def test_isolated_probe_loads_key_into_ssh_agent(settings, tmpdir):
+    settings.AWX_ISOLATED_KEY_GENERATION = True
+    settings.AWX_ISOLATED_PRIVATE_KEY = 'PRIVATE KEY'
+    settings.AWX_PROOT_BASE_PATH = str(tmpdir)
+    keys = []
+
+    def popen(args, **kw):
+        assert args[0] == 'ssh-agent'
+        key_path = re.search(r'ssh-add (\S+)', args[-1]).group(1)
+        assert stat.S_ISFIFO(os.stat(key_path).st_mode)
+        with open(key_path, 'r') as fifo:
+            keys.append(fifo.read())
+        return mock.Mock(pid=0, returncode=0, **{'poll.return_value': 0})
+
+    instances = [mock.Mock(hostname=hostname) for hostname in ('first', 'second')]
+    with mock.patch.object(isolated_manager.subprocess, 'Popen', side_effect=popen):
+        results = list(isolated_manager.IsolatedManager.probe(instances, timeout=1))
+    assert len(results) == 2
+    assert keys == ['PRIVATE KEY', 'PRIVATE KEY']
+    assert os.listdir(str(tmpdir)) == []
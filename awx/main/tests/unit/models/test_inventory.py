@@ -1,3 +1,4 @@
+import datetime
 import pytest
 import mock
 import json
@@ -8,10 +9,13 @@ from awx.main.models import (
     UnifiedJob,
     InventoryUpdate,
     Inventory,
+    Host,
     Credential,
     CredentialType,
     InventorySource,
 )
+from awx.main.models.base import VarsDictProperty
+from awx.main.utils import parse_yaml_or_json as base_parse_yaml_or_json
 
 
 def test_cancel(mocker):
@@ -116,3 +120,34 @@ class TestControlledBySCM():
         with pytest.raises(ValidationError):
             inv_src.clean_update_on_launch()
 
+
+class TestVariablesDict():
+
+    def test_yaml_parsed_once(self, mocker):
+        host = Host(variables='ansible_host: 10.0.0.1\nports: [80, 443]')
+        parse = mocker.patch('awx.main.models.base.parse_yaml_or_json', wraps=base_parse_yaml_or_json)
+        assert host.variables_dict == {'ansible_host': '10.0.0.1', 'ports': [80, 443]}
+        # Each access returns a new dictionary, which callers may modify.
+        host.variables_dict['ports'].append(22)
+        assert host.variables_dict == {'ansible_host': '10.0.0.1', 'ports': [80, 443]}
+        assert parse.call_count == 1
+        host.variables = '{"ansible_host": "10.0.0.2"}'
+        assert host.variables_dict == {'ansible_host': '10.0.0.2'}
+
+    def test_stored_json(self, mocker):
+        variables = 'ansible_host: 10.0.0.1'
+        variables_json = VarsDictProperty.get_json_field_value(variables)
+        assert variables_json.endswith(':{"ansible_host": "10.0.0.1"}')
+        assert VarsDictProperty.get_json_field_value('{"ansible_host": "10.0.0.1"}') == ''
+        parse = mocker.patch('awx.main.models.base.parse_yaml_or_json')
+        assert Host(variables=variables, variables_json=variables_json).variables_dict == {'ansible_host': '10.0.0.1'}
+        assert not parse.called
+        # Stored JSON for other variables is ignored.
+        parse.return_value = {'ansible_host': '10.0.0.2'}
+        host = Host(variables='ansible_host: 10.0.0.2', variables_json=variables_json)
+        assert host.variables_dict == {'ansible_host': '10.0.0.2'}
+
+    def test_not_json_serializable(self):
+        host = Host(variables='built: 2017-01-01\n1: one')
+        assert VarsDictProperty.get_json_field_value(host.variables) == ''
+        assert host.variables_dict == {'built': datetime.date(2017, 1, 1), 1: 'one'}
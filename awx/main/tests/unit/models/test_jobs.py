@@ -8,9 +8,11 @@ from awx.main.models import (
     Host,
 )
 
+import calendar
 import datetime
 import json
 import base64
+import os
 from dateutil.tz import tzutc
 
 
@@ -29,6 +31,16 @@ class CacheMock(object):
     def delete(self, key):
         del self.d[key]
 
+    def get_multi(self, keys):
+        return dict((key, self.d[key]) for key in keys if key in self.d)
+
+    def set_multi(self, mapping):
+        self.d.update(mapping)
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.d.pop(key, None)
+
 
 @pytest.fixture
 def old_time():
@@ -67,6 +79,9 @@ def mock_cache(mocker):
     mocker.patch.object(cache, 'set', wraps=cache.set)
     mocker.patch.object(cache, 'get', wraps=cache.get)
     mocker.patch.object(cache, 'delete', wraps=cache.delete)
+    mocker.patch.object(cache, 'get_multi', wraps=cache.get_multi)
+    mocker.patch.object(cache, 'set_multi', wraps=cache.set_multi)
+    mocker.patch.object(cache, 'delete_multi', wraps=cache.delete_multi)
     return cache
 
 
@@ -90,19 +105,22 @@ def test_start_job_fact_cache(hosts, job, inventory, mocker):
 
     job.start_job_fact_cache()
 
-    job._get_memcache_connection().set.assert_any_call('5', [h.name for h in hosts])
-    for host in hosts:  
-        job._get_memcache_connection().set.assert_any_call('{}-{}'.format(5, base64.b64encode(host.name)), json.dumps(host.ansible_facts))
-        job._get_memcache_connection().set.assert_any_call('{}-{}-modified'.format(5, base64.b64encode(host.name)), host.ansible_facts_modified.isoformat())
+    cache = job._get_memcache_connection()
+    cache.set.assert_any_call('5', [h.name for h in hosts])
+    cache.set_multi.assert_called_once()
+    for host in hosts:
+        assert cache.d['{}-{}'.format(5, base64.b64encode(host.name))] == json.dumps(host.ansible_facts)
+        assert cache.d['{}-{}-modified'.format(5, base64.b64encode(host.name))] == host.ansible_facts_modified.isoformat()
 
 
 def test_start_job_fact_cache_existing_host(hosts, hosts2, job, job2, inventory, mocker):
 
     job.start_job_fact_cache()
 
-    for host in hosts:  
-        job._get_memcache_connection().set.assert_any_call('{}-{}'.format(5, base64.b64encode(host.name)), json.dumps(host.ansible_facts))
-        job._get_memcache_connection().set.assert_any_call('{}-{}-modified'.format(5, base64.b64encode(host.name)), host.ansible_facts_modified.isoformat())
+    cache = job._get_memcache_connection()
+    for host in hosts:
+        assert cache.d['{}-{}'.format(5, base64.b64encode(host.name))] == json.dumps(host.ansible_facts)
+        assert cache.d['{}-{}-modified'.format(5, base64.b64encode(host.name))] == host.ansible_facts_modified.isoformat()
 
     job._get_memcache_connection().set.reset_mock()
 
@@ -128,8 +146,7 @@ def test_memcached_fact_modified_key_unicode(job):
 def test_finish_job_fact_cache(job, hosts, inventory, mocker, new_time):
 
     job.start_job_fact_cache()
-    for h in hosts:
-        h.save = mocker.Mock()
+    job._save_host_facts = mocker.Mock()
 
     host_key = job.memcached_fact_host_key(hosts[1].name)
     modified_key = job.memcached_fact_modified_key(hosts[1].name)
@@ -140,9 +157,72 @@ def test_finish_job_fact_cache(job, hosts, inventory, mocker, new_time):
     
     job.finish_job_fact_cache()
 
-    hosts[0].save.assert_not_called()
-    hosts[2].save.assert_not_called()
+    job._save_host_facts.assert_called_once_with([hosts[1]])
     assert hosts[1].ansible_facts == ansible_facts_new
-    assert hosts[1].insights_system_id == "updated_by_scan"
-    hosts[1].save.assert_called_once_with()
 
+
+def test_finish_job_fact_cache_expired(job, hosts, inventory, mocker):
+
+    job.start_job_fact_cache()
+    job._save_host_facts = mocker.Mock()
+    cache = job._get_memcache_connection()
+    del cache.d[job.memcached_fact_modified_key(hosts[0].name)]
+
+    job.finish_job_fact_cache()
+
+    assert job.memcached_fact_host_key(hosts[0].name) not in cache.d
+    job._save_host_facts.assert_called_once_with([])
+
+
+def test_file_fact_cache(job, hosts, inventory, mocker, tmpdir):
+    destination = str(tmpdir.join('fact_cache'))
+    job.start_job_fact_cache(destination)
+
+    for host in hosts:
+        with open(os.path.join(destination, host.name)) as f:
+            assert json.load(f) == host.ansible_facts
+        assert abs(os.path.getmtime(os.path.join(destination, host.name)) -
+                   calendar.timegm(host.ansible_facts_modified.utctimetuple())) < 1
+
+    ansible_facts_new = {"foo": "bar", "insights": {"system_id": "updated_by_scan"}}
+    with open(os.path.join(destination, hosts[1].name), 'w') as f:
+        json.dump(ansible_facts_new, f)
+    job._save_host_facts = mocker.Mock()
+
+    job.finish_job_fact_cache(destination)
+
+    job._save_host_facts.assert_called_once_with([hosts[1]])
+    assert hosts[1].ansible_facts == ansible_facts_new
+
+
+def test_save_host_facts_sets_insights_id(job, hosts, mocker, settings):
+    settings.AWX_REBUILD_SMART_MEMBERSHIP = False
+    hosts[1].ansible_facts = {"insights": {"system_id": "updated_by_scan"}}
+    mocker.patch('awx.main.models.jobs.connection', vendor='sqlite')
+    host_objects = mocker.patch('awx.main.models.inventory.Host.objects')
+    job._save_host_facts([hosts[1]])
+    assert hosts[1].insights_system_id == "updated_by_scan"
+    host_objects.filter.return_value.update.assert_called_once_with(
+        ansible_facts=hosts[1].ansible_facts,
+        ansible_facts_modified=hosts[1].ansible_facts_modified,
+        insights_system_id="updated_by_scan")
+
+
+
+@pytest.mark.parametrize('limit,terms', [
+    ('web1', ['web1']),
+    ('web1, dbservers', ['web1', 'dbservers']),
+    ('web1:dbservers', ['web1', 'dbservers']),
+    ('fe80::1, web1', ['fe80::1', 'web1']),
+    ('fe80::1', None),
+    ('2001:db8:0:1', None),
+    ('web1.example.com:2222', None),
+    ('@/tmp/site.retry', None),
+    ('ungrouped', None),
+    ('web*', None),
+    ('all:!db1', None),
+    ('web[0:2]', None),
+    ('', None),
+])
+def test_get_limit_terms(limit, terms):
+    assert Job(limit=limit)._get_limit_terms() == terms
@@ -1,3 +1,4 @@
+import os
 import pytest
 import json
 from awx.main.models import (
@@ -13,3 +14,31 @@ def test_clean_credential_insights():
 
     assert json.dumps(str(e.value)) == json.dumps(str([u'Insights Credential is required for an Insights Project.']))
 
+
+def test_local_scm_revision_record(tmpdir, settings):
+    settings.PROJECTS_ROOT = str(tmpdir)
+    proj = Project(name="myproj", scm_type='git', local_path='_1__myproj')
+    assert proj.get_local_scm_revision() is None
+
+    proj.set_local_scm_revision('abc123')
+    assert proj.get_revision_file() == str(tmpdir.join('_1__myproj.revision'))
+    assert proj.get_local_scm_revision() == 'abc123'
+
+    proj.set_local_scm_revision(None)
+    assert proj.get_local_scm_revision() is None
+
+
+def test_revision_snapshots(tmpdir, settings):
+    settings.PROJECTS_ROOT = str(tmpdir)
+    tmpdir.mkdir('_1__myproj').join('site.yml').write('- hosts: all')
+    proj = Project(name="myproj", scm_type='git', local_path='_1__myproj')
+
+    for revision in ('rev1', 'rev2', 'rev3'):
+        snapshot = proj.create_snapshot(revision)
+        assert snapshot == proj.get_snapshot_path(revision)
+        os.utime(snapshot, (0, {'rev1': 1, 'rev2': 2, 'rev3': 3}[revision]))
+
+    assert proj.prune_snapshots(1, in_use=['rev1']) == ['rev2']
+    assert proj.get_snapshot_path('rev1')
+    assert proj.get_snapshot_path('rev2') is None
+    assert proj.get_snapshot_path('../rev3') is None
@@ -8,6 +8,7 @@ from django.utils.timezone import now as tz_now
 from django.db import DatabaseError
 
 from awx.main.scheduler import TaskManager
+from awx.main.scheduler import tasks as scheduler_tasks
 from awx.main.models import (
     Job,
     Instance,
@@ -67,3 +68,48 @@ class TestCleanupInconsistentCeleryTasks():
         active_task_queues, queues = tm.get_active_tasks()
         assert 'host1' in queues
         assert 'host2' in queues
+
+
+class TestCoalescedTaskManager():
+    @mock.patch.object(scheduler_tasks.run_job_launch, 'delay')
+    def test_only_one_pass_queued(self, delay):
+        cache.delete(scheduler_tasks.TASK_MANAGER_PENDING_KEY)
+        for job_id in range(5):
+            scheduler_tasks.schedule_job_launch(job_id)
+        delay.assert_called_once_with(0)
+
+    @mock.patch.object(scheduler_tasks.run_job_complete, 'delay')
+    @mock.patch.object(scheduler_tasks, 'TaskManager')
+    def test_pass_clears_pending_flag(self, TaskManager, delay):
+        TaskManager.return_value.schedule.side_effect = self.acquire_lock
+        cache.set(scheduler_tasks.TASK_MANAGER_PENDING_KEY, 1)
+        scheduler_tasks.run_job_complete(1)
+        TaskManager.return_value.schedule.assert_called_once_with()
+        assert not delay.called
+        scheduler_tasks.schedule_job_complete(2)
+        delay.assert_called_once_with(2)
+        cache.delete(scheduler_tasks.TASK_MANAGER_PENDING_KEY)
+
+    @mock.patch.object(scheduler_tasks.run_job_complete, 'delay')
+    @mock.patch.object(scheduler_tasks, 'TaskManager')
+    def test_request_during_run_queues_another_pass(self, TaskManager, delay):
+        cache.delete(scheduler_tasks.TASK_MANAGER_PENDING_KEY)
+        schedule = TaskManager.return_value.schedule
+
+        def run_holding_lock():
+            self.acquire_lock()
+            # another pass is requested while this one holds the lock
+            schedule.side_effect = lambda: False
+            scheduler_tasks.run_task_manager()
+            assert not delay.called
+
+        schedule.side_effect = run_holding_lock
+        scheduler_tasks.run_job_complete(1)
+        delay.assert_called_once_with(1)
+        cache.delete(scheduler_tasks.TASK_MANAGER_PENDING_KEY)
+        cache.delete(scheduler_tasks.TASK_MANAGER_DIRTY_KEY)
+
+    @staticmethod
+    def acquire_lock():
+        # as TaskManager.schedule does once it holds the lock
+        cache.delete(scheduler_tasks.TASK_MANAGER_DIRTY_KEY)
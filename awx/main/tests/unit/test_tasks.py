@@ -7,12 +7,15 @@ import os
 import re
 import shutil
 import tempfile
+import time
 
 import fcntl
 import mock
+import psycopg2
 import pytest
 import yaml
 from django.conf import settings
+from django.db import DatabaseError
 
 
 from awx.main.models import (
@@ -31,6 +34,7 @@ from awx.main.models import (
 )
 
 from awx.main import tasks
+from awx.main.utils import pgnotify
 from awx.main.queue import CallbackQueueDispatcher
 from awx.main.utils import encrypt_field, encrypt_value
 
@@ -211,7 +215,9 @@ class TestJobExecution:
                 mock.patch.object(cls, 'inventory', mock.Mock(
                     pk=1,
                     get_script_data=lambda *args, **kw: self.INVENTORY_DATA,
-                    spec_set=['pk', 'get_script_data']
+                    iter_script_data=lambda *args, **kw: iter([json.dumps(self.INVENTORY_DATA)]),
+                    get_content_version=lambda: None,
+                    spec_set=['pk', 'name', 'get_script_data', 'iter_script_data', 'get_content_version']
                 ))
             )
         for p in self.patches:
@@ -311,6 +317,32 @@ class TestGenericRun(TestJobExecution):
         assert '--ro-bind %s %s' % (settings.ANSIBLE_VENV_PATH, settings.ANSIBLE_VENV_PATH) in ' '.join(args)  # noqa
         assert '--ro-bind %s %s' % (settings.AWX_VENV_PATH, settings.AWX_VENV_PATH) in ' '.join(args)  # noqa
 
+    def test_bwrap_project_snapshot_is_readonly(self, settings):
+        settings.AWX_PROJECT_SNAPSHOTS_ENABLED = True
+        self.instance.scm_revision = 'abc123'
+        snapshot_path = os.path.realpath(self.project_path)
+        with mock.patch.object(Project, 'get_snapshot_path', lambda *a, **kw: snapshot_path):
+            self.task.run(self.pk)
+
+        assert self.run_pexpect.call_count == 1
+        call_args, _ = self.run_pexpect.call_args_list[0]
+        args, cwd, env, stdout = call_args
+        assert cwd == snapshot_path
+        assert '--ro-bind %s %s' % (snapshot_path, snapshot_path) in ' '.join(args)
+        assert '--bind %s %s' % (snapshot_path, snapshot_path) not in ' '.join(args)
+
+    def test_project_snapshot_requires_isolation(self, settings):
+        settings.AWX_PROJECT_SNAPSHOTS_ENABLED = True
+        settings.AWX_PROOT_ENABLED = False
+        self.instance.scm_revision = 'abc123'
+        with mock.patch.object(Project, 'get_snapshot_path', lambda *a, **kw: '/does/not/exist'):
+            self.task.run(self.pk)
+
+        assert self.run_pexpect.call_count == 1
+        call_args, _ = self.run_pexpect.call_args_list[0]
+        args, cwd, env, stdout = call_args
+        assert cwd == self.project_path
+
     def test_created_by_extra_vars(self):
         self.instance.created_by = User(pk=123, username='angry-spud')
         self.task.run(self.pk)
@@ -1660,3 +1692,220 @@ def test_aquire_lock_acquisition_fail_logged(fcntl_flock, logging_getLogger, os_
         ProjectUpdate.acquire_lock(instance)
     os_close.assert_called_with(3)
     assert logger.err.called_with("I/O error({0}) while trying to aquire lock on file [{1}]: {2}".format(3, 'this_file_does_not_exist', 'dummy message'))
+
+
+def test_remove_static_inventory_cache(tmpdir, settings):
+    settings.AWX_INVENTORY_CACHE_ROOT = str(tmpdir)
+    for name in ('1_abc.json', '1_def.json', '12_abc.json'):
+        tmpdir.join(name).write('{}')
+    tasks.remove_static_inventory_cache(1)
+    assert [f.basename for f in tmpdir.listdir()] == ['12_abc.json']
+
+
+class TestCancelWatcher:
+
+    @pytest.fixture
+    def listener(self, mocker):
+        listener = mock.Mock(**{'received.return_value': []})
+        mocker.patch.object(pgnotify.PGListener, 'start', return_value=listener)
+        mocker.patch.object(tasks, 'cancel_notifications', pgnotify.PGNotificationDispatcher('awx_cancel'))
+        return listener
+
+    def get_watcher(self, pk=1):
+        task = mock.Mock(**{'update_model.return_value': mock.Mock(cancel_flag=True)})
+        return tasks.CancelWatcher(task, pk), task
+
+    def test_polls_every_call_without_listener(self, listener):
+        pgnotify.PGListener.start.return_value = None
+        watcher, task = self.get_watcher()
+        assert watcher() is True
+        assert watcher() is True
+        assert task.update_model.call_count == 2
+
+    def test_reads_flag_only_when_notified(self, listener, settings):
+        settings.AWX_CANCEL_POLL_INTERVAL = 3600
+        watcher, task = self.get_watcher()
+        # the first call always checks, in case the job was canceled before
+        # the listener was started
+        assert watcher() is True
+        assert watcher() is False
+        assert task.update_model.call_count == 1
+        listener.received.return_value = ['1']
+        assert watcher() is True
+        assert task.update_model.call_count == 2
+
+    def test_jobs_share_one_listener(self, listener, settings):
+        settings.AWX_CANCEL_POLL_INTERVAL = 3600
+        first, first_task = self.get_watcher(1)
+        second, second_task = self.get_watcher(2)
+        assert pgnotify.PGListener.start.call_count == 1
+        first(), second()
+        # a notification for the second job is kept until its watcher asks
+        listener.received.return_value = ['2']
+        assert first() is False
+        listener.received.return_value = []
+        assert second() is True
+        assert first_task.update_model.call_count == 1
+        assert second_task.update_model.call_count == 2
+
+        first.close()
+        assert not listener.close.called
+        second.close()
+        listener.close.assert_called_once_with()
+
+    def test_falls_back_to_polling_when_connection_is_lost(self, listener, settings):
+        settings.AWX_CANCEL_POLL_INTERVAL = 3600
+        first, first_task = self.get_watcher(1)
+        second, second_task = self.get_watcher(2)
+        listener.received.side_effect = psycopg2.OperationalError()
+        assert first() is True
+        listener.close.assert_called_once_with()
+        assert first.listening is False
+        assert first() is True
+        assert first_task.update_model.call_count == 2
+        # the other job notices the lost connection too
+        assert second() is True
+        assert second.listening is False
+
+
+class TestCoalescedComputedFields:
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        tasks.cache.clear()
+
+    @pytest.fixture(autouse=True)
+    def on_commit(self, mocker):
+        # run commit hooks right away, as outside of a transaction
+        return mocker.patch.object(tasks.connection, 'on_commit', side_effect=lambda func: func())
+
+    def test_running_key_outlives_its_timeout(self):
+        with tasks._refreshed_cache_key('running', 0.3):
+            time.sleep(0.5)
+            assert tasks.cache.get('running') is True
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_requested_on_commit(self, delay, on_commit):
+        on_commit.side_effect = None
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[1], group_ids=[])
+        delay.assert_not_called()
+        assert tasks._pop_computed_fields_delta(1) == (None, None)
+        on_commit.call_args[0][0]()
+        delay.assert_called_once_with(1, True)
+        assert tasks._pop_computed_fields_delta(1) == (set([1]), set())
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_requests_merge_into_pending_update(self, delay):
+        for i in range(5):
+            tasks.schedule_update_inventory_computed_fields(1, False)
+        tasks.schedule_update_inventory_computed_fields(2, True)
+        assert delay.call_args_list == [mock.call(1, False), mock.call(2, True)]
+        assert tasks.cache.get(tasks._computed_fields_key('merged', 1)) == 4
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_merged_update_hosts_request(self, delay):
+        tasks.schedule_update_inventory_computed_fields(1, False)
+        tasks.schedule_update_inventory_computed_fields(1, True)
+        inventory = mock.Mock()
+        with mock.patch.object(Inventory.objects, 'filter') as inventory_filter:
+            inventory_filter.return_value.__getitem__.return_value = inventory
+            tasks.update_inventory_computed_fields(1, False)
+        inventory.update_computed_fields.assert_called_once_with(update_hosts=True, host_ids=None, group_ids=None)
+
+        # the pending flag is cleared once the update starts
+        tasks.schedule_update_inventory_computed_fields(1, False)
+        assert delay.call_count == 2
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_update_while_running_requeues_once(self, delay):
+        tasks.cache.add(tasks._computed_fields_key('running', 1), True)
+        with mock.patch.object(Inventory.objects, 'filter') as inventory_filter:
+            tasks.update_inventory_computed_fields(1, True)
+            inventory_filter.assert_not_called()
+        delay.assert_not_called()
+
+        tasks.cache.delete(tasks._computed_fields_key('running', 1))
+        inventory = mock.Mock()
+        with mock.patch.object(Inventory.objects, 'filter') as inventory_filter:
+            inventory_filter.return_value.__getitem__.return_value = inventory
+            tasks.update_inventory_computed_fields(1, True)
+        delay.assert_called_once_with(1, False)
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_changed_hosts_and_groups_are_merged(self, delay):
+        # nothing recorded yet: recompute everything
+        assert tasks._pop_computed_fields_delta(1) == (None, None)
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[1, 2], group_ids=[])
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[2, 3], group_ids=[7])
+        assert tasks._pop_computed_fields_delta(1) == (set([1, 2, 3]), set([7]))
+        assert tasks._pop_computed_fields_delta(1) == (set(), set())
+
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[1], group_ids=[])
+        tasks.schedule_update_inventory_computed_fields(1, True)
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[2], group_ids=[])
+        assert tasks._pop_computed_fields_delta(1) == (None, None)
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_failed_update_becomes_full_update(self, delay):
+        tasks._pop_computed_fields_delta(1)
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[1], group_ids=[])
+        inventory = mock.Mock(**{'update_computed_fields.side_effect': ValueError()})
+        with mock.patch.object(Inventory.objects, 'filter') as inventory_filter:
+            inventory_filter.return_value.__getitem__.return_value = inventory
+            with pytest.raises(ValueError):
+                tasks.update_inventory_computed_fields(1, True)
+        inventory.update_computed_fields.assert_called_once_with(update_hosts=True, host_ids=set([1]), group_ids=set())
+        assert tasks._pop_computed_fields_delta(1) == (None, None)
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_duplicate_update_keeps_delta(self, delay):
+        tasks._pop_computed_fields_delta(1)
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[1], group_ids=[2])
+        error = DatabaseError('Save with update_fields did not affect any rows.')
+        inventory = mock.Mock(**{'update_computed_fields.side_effect': error})
+        with mock.patch.object(Inventory.objects, 'filter') as inventory_filter:
+            inventory_filter.return_value.__getitem__.return_value = inventory
+            tasks.update_inventory_computed_fields(1, True)
+        assert tasks._pop_computed_fields_delta(1) == (set([1]), set([2]))
+
+    @mock.patch.object(tasks.update_inventory_computed_fields, 'delay')
+    def test_large_delta_becomes_full_update(self, delay, settings):
+        settings.AWX_INVENTORY_COMPUTED_FIELDS_MAX_DELTA = 3
+        tasks._pop_computed_fields_delta(1)
+        tasks.schedule_update_inventory_computed_fields(1, True, host_ids=[1, 2], group_ids=[1, 2])
+        assert tasks._pop_computed_fields_delta(1) == (None, None)
+
+
+class TestScheduleSmartInventoryMemberships:
+
+    @pytest.fixture(autouse=True)
+    def on_commit(self, settings, mocker):
+        settings.AWX_REBUILD_SMART_MEMBERSHIP = True
+        tasks._smart_membership_changes.changes = None
+        return mocker.patch.object(tasks.connection, 'on_commit')
+
+    def commit(self, on_commit):
+        for call in on_commit.call_args_list:
+            call[0][0]()
+
+    @mock.patch.object(tasks.update_host_smart_inventory_memberships, 'delay')
+    def test_changes_merge_into_one_task(self, delay, on_commit):
+        tasks.schedule_update_host_smart_inventory_memberships(host_names=['host1'])
+        tasks.schedule_update_host_smart_inventory_memberships(host_names=['host2', 'host1'])
+        tasks.schedule_update_host_smart_inventory_memberships(inventory_id=3)
+        self.commit(on_commit)
+        assert delay.call_args_list == [mock.call(host_names=['host1', 'host2']), mock.call(inventory_id=3)]
+
+    @mock.patch.object(tasks.update_host_smart_inventory_memberships, 'delay')
+    def test_too_many_changes_become_full_update(self, delay, on_commit, settings):
+        settings.AWX_SMART_MEMBERSHIP_MAX_HOSTS = 2
+        tasks.schedule_update_host_smart_inventory_memberships(host_names=['host1', 'host2', 'host3'])
+        tasks.schedule_update_host_smart_inventory_memberships(host_names=['host4'])
+        self.commit(on_commit)
+        assert delay.call_args_list == [mock.call()]
+
+    @mock.patch.object(tasks.update_host_smart_inventory_memberships, 'delay')
+    def test_disabled(self, delay, on_commit, settings):
+        settings.AWX_REBUILD_SMART_MEMBERSHIP = False
+        tasks.schedule_update_host_smart_inventory_memberships(host_names=['host1'])
+        on_commit.assert_not_called()
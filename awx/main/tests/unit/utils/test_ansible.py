@@ -0,0 +1,70 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+import os
+
+import mock
+import pytest
+
+from awx.main.utils import ansible
+from awx.main.utils.ansible import scan_project_files, script_data_to_static_inventory
+
+
+def test_script_data_to_static_inventory():
+    script_data = {
+        'all': {'hosts': ['solo'], 'vars': {'a': 1}},
+        'web': {'hosts': ['web1'], 'children': ['db'], 'vars': {'b': 2}},
+        'db': {'hosts': ['db1'], 'children': [], 'vars': {}},
+        '_meta': {'hostvars': {'solo': {}, 'web1': {'c': 3}, 'db1': {}}},
+    }
+    assert script_data_to_static_inventory(script_data) == {
+        'all': {
+            'vars': {'a': 1},
+            'hosts': {'solo': None, 'web1': {'c': 3}, 'db1': None},
+        },
+        'web': {'hosts': {'web1': None}, 'children': {'db': None}, 'vars': {'b': 2}},
+        'db': {'hosts': {'db1': None}},
+    }
+
+
+def test_script_data_to_static_inventory_invalid_group_name():
+    script_data = {'web-servers': {'hosts': ['web1']}}
+    assert script_data_to_static_inventory(script_data) is None
+
+
+@pytest.mark.parametrize('host_name', ['web[1:3]', 'web1:2222', 'fe80::1', '[fe80::1]', 'web 1', '-web1'])
+def test_script_data_to_static_inventory_ambiguous_host_name(host_name):
+    script_data = {'web': {'hosts': [host_name]}, '_meta': {'hostvars': {}}}
+    assert script_data_to_static_inventory(script_data) is None
+    script_data = {'all': {'hosts': [host_name]}, '_meta': {'hostvars': {host_name: {}}}}
+    assert script_data_to_static_inventory(script_data) is None
+
+
+def test_scan_project_files(tmpdir):
+    tmpdir.join('site.yml').write('---\n- hosts: all\n')
+    tmpdir.join('vars.yml').write('---\nfoo: bar\n')
+    tmpdir.join('hosts').write('[web]\nweb1\n')
+    tmpdir.mkdir('roles').join('main.yml').write('- hosts: all\n')
+    tmpdir.mkdir('.git').join('play.yml').write('- hosts: all\n')
+    tmpdir.mkdir('plays').join('deploy.yaml').write('- include: ../site.yml\n')
+
+    playbooks, inventories, index = scan_project_files(str(tmpdir))
+    assert playbooks == ['site.yml', 'plays/deploy.yaml']
+    assert inventories == ['hosts']
+    assert sorted(index) == ['hosts', 'plays/deploy.yaml', 'site.yml', 'vars.yml']
+
+    # unchanged files are not read again
+    with mock.patch.object(ansible, 'could_be_playbook') as could_be_playbook:
+        assert scan_project_files(str(tmpdir), index)[:2] == (playbooks, inventories)
+    could_be_playbook.assert_not_called()
+
+    tmpdir.join('vars.yml').write('---\n- hosts: db\n')
+    os.utime(str(tmpdir.join('vars.yml')), (0, 0))
+    playbooks, inventories, index = scan_project_files(str(tmpdir), index)
+    assert playbooks == ['site.yml', 'vars.yml', 'plays/deploy.yaml']
+
+
+def test_could_be_playbook_max_bytes(tmpdir):
+    tmpdir.join('late.yml').write('# comment\n' * 100 + '- hosts: all\n')
+    assert ansible.could_be_playbook(str(tmpdir), str(tmpdir), 'late.yml') == 'late.yml'
+    assert ansible.could_be_playbook(str(tmpdir), str(tmpdir), 'late.yml', max_bytes=100) is None
@@ -164,3 +164,19 @@ def test_extract_ansible_vars():
     redacted, var_list = common.extract_ansible_vars(json.dumps(my_dict))
     assert var_list == set(['ansible_connetion_setting'])
     assert redacted == {"foobar": "baz"}
+
+
+def test_link_copy_tree(tmpdir):
+    src = tmpdir.mkdir('src')
+    src.join('site.yml').write('- hosts: all')
+    src.mkdir('roles').join('main.yml').write('---')
+    src.mkdir('.git').join('HEAD').write('ref: refs/heads/master')
+    os.symlink('site.yml', str(src.join('link.yml')))
+    dest = tmpdir.join('dest')
+
+    common.link_copy_tree(str(src), str(dest), ignore_dirs=('.git',))
+
+    assert os.path.samefile(str(src.join('site.yml')), str(dest.join('site.yml')))
+    assert dest.join('roles', 'main.yml').read() == '---'
+    assert os.readlink(str(dest.join('link.yml'))) == 'site.yml'
+    assert not dest.join('.git').exists()
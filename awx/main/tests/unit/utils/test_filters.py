@@ -5,7 +5,7 @@ import mock
 from collections import namedtuple
 
 # AWX
-from awx.main.utils.filters import SmartFilter
+from awx.main.utils.filters import SmartFilter, get_fact_path_values, expire_searchable_fact_paths
 
 # Django
 from django.db.models import Q
@@ -135,6 +135,87 @@ class TestSmartFilterQueryFromString():
         assert unicode(q) == unicode(q_expected)
 
 
+@pytest.mark.parametrize("path,values", [
+    (u'a', ['"x"']),
+    (u'b__c', ['1']),
+    (u'b__d', ['2']),
+    (u'e[]', ['"y"', '1', 'true']),
+    (u'e', []),
+    (u'b', []),
+    (u'a[]', []),
+    (u'missing__c', []),
+])
+def test_fact_path_values(path, values):
+    facts = {u'a': u'x', u'b': {u'c': 1, u'd': 2.0}, u'e': [u'y', 1, True, {u'f': 1}]}
+    assert get_fact_path_values(facts, path) == values
+
+
+class TestSmartFilterIndexedFacts():
+
+    @pytest.fixture(autouse=True)
+    def models(self, settings, mocker, request):
+        settings.AWX_INDEXED_ANSIBLE_FACTS = ['ansible_distribution', 'ips[]', 'a[]__b', 'unbuilt']
+        models = {'host': mock.MagicMock(), 'hostfactvalue': mock.MagicMock(), 'hostfactpath': mock.MagicMock()}
+        models['hostfactpath'].objects.values_list.return_value = [u'ansible_distribution', u'ips[]', u'a[]__b']
+        mocker.patch('awx.main.utils.filters.get_model', side_effect=lambda name: models[name])
+        expire_searchable_fact_paths()
+        request.addfinalizer(expire_searchable_fact_paths)
+        return models
+
+    @pytest.mark.parametrize("filter_string,path,value", [
+        ('ansible_facts__ansible_distribution=Ubuntu', u'ansible_distribution', '"Ubuntu"'),
+        ('ansible_facts__ansible_distribution="7"', u'ansible_distribution', '"7"'),
+        ('ansible_facts__ips[]=10.0.0.1', u'ips[]', '"10.0.0.1"'),
+    ])
+    def test_indexed_path(self, models, filter_string, path, value):
+        SmartFilter.query_from_string(filter_string)
+        models['hostfactvalue'].objects.filter.assert_called_once_with(path=path, value=value)
+        models['host'].objects.filter.assert_called_once_with(
+            pk__in=models['hostfactvalue'].objects.filter.return_value.values.return_value)
+
+    @pytest.mark.parametrize("filter_string", [
+        'ansible_facts__ansible_distribution_version=7',
+        'ansible_facts__a[]__b=1',
+        'ansible_distribution=Ubuntu',
+        # listed, but the index_ansible_facts command has not built it yet
+        'ansible_facts__unbuilt=1',
+    ])
+    def test_unindexed_path(self, models, filter_string):
+        SmartFilter.query_from_string(filter_string)
+        models['hostfactvalue'].objects.filter.assert_not_called()
+
+
+class TestSmartFilterCompiledQuery():
+
+    @pytest.fixture(autouse=True)
+    def query_from_string(self, settings, mocker):
+        settings.AWX_SMART_FILTER_CACHE_SIZE = 2
+        SmartFilter._compiled_queries.clear()
+        return mocker.patch.object(SmartFilter, 'query_from_string', side_effect=lambda s: mock.Mock(name=s))
+
+    def test_parsed_once_per_filter_and_organization(self, query_from_string):
+        SmartFilter.compiled_query('name=foo', 1)
+        query = SmartFilter.compiled_query('name=foo', 1)
+        query_from_string.assert_called_once_with('name=foo')
+        # A copy of the organization-filtered query is returned each time.
+        compiled = SmartFilter._compiled_queries[(u'name=foo', 1)]
+        assert query is compiled.all.return_value
+        SmartFilter.compiled_query('name=foo', 2)
+        SmartFilter.compiled_query('name=foo')
+        assert query_from_string.call_count == 3
+
+    def test_least_recently_used_evicted(self, query_from_string):
+        SmartFilter.compiled_query('name=a')
+        SmartFilter.compiled_query('name=b')
+        SmartFilter.compiled_query('name=a')
+        SmartFilter.compiled_query('name=c')
+        assert query_from_string.call_count == 3
+        SmartFilter.compiled_query('name=a')
+        assert query_from_string.call_count == 3
+        SmartFilter.compiled_query('name=b')
+        assert query_from_string.call_count == 4
+
+
 '''
 #('"facts__quoted_val"="f\"oo"', 1),
 #('facts__facts__arr[]="foo"', 1),
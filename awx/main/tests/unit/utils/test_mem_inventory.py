@@ -1,11 +1,13 @@
 # AWX utils
 from awx.main.utils.mem_inventory import (
     MemInventory,
-    mem_data_to_dict, dict_to_mem_data
+    SpilledHostVars,
+    mem_data_to_dict, dict_to_mem_data, stream_to_mem_data
 )
 
 import pytest
 import json
+from StringIO import StringIO
 
 
 @pytest.fixture
@@ -126,3 +128,30 @@ def test_host_lists_accepted(JSON_with_lists):
     # Check that marietta's hosts was saved
     h = inventory.get_host('host6.example.com')
     assert h.name == 'host6.example.com'
+
+
+def _normalized(data):
+    # Host and child group lists follow the order in which groups were read.
+    if isinstance(data, dict):
+        return dict((k, _normalized(v)) for k, v in data.items())
+    if isinstance(data, list):
+        return sorted(data)
+    return data
+
+
+@pytest.mark.inventory_import
+@pytest.mark.parametrize('chunk_size', [1, 7, 65536])
+@pytest.mark.parametrize('spill', [False, True])
+def test_stream_JSON_to_memory(JSON_of_inv, JSON_with_lists, chunk_size, spill):
+    for data in (json.dumps(JSON_of_inv, indent=2), json.dumps(JSON_with_lists)):
+        expected = mem_data_to_dict(dict_to_mem_data(json.loads(data)))
+        inventory = stream_to_mem_data(StringIO(data), chunk_size=chunk_size,
+                                       hostvars=SpilledHostVars() if spill else None)
+        assert _normalized(mem_data_to_dict(inventory)) == _normalized(expected)
+
+
+@pytest.mark.inventory_import
+@pytest.mark.parametrize('data', ['{"all": {"hosts": [', '{"all": {}} {}', '["all"]', ''])
+def test_stream_invalid_JSON(data):
+    with pytest.raises(ValueError):
+        stream_to_mem_data(StringIO(data), chunk_size=4)
@@ -0,0 +1,40 @@
+# awx.main.utils.resolver
+import socket
+
+from awx.main.utils import resolver
+
+
+def _getaddrinfo(name, port):
+    if name == 'missing.example.com':
+        raise socket.gaierror('Name or service not known')
+    if name == '10.0.0.1':
+        return [(2, 1, 6, '', ('10.0.0.1', 0))]
+    return [(2, 1, 6, '', ('10.0.0.2', 0)), (2, 2, 17, '', ('10.0.0.2', 0)),
+            (10, 1, 6, '', ('fd00::2', 0, 0, 0))]
+
+
+def test_resolve_host_names(mocker, settings):
+    settings.AWX_CALLBACK_ADDRESS_TTL = 300
+    settings.AWX_CALLBACK_RESOLVER_CONCURRENCY = 2
+    cache = mocker.patch.object(resolver, 'cache')
+    cache.get_many.return_value = {}
+    mocker.patch.object(resolver.socket, 'getaddrinfo', side_effect=_getaddrinfo)
+    addresses = resolver.resolve_host_names(['host.example.com', 'missing.example.com', '10.0.0.1'])
+    assert addresses == {
+        'host.example.com': set(['10.0.0.2', 'fd00::2']),
+        'missing.example.com': set(),
+        '10.0.0.1': set(),
+    }
+    cached, ttl = cache.set_many.call_args[0]
+    assert ttl == 300
+    assert cached[resolver._cache_key('host.example.com')] == ['10.0.0.2', 'fd00::2']
+    assert cached[resolver._cache_key('missing.example.com')] == []
+
+
+def test_resolve_host_names_uses_cache(mocker, settings):
+    cache = mocker.patch.object(resolver, 'cache')
+    cache.get_many.return_value = {resolver._cache_key('host.example.com'): ['10.0.0.2']}
+    getaddrinfo = mocker.patch.object(resolver.socket, 'getaddrinfo', side_effect=_getaddrinfo)
+    assert resolver.resolve_host_names(['host.example.com']) == {'host.example.com': set(['10.0.0.2'])}
+    assert not getaddrinfo.called
+    assert not cache.set_many.called
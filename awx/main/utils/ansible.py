@@ -7,14 +7,20 @@ import os
 from itertools import islice
 
 # Django
-from django.utils.encoding import smart_str
+from django.utils.encoding import smart_str, smart_text
 
 
-__all__ = ['skip_directory', 'could_be_playbook', 'could_be_inventory']
+__all__ = ['skip_directory', 'could_be_playbook', 'could_be_inventory',
+           'scan_project_files', 'script_data_to_static_inventory']
 
 
 valid_playbook_re = re.compile(r'^\s*?-?\s*?(?:hosts|include):\s*?.*?$')
 valid_inventory_re = re.compile(r'^[a-zA-Z0-9_.=\[\]]')
+# Group names accepted by the yaml inventory plugin of older Ansible releases.
+valid_static_group_re = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+# Host names the yaml inventory plugin reads back unchanged; it expands [a:b]
+# ranges and splits off :port suffixes (which also catches IPv6 addresses).
+valid_static_host_re = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]*$')
 
 
 def skip_directory(relative_directory_path):
@@ -35,7 +41,7 @@ def skip_directory(relative_directory_path):
     return False
 
 
-def could_be_playbook(project_path, dir_path, filename):
+def could_be_playbook(project_path, dir_path, filename, max_bytes=None):
     if os.path.splitext(filename)[-1] not in ['.yml', '.yaml']:
         return None
     playbook_path = os.path.join(dir_path, filename)
@@ -43,14 +49,19 @@ def could_be_playbook(project_path, dir_path, filename):
     # includes. Use regex to allow files with invalid YAML to
     # show up.
     matched = False
+    bytes_read = 0
     try:
-        for n, line in enumerate(file(playbook_path)):
-            if valid_playbook_re.match(line):
-                matched = True
-            # Any YAML file can also be encrypted with vault;
-            # allow these to be used as the main playbook.
-            elif n == 0 and line.startswith('$ANSIBLE_VAULT;'):
-                matched = True
+        with open(playbook_path) as playbook_file:
+            for n, line in enumerate(playbook_file):
+                if valid_playbook_re.match(line):
+                    matched = True
+                # Any YAML file can also be encrypted with vault;
+                # allow these to be used as the main playbook.
+                elif n == 0 and line.startswith('$ANSIBLE_VAULT;'):
+                    matched = True
+                bytes_read += len(line)
+                if matched or (max_bytes and bytes_read >= max_bytes):
+                    break
     except IOError:
         return None
     if not matched:
@@ -84,3 +95,86 @@ def could_be_inventory(project_path, dir_path, filename):
     except IOError:
         return None
     return inventory_rel_path
+
+
+def scan_project_files(project_path, index=None, max_bytes=None):
+    '''
+    Walk a project checkout for files that could be playbooks or inventory.
+
+    `index` is the index returned by an earlier scan of the same path; files
+    whose mtime, size and mode have not changed since are not read again.
+    Returns (playbooks, inventories, index), with paths relative to the
+    project in walk order.
+    '''
+    index = index or {}
+    new_index = {}
+    playbooks = []
+    inventories = []
+    project_path = smart_str(project_path)
+    for dir_path, dir_names, filenames in os.walk(project_path):
+        relative_dir = os.path.relpath(dir_path, project_path)
+        if relative_dir != os.curdir and skip_directory(relative_dir):
+            # nothing below a skipped directory is listed either
+            dir_names[:] = []
+            continue
+        dir_names.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dir_path, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            relative_path = smart_text(os.path.relpath(path, project_path))
+            stamp = [st.st_mtime, st.st_size, st.st_mode]
+            entry = index.get(relative_path)
+            if not entry or entry[:3] != stamp:
+                entry = stamp + [
+                    could_be_playbook(project_path, dir_path, filename, max_bytes=max_bytes) is not None,
+                    could_be_inventory(project_path, dir_path, filename) is not None,
+                ]
+            new_index[relative_path] = entry
+            if entry[3]:
+                playbooks.append(relative_path)
+            if entry[4]:
+                inventories.append(relative_path)
+    return playbooks, inventories, new_index
+
+
+def script_data_to_static_inventory(script_data):
+    '''
+    Convert inventory script (--list) output into the structure read by the
+    Ansible yaml inventory plugin, so it can be written as a static file
+    instead of a script.  Returns None when a group or host name cannot be
+    expressed in that format.
+    '''
+    hostvars = script_data.get('_meta', {}).get('hostvars', {})
+    all_group = {}
+    data = {'all': all_group}
+    for group_name, group_info in script_data.items():
+        if group_name in ('_meta', 'all'):
+            continue
+        if not valid_static_group_re.match(group_name):
+            return None
+        group = data[group_name] = {}
+        if group_info.get('hosts'):
+            if not all(valid_static_host_re.match(host_name) for host_name in group_info['hosts']):
+                return None
+            group['hosts'] = dict((host_name, None) for host_name in group_info['hosts'])
+        if group_info.get('children'):
+            if not all(valid_static_group_re.match(child_name) for child_name in group_info['children']):
+                return None
+            group['children'] = dict((child_name, None) for child_name in group_info['children'])
+        if group_info.get('vars'):
+            group['vars'] = group_info['vars']
+    all_info = script_data.get('all', {})
+    if all_info.get('vars'):
+        all_group['vars'] = all_info['vars']
+    # Every host is listed under all (with its variables); hosts that also
+    # belong to another group are not treated as ungrouped by Ansible.
+    all_hosts = dict((host_name, hostvars.get(host_name) or None) for host_name in all_info.get('hosts', []))
+    all_hosts.update((host_name, host_vars or None) for host_name, host_vars in hostvars.items())
+    if not all(valid_static_host_re.match(host_name) for host_name in all_hosts):
+        return None
+    if all_hosts:
+        all_group['hosts'] = all_hosts
+    return data
@@ -8,6 +8,7 @@ import yaml
 import logging
 import os
 import re
+import shutil
 import subprocess
 import stat
 import sys
@@ -47,7 +48,7 @@ __all__ = ['get_object_or_400', 'get_object_or_403', 'camelcase_to_underscore',
            'extract_ansible_vars', 'get_search_fields', 'get_system_task_capacity',
            'wrap_args_with_proot', 'build_proot_temp_dir', 'check_proot_installed', 'model_to_dict',
            'model_instance_diff', 'timestamp_apiformat', 'parse_yaml_or_json', 'RequireDebugTrueOrTest',
-           'has_model_field_prefetched', 'set_environ', 'IllegalArgumentError',]
+           'has_model_field_prefetched', 'set_environ', 'IllegalArgumentError', 'link_copy_tree',]
 
 
 def get_object_or_400(klass, *args, **kwargs):
@@ -718,6 +719,31 @@ def build_proot_temp_dir():
     return path
 
 
+def link_copy_tree(src, dest, ignore_dirs=()):
+    '''
+    Recreate the directory tree at src under dest, hardlinking regular files
+    (falling back to a copy across filesystems) and copying symlinks as-is.
+    Directories named in ignore_dirs are skipped.
+    '''
+    src = smart_str(src)
+    dest = smart_str(dest)
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames[:] = [d for d in dirnames if d not in ignore_dirs]
+        target_dir = os.path.join(dest, os.path.relpath(dirpath, src))
+        if not os.path.isdir(target_dir):
+            os.makedirs(target_dir)
+        for name in filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+            source = os.path.join(dirpath, name)
+            target = os.path.join(target_dir, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                continue
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+
+
 def wrap_args_with_proot(args, cwd, **kwargs):
     '''
     Wrap existing command line with proot to restrict access to:
@@ -727,6 +753,7 @@ def wrap_args_with_proot(args, cwd, **kwargs):
      - /var/lib/awx (except for current project)
      - /var/log/tower
      - /var/log/supervisor
+    Paths in proot_ro_show_paths are shown read-only.
     '''
     from django.conf import settings
     cwd = os.path.realpath(cwd)
@@ -761,11 +788,15 @@ def wrap_args_with_proot(args, cwd, **kwargs):
         new_args.extend(['--ro-bind', venv, venv])
     show_paths.extend(getattr(settings, 'AWX_PROOT_SHOW_PATHS', None) or [])
     show_paths.extend(kwargs.get('proot_show_paths', []))
+    ro_show_paths = kwargs.get('proot_ro_show_paths', [])
+    show_paths.extend(ro_show_paths)
+    ro_show_paths = set(os.path.realpath(path) for path in ro_show_paths)
     for path in sorted(set(show_paths)):
         if not os.path.exists(path):
             continue
         path = os.path.realpath(path)
-        new_args.extend(['--bind', '%s' % (path,), '%s' % (path,)])
+        bind = '--ro-bind' if path in ro_show_paths else '--bind'
+        new_args.extend([bind, '%s' % (path,), '%s' % (path,)])
     if kwargs.get('isolated'):
         if 'ansible-playbook' in args:
             # playbook runs should cwd to the SCM checkout dir
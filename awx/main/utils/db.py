@@ -3,7 +3,9 @@
 
 # Django database
 from django.db.migrations.loader import MigrationLoader
-from django.db import connection
+from django.db import connection, router, transaction
+from django.db.models import Case, When, Value, F, signals
+from django.db.models.deletion import CASCADE, DO_NOTHING, SET_NULL
 
 # Python
 from itertools import chain
@@ -33,3 +35,94 @@ def get_all_field_names(model):
         # GenericForeignKey from the results.
         if not (field.many_to_one and field.related_model is None)
     )))
+
+
+def bulk_update_fields(model, updates, batch_size=500):
+    '''
+    Apply {pk: {field: value}} updates with one UPDATE per batch of rows.
+    Like QuerySet.update(), this bypasses save() and its signals.
+    '''
+    all_update_pks = list(updates.keys())
+    for offset in xrange(0, len(all_update_pks), batch_size):
+        update_pks = all_update_pks[offset:(offset + batch_size)]
+        fields = set(field for pk in update_pks for field in updates[pk])
+        model.objects.filter(pk__in=update_pks).update(**dict(
+            (field, Case(
+                *[When(pk=pk, then=Value(updates[pk][field])) for pk in update_pks if field in updates[pk]],
+                default=F(field),
+                output_field=model._meta.get_field(field).__class__()
+            )) for field in fields
+        ))
+
+
+def _get_delete_relations(model):
+    # The relations of other models' rows to rows of model, as considered by
+    # Django's deletion Collector (including auto-created m2m through tables).
+    return [
+        related for related in model._meta.get_fields(include_hidden=True)
+        if (related.one_to_many or related.one_to_one) and related.auto_created and not related.concrete
+    ]
+
+
+def _can_bulk_delete(model, check_signals=True):
+    # Rows of model can be deleted with set-based queries if nothing needs to
+    # see each instance: no delete signal receivers, multi-table inheritance
+    # or generic relations, and no on_delete handling other than cascading to,
+    # nulling or ignoring the rows referencing them.
+    if model._meta.parents or model._meta.private_fields:
+        return False
+    if check_signals and (signals.pre_delete.has_listeners(model) or signals.post_delete.has_listeners(model)):
+        return False
+    return all(related.on_delete in (CASCADE, SET_NULL, DO_NOTHING) for related in _get_delete_relations(model))
+
+
+def _bulk_delete_pks(model, pks, using, batch_size):
+    for related in _get_delete_relations(model):
+        if related.on_delete is DO_NOTHING:
+            continue
+        related_model = related.related_model
+        related_qs = related_model._base_manager.using(using).filter(**{'%s__in' % related.field.name: pks})
+        if related.on_delete is SET_NULL:
+            related_qs.update(**{related.field.name: None})
+        elif not _can_bulk_delete(related_model):
+            # e.g. unified job templates; let the Collector handle these few.
+            related_qs.delete()
+        elif _get_delete_relations(related_model):
+            related_pks = list(related_qs.values_list('pk', flat=True))
+            for offset in xrange(0, len(related_pks), batch_size):
+                _bulk_delete_pks(related_model, related_pks[offset:(offset + batch_size)], using, batch_size)
+        else:
+            related_qs._raw_delete(using)
+    model._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+
+
+def bulk_delete(queryset, batch_size=500, before_batch=None, progress=None):
+    '''
+    Delete the rows of a queryset, and the rows depending on them, with
+    set-based queries in batches of batch_size rows, each batch in its own
+    transaction, instead of loading every related object into memory through
+    Django's deletion Collector.  Related rows are deleted or nulled according
+    to on_delete, dependents first; related models that cannot be handled this
+    way (see _can_bulk_delete) fall back to the Collector.
+
+    Like QuerySet.update(), this bypasses the pre_delete and post_delete
+    signals of the rows of the queryset itself; before_batch, if given, is
+    called with a queryset of each batch before it is deleted.  progress, if
+    given, is called with the number of rows deleted so far and their total.
+    Return the number of rows deleted.
+    '''
+    model = queryset.model
+    using = router.db_for_write(model)
+    pks = list(queryset.order_by().values_list('pk', flat=True))
+    for offset in xrange(0, len(pks), batch_size):
+        batch_pks = pks[offset:(offset + batch_size)]
+        with transaction.atomic(using=using):
+            if before_batch is not None:
+                before_batch(model._base_manager.using(using).filter(pk__in=batch_pks))
+            if _can_bulk_delete(model, check_signals=False):
+                _bulk_delete_pks(model, batch_pks, using, batch_size)
+            else:
+                model._base_manager.using(using).filter(pk__in=batch_pks).delete()
+        if progress is not None:
+            progress(offset + len(batch_pks), len(pks))
+    return len(pks)
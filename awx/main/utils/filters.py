@@ -1,4 +1,7 @@
 import re
+import json
+import threading
+from collections import OrderedDict
 from pyparsing import (
     infixNotation,
     opAssoc,
@@ -9,10 +12,18 @@ from pyparsing import (
 )
 
 import django
+from django.conf import settings
+from django.core.cache import cache
 
 from awx.main.utils.common import get_search_fields
 
-__all__ = ['SmartFilter']
+__all__ = ['SmartFilter', 'get_indexed_fact_paths', 'get_searchable_fact_paths',
+           'expire_searchable_fact_paths', 'get_fact_path_values']
+
+# Longest (JSON encoded) ansible_facts value kept in HostFactValue.
+FACT_VALUE_MAX_LENGTH = 1024
+
+SEARCHABLE_FACT_PATHS_CACHE_KEY = 'awx-searchable-fact-paths'
 
 
 def string_to_type(t):
@@ -34,16 +45,92 @@ def get_model(name):
     return django.apps.apps.get_model('main', name)
 
 
+def get_indexed_fact_paths():
+    '''
+    Return the ansible_facts paths from AWX_INDEXED_ANSIBLE_FACTS that can be
+    indexed: keys joined by ``__``, optionally ending in ``[]`` for arrays.
+    '''
+    return set(
+        unicode(path) for path in settings.AWX_INDEXED_ANSIBLE_FACTS
+        if path and u'[]' not in path[:-2]
+    )
+
+
+def get_searchable_fact_paths():
+    '''
+    Return the indexed ansible_facts paths that smart filters can look up in
+    HostFactValue: those the index_ansible_facts command has built the rows
+    of every host for (HostFactPath).  Until then, filters on a newly listed
+    path still test the facts of each host.
+    '''
+    paths = get_indexed_fact_paths()
+    if not paths:
+        return set()
+    built = cache.get(SEARCHABLE_FACT_PATHS_CACHE_KEY)
+    if built is None:
+        built = set(get_model('hostfactpath').objects.values_list('path', flat=True))
+        cache.set(SEARCHABLE_FACT_PATHS_CACHE_KEY, built, None)
+    return paths & built
+
+
+def expire_searchable_fact_paths():
+    cache.delete(SEARCHABLE_FACT_PATHS_CACHE_KEY)
+
+
+def encode_fact_value(value):
+    # Equal JSON numbers are contained in each other whatever their type.
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return json.dumps(value)
+
+
+def get_fact_path_values(facts, path):
+    '''
+    Return the JSON encoded values that a smart filter on the given indexed
+    ansible_facts path matches in these facts, the same as the JSON
+    containment test it otherwise compiles to: the scalar at the path or,
+    for ``[]`` paths, each scalar in the array at the path.
+    '''
+    pieces = path.split(u'__')
+    value = facts
+    for piece in pieces[:-1]:
+        if not isinstance(value, dict) or piece not in value:
+            return []
+        value = value[piece]
+    key = pieces[-1][:-2] if pieces[-1].endswith(u'[]') else pieces[-1]
+    if not isinstance(value, dict) or key not in value:
+        return []
+    values = value[key]
+    if key != pieces[-1]:
+        if not isinstance(values, list):
+            return []
+    else:
+        values = [values]
+    values = set(encode_fact_value(v) for v in values if not isinstance(v, (dict, list)))
+    return sorted(v for v in values if len(v) <= FACT_VALUE_MAX_LENGTH)
+
+
 class SmartFilter(object):
     SEARCHABLE_RELATIONSHIP = 'ansible_facts'
 
+    # Least recently used compiled queries, by (filter_string, organization_id).
+    _compiled_queries = OrderedDict()
+    _compiled_queries_lock = threading.Lock()
+
     class BoolOperand(object):
         def __init__(self, t):
             kwargs = dict()
             k, v = self._extract_key_value(t)
-            k, v = self._json_path_to_contains(k, v)
 
             Host = get_model('host')
+            fact_value = self._indexed_fact_value(k, v)
+            if fact_value is not None:
+                HostFactValue = get_model('hostfactvalue')
+                fact_values = HostFactValue.objects.filter(path=fact_value[0], value=fact_value[1])
+                self.result = Host.objects.filter(pk__in=fact_values.values('host_id'))
+                return
+
+            k, v = self._json_path_to_contains(k, v)
             search_kwargs = self._expand_search(k, v)
             if search_kwargs:
                 kwargs.update(search_kwargs)
@@ -63,6 +150,20 @@ class SmartFilter(object):
                 return v[1:-1]
             return v
 
+        def _indexed_fact_value(self, k, v):
+            '''
+            Return the (path, value) to look up in HostFactValue for a filter
+            on one of the AWX_INDEXED_ANSIBLE_FACTS paths, or None to test
+            the facts of each host.
+            '''
+            prefix = SmartFilter.SEARCHABLE_RELATIONSHIP + u'__'
+            if not k.startswith(prefix) or k[len(prefix):] not in get_searchable_fact_paths():
+                return None
+            value = encode_fact_value(self.strip_quotes_json_logic(v))
+            if len(value) > FACT_VALUE_MAX_LENGTH:
+                return None
+            return (k[len(prefix):], value)
+
         '''
         TODO: We should be able to express this in the grammar and let
               pyparsing do the heavy lifting.
@@ -233,3 +334,27 @@ class SmartFilter(object):
             return res[0].result
 
         raise RuntimeError("Parsing the filter_string %s went terribly wrong" % filter_string)
+
+    @classmethod
+    def compiled_query(cls, filter_string, organization_id=None):
+        '''
+        Like query_from_string, restricted to hosts of the given organization,
+        but only parse each filter string once: the resulting (unevaluated)
+        queries are kept in a small LRU cache of AWX_SMART_FILTER_CACHE_SIZE
+        entries and a copy is returned.
+        '''
+        # Queries compiled before a fact path was indexed are not reused.
+        key = (unicode(filter_string), organization_id, frozenset(get_searchable_fact_paths()))
+        with cls._compiled_queries_lock:
+            query = cls._compiled_queries.pop(key, None)
+            if query is not None:
+                cls._compiled_queries[key] = query
+                return query.all()
+        query = cls.query_from_string(filter_string)
+        if organization_id:
+            query = query.filter(inventory__organization=organization_id)
+        with cls._compiled_queries_lock:
+            cls._compiled_queries[key] = query
+            while len(cls._compiled_queries) > max(settings.AWX_SMART_FILTER_CACHE_SIZE, 0):
+                cls._compiled_queries.popitem(last=False)
+        return query.all()
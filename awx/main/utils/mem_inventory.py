@@ -2,8 +2,10 @@
 # All Rights Reserved.
 
 # Python
+import json
 import re
 import logging
+import tempfile
 from collections import OrderedDict
 
 
@@ -12,11 +14,13 @@ from collections import OrderedDict
 logger = logging.getLogger('awx.main.commands.inventory_import')
 
 
-__all__ = ['MemHost', 'MemGroup', 'MemInventory',
-           'mem_data_to_dict', 'dict_to_mem_data']
+__all__ = ['MemHost', 'MemGroup', 'MemInventory', 'HostVars', 'SpilledHostVars',
+           'mem_data_to_dict', 'dict_to_mem_data', 'stream_to_mem_data']
 
 
 ipv6_port_re = re.compile(r'^\[([A-Fa-f0-9:]{3,})\]:(\d+?)$')
+json_ws_re = re.compile(r'[ \t\n\r]*')
+json_scalar_end_re = re.compile(r'[ \t\n\r,\]}]')
 
 
 # Models for in-memory objects that represent an inventory
@@ -224,6 +228,90 @@ def mem_data_to_dict(inventory):
     return inventory_data
 
 
+def _add_group_data(inventory, k, v):
+    '''
+    Add the hosts, variables and children of group `k` from its data `v`.
+    '''
+    group = inventory.get_group(k)
+    if not group:
+        return
+
+    # Load group hosts/vars/children from a dictionary.
+    if isinstance(v, dict):
+        # Process hosts within a group.
+        hosts = v.get('hosts', {})
+        if isinstance(hosts, dict):
+            for hk, hv in hosts.iteritems():
+                host = inventory.get_host(hk)
+                if not host:
+                    continue
+                if isinstance(hv, dict):
+                    host.variables.update(hv)
+                else:
+                    logger.warning('Expected dict of vars for '
+                                   'host "%s", got %s instead',
+                                   hk, str(type(hv)))
+                group.add_host(host)
+        elif isinstance(hosts, (list, tuple)):
+            for hk in hosts:
+                host = inventory.get_host(hk)
+                if not host:
+                    continue
+                group.add_host(host)
+        else:
+            logger.warning('Expected dict or list of "hosts" for '
+                           'group "%s", got %s instead', k,
+                           str(type(hosts)))
+        # Process group variables.
+        vars = v.get('vars', {})
+        if isinstance(vars, dict):
+            group.variables.update(vars)
+        else:
+            logger.warning('Expected dict of vars for '
+                           'group "%s", got %s instead',
+                           k, str(type(vars)))
+        # Process child groups.
+        children = v.get('children', [])
+        if isinstance(children, (list, tuple)):
+            for c in children:
+                child = inventory.get_group(c, inventory.all_group, child=True)
+                if child and c != 'ungrouped':
+                    group.add_child_group(child)
+        else:
+            logger.warning('Expected list of children for '
+                           'group "%s", got %s instead',
+                           k, str(type(children)))
+
+    # Load host names from a list.
+    elif isinstance(v, (list, tuple)):
+        for h in v:
+            host = inventory.get_host(h)
+            if not host:
+                continue
+            group.add_host(host)
+    else:
+        logger.warning('')
+        logger.warning('Expected dict or list for group "%s", '
+                       'got %s instead', k, str(type(v)))
+
+    if k not in ['all', 'ungrouped']:
+        inventory.all_group.add_child_group(group)
+
+
+def _add_hostvars(inventory, hostvars):
+    '''
+    Add the variables from `_meta.hostvars` to the hosts of the inventory.
+    '''
+    for k,v in inventory.all_group.all_hosts.iteritems():
+        meta_hostvars = hostvars.get(k, {})
+        if isinstance(meta_hostvars, dict):
+            v.variables.update(meta_hostvars)
+        else:
+            logger.warning('Expected dict of vars for '
+                           'host "%s", got %s instead',
+                           k, str(type(meta_hostvars)))
+
+
 def dict_to_mem_data(data, inventory=None):
     '''
     In-place operation on `inventory`, adds contents from `data` to the
@@ -237,79 +325,188 @@ def dict_to_mem_data(data, inventory=None):
     _meta = data.pop('_meta', {})
 
     for k,v in data.iteritems():
-        group = inventory.get_group(k)
-        if not group:
-            continue
-
-        # Load group hosts/vars/children from a dictionary.
-        if isinstance(v, dict):
-            # Process hosts within a group.
-            hosts = v.get('hosts', {})
-            if isinstance(hosts, dict):
-                for hk, hv in hosts.iteritems():
-                    host = inventory.get_host(hk)
-                    if not host:
-                        continue
-                    if isinstance(hv, dict):
-                        host.variables.update(hv)
-                    else:
-                        logger.warning('Expected dict of vars for '
-                                       'host "%s", got %s instead',
-                                       hk, str(type(hv)))
-                    group.add_host(host)
-            elif isinstance(hosts, (list, tuple)):
-                for hk in hosts:
-                    host = inventory.get_host(hk)
-                    if not host:
-                        continue
-                    group.add_host(host)
-            else:
-                logger.warning('Expected dict or list of "hosts" for '
-                               'group "%s", got %s instead', k,
-                               str(type(hosts)))
-            # Process group variables.
-            vars = v.get('vars', {})
-            if isinstance(vars, dict):
-                group.variables.update(vars)
-            else:
-                logger.warning('Expected dict of vars for '
-                               'group "%s", got %s instead',
-                               k, str(type(vars)))
-            # Process child groups.
-            children = v.get('children', [])
-            if isinstance(children, (list, tuple)):
-                for c in children:
-                    child = inventory.get_group(c, inventory.all_group, child=True)
-                    if child and c != 'ungrouped':
-                        group.add_child_group(child)
-            else:
-                logger.warning('Expected list of children for '
-                               'group "%s", got %s instead',
-                               k, str(type(children)))
-
-        # Load host names from a list.
-        elif isinstance(v, (list, tuple)):
-            for h in v:
-                host = inventory.get_host(h)
-                if not host:
-                    continue
-                group.add_host(host)
-        else:
-            logger.warning('')
-            logger.warning('Expected dict or list for group "%s", '
-                           'got %s instead', k, str(type(v)))
-
-        if k not in ['all', 'ungrouped']:
-            inventory.all_group.add_child_group(group)
+        _add_group_data(inventory, k, v)
 
     if _meta:
-        for k,v in inventory.all_group.all_hosts.iteritems():
-            meta_hostvars = _meta['hostvars'].get(k, {})
-            if isinstance(meta_hostvars, dict):
-                v.variables.update(meta_hostvars)
-            else:
-                logger.warning('Expected dict of vars for '
-                               'host "%s", got %s instead',
-                               k, str(type(meta_hostvars)))
+        _add_hostvars(inventory, _meta['hostvars'])
+
+    return inventory
+
+
+# Streaming conversion of JSON inventory output
+
+class HostVars(object):
+    '''
+    Host variables from `_meta.hostvars`, kept until all groups (and so all
+    hosts) have been read.  `found` tells whether the source had hostvars.
+    '''
+
+    def __init__(self):
+        self.found = False
+        self._hostvars = {}
+
+    def add(self, stream, host_name):
+        self._hostvars[host_name] = stream.decode_value()
+
+    def get(self, host_name, default=None):
+        return self._hostvars.get(host_name, default)
+
+    def close(self):
+        self._hostvars = {}
+
+
+class SpilledHostVars(HostVars):
+    '''
+    Like HostVars, but keep the JSON text of each host's variables in a
+    temporary file and only decode it when it is asked for.
+    '''
+
+    def __init__(self, dir=None):
+        super(SpilledHostVars, self).__init__()
+        self._file = tempfile.TemporaryFile(dir=dir)
+        self._offsets = {}
+        self._size = 0
+
+    def add(self, stream, host_name):
+        data = stream.decode_value(raw=True)
+        self._file.seek(self._size)
+        self._file.write(data)
+        self._offsets[host_name] = (self._size, len(data))
+        self._size += len(data)
+
+    def get(self, host_name, default=None):
+        if host_name not in self._offsets:
+            return default
+        offset, length = self._offsets[host_name]
+        self._file.seek(offset)
+        return json.loads(self._file.read(length))
+
+    def close(self):
+        self._offsets = {}
+        self._file.close()
+
+
+class JSONStream(object):
+    '''
+    Incremental reader of a JSON document from a file object, which decodes
+    one value at a time so that objects can be walked without loading the
+    whole document.
+    '''
+
+    def __init__(self, fileobj, chunk_size=65536):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        '''
+        Read more data; read sizes grow with the value being decoded so that a
+        large value is re-scanned a logarithmic number of times.
+        '''
+        if self.eof:
+            return False
+        data = self.fileobj.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _skip_ws(self):
+        while True:
+            self.pos = json_ws_re.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or not self._fill():
+                return
+
+    def peek(self):
+        self._skip_ws()
+        if self.pos >= len(self.buf):
+            raise ValueError('Unexpected end of JSON input')
+        return self.buf[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expected "{}" at "{}"'.format(char, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def expect_end(self):
+        self._skip_ws()
+        if self.pos < len(self.buf):
+            raise ValueError('Extra data after JSON document at "{}"'.format(self.buf[self.pos:self.pos + 20]))
+
+    def decode_value(self, raw=False):
+        '''
+        Decode and return the next value; with raw=True, return its JSON text.
+        '''
+        if self.peek() not in '{["':
+            # Make sure a number or literal is not cut off by the buffer.
+            while not json_scalar_end_re.search(self.buf, self.pos) and self._fill():
+                pass
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                break
+            except ValueError:
+                if not self._fill():
+                    raise
+        start, self.pos = self.pos, end
+        if raw:
+            return self.buf[start:end]
+        return value
+
+    def iter_object(self):
+        '''
+        Walk the object starting at the next value, yielding each key; the
+        caller must consume the key's value (decode_value/iter_object) before
+        asking for the next key.
+        '''
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            if not isinstance(key, basestring):
+                raise ValueError('Expected object key, got {}'.format(key))
+            self.expect(':')
+            yield key
+            if self.peek() == '}':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+def stream_to_mem_data(fileobj, inventory=None, hostvars=None, chunk_size=65536):
+    '''
+    Same as dict_to_mem_data, but read the JSON inventory from `fileobj` one
+    group (and one host's variables) at a time instead of from a dict of the
+    whole inventory.  `hostvars` (a HostVars, by default kept in memory)
+    holds `_meta.hostvars` until all groups have been read.
+    '''
+    if inventory is None:
+        inventory = MemInventory()
+    if hostvars is None:
+        hostvars = HostVars()
+
+    stream = JSONStream(fileobj, chunk_size=chunk_size)
+    for k in stream.iter_object():
+        if k == '_meta':
+            for meta_key in stream.iter_object():
+                if meta_key == 'hostvars':
+                    hostvars.found = True
+                    for host_name in stream.iter_object():
+                        hostvars.add(stream, host_name)
+                else:
+                    stream.decode_value()
+        else:
+            _add_group_data(inventory, k, stream.decode_value())
+    stream.expect_end()
+
+    if hostvars.found:
+        _add_hostvars(inventory, hostvars)
 
     return inventory
@@ -0,0 +1,153 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+import logging
+import os
+import threading
+
+import psycopg2
+
+from django.db import connection
+
+logger = logging.getLogger('awx.main.utils.pgnotify')
+
+__all__ = ['pg_notify', 'PGListener', 'PGNotificationDispatcher', 'CANCEL_CHANNEL',
+           'cancel_notifications']
+
+# Cancels of running jobs are announced on this channel with the job id as
+# the payload.
+CANCEL_CHANNEL = 'awx_cancel'
+
+
+def pg_notify(channel, payload=''):
+    '''
+    Send a Postgres NOTIFY on the given channel; it is delivered to listeners
+    when the current transaction commits.  No-op on other databases.
+    '''
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [channel, payload])
+
+
+class PGListener(object):
+    '''
+    LISTEN on a Postgres channel over a dedicated autocommit connection.
+    Checking for notifications only reads from the connection's socket; no
+    query is sent to the server.
+    '''
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.conn = None
+
+    @classmethod
+    def start(cls, channel):
+        '''
+        Return a listening PGListener, or None if notifications are not
+        available (non-Postgres database or connection failure).
+        '''
+        if connection.vendor != 'postgresql':
+            return None
+        listener = cls(channel)
+        try:
+            listener.conn = connection.get_new_connection(connection.get_connection_params())
+            listener.conn.autocommit = True
+            with listener.conn.cursor() as cursor:
+                cursor.execute('LISTEN "{}"'.format(channel.replace('"', '')))
+        except Exception:
+            logger.exception('Could not listen on channel {}, falling back to polling.'.format(channel))
+            listener.close()
+            return None
+        return listener
+
+    def received(self):
+        '''
+        Return the payloads of the notifications that arrived since the last
+        call.
+        '''
+        self.conn.poll()
+        payloads = [notify.payload for notify in self.conn.notifies]
+        del self.conn.notifies[:]
+        return payloads
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+
+class PGNotificationDispatcher(object):
+    '''
+    Share one PGListener on a channel between everything in this process that
+    waits for a notification, each of them identified by the payload it
+    expects.  The connection is opened when the first payload is registered
+    and closed when the last one is unregistered, so a worker holds at most
+    one LISTEN connection per channel however many jobs it runs.
+    '''
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.listener = None
+        self.pid = None
+        self.registered = set()
+        self.received_payloads = set()
+        self.lock = threading.Lock()
+
+    def register(self, payload):
+        '''
+        Start waiting for `payload`.  Returns False if notifications are not
+        available, in which case the caller has to poll.
+        '''
+        with self.lock:
+            if self.pid != os.getpid():
+                # never share a connection with a forked parent
+                self.listener = None
+                self.registered.clear()
+                self.received_payloads.clear()
+                self.pid = os.getpid()
+            if self.listener is None:
+                self.listener = PGListener.start(self.channel)
+                if self.listener is None:
+                    return False
+            self.registered.add(payload)
+            return True
+
+    def unregister(self, payload):
+        with self.lock:
+            self.registered.discard(payload)
+            self.received_payloads.discard(payload)
+            if not self.registered and self.listener is not None:
+                self.listener.close()
+                self.listener = None
+
+    def received(self, payload):
+        '''
+        Return True if `payload` was notified since the last call, False if
+        not, or None once the listening connection has been lost.
+        '''
+        with self.lock:
+            if self.listener is None or payload not in self.registered:
+                return None
+            try:
+                payloads = self.listener.received()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                # The LISTEN connection was lost (database restart, idle
+                # timeout, failover); every waiter falls back to polling.
+                logger.warning('Lost the notification connection for channel {}.'.format(self.channel))
+                self.listener.close()
+                self.listener = None
+                self.registered.clear()
+                self.received_payloads.clear()
+                return None
+            self.received_payloads.update(p for p in payloads if p in self.registered)
+            if payload in self.received_payloads:
+                self.received_payloads.discard(payload)
+                return True
+            return False
+
+
+cancel_notifications = PGNotificationDispatcher(CANCEL_CHANNEL)
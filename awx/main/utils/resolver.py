@@ -0,0 +1,53 @@
+# Copyright (c) 2017 Ansible by Red Hat
+# All Rights Reserved.
+
+# Python
+import hashlib
+import socket
+from multiprocessing.pool import ThreadPool
+
+# Django
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.encoding import smart_str
+
+__all__ = ['resolve_host_names']
+
+
+def _cache_key(name):
+    return 'host-name-addresses-{}'.format(hashlib.md5(smart_str(name)).hexdigest())
+
+
+def _resolve_host_name(name):
+    try:
+        result = socket.getaddrinfo(name, None)
+    except (socket.gaierror, UnicodeError):
+        return name, set()
+    addresses = set(x[4][0] for x in result)
+    addresses.discard(name)
+    return name, addresses
+
+
+def resolve_host_names(names):
+    '''
+    Return a dictionary mapping each of the given host names to the set of IP
+    addresses (other than itself) that it resolves to.  Results, including
+    failures, are cached for AWX_CALLBACK_ADDRESS_TTL seconds; names not in
+    the cache are resolved by up to AWX_CALLBACK_RESOLVER_CONCURRENCY threads
+    at a time.
+    '''
+    keys = dict((_cache_key(name), name) for name in set(names))
+    addresses = dict((keys[key], set(value)) for key, value in cache.get_many(keys.keys()).items())
+    uncached_names = sorted(set(keys.values()) - set(addresses.keys()))
+    if not uncached_names:
+        return addresses
+    pool = ThreadPool(max(1, min(settings.AWX_CALLBACK_RESOLVER_CONCURRENCY, len(uncached_names))))
+    try:
+        resolved = dict(pool.imap_unordered(_resolve_host_name, uncached_names))
+    finally:
+        pool.close()
+        pool.join()
+    cache.set_many(dict((_cache_key(name), sorted(value)) for name, value in resolved.items()),
+                   settings.AWX_CALLBACK_ADDRESS_TTL)
+    addresses.update(resolved)
+    return addresses
@@ -118,6 +118,10 @@ PROJECTS_ROOT = os.path.join(BASE_DIR, 'projects')
 # directory should not be web-accessible
 JOBOUTPUT_ROOT = os.path.join(BASE_DIR, 'job_output')
 
+# Absolute filesystem path to the node-local directory caching static inventory
+# files generated for jobs, keyed by inventory content version.
+AWX_INVENTORY_CACHE_ROOT = os.path.join(BASE_DIR, 'inventory_cache')
+
 # Absolute filesystem path to the directory to store logs
 LOG_ROOT = os.path.join(BASE_DIR)
 
@@ -471,9 +475,27 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': timedelta(seconds=20),
         'options': {'expires': 20,}
     },
+    'smart_inventory_memberships': {
+        'task': 'awx.main.tasks.update_host_smart_inventory_memberships',
+        'schedule': timedelta(hours=1),
+        'options': {'expires': 3000,}
+    },
 }
 AWX_INCONSISTENT_TASK_INTERVAL = 60 * 3
 
+# Maximum time (in seconds) a queued task manager pass suppresses further
+# launch/complete notifications; guards against a lost scheduler message.
+AWX_TASK_MANAGER_PENDING_TIMEOUT = 60
+
+# Maximum time (in seconds) a queued or running inventory computed fields
+# update suppresses further requests for the same inventory; guards against a
+# lost message or a worker that died mid-update.
+AWX_INVENTORY_COMPUTED_FIELDS_PENDING_TIMEOUT = 300
+
+# Largest number of changed hosts and groups tracked between two inventory
+# computed fields updates; beyond this the whole inventory is recomputed.
+AWX_INVENTORY_COMPUTED_FIELDS_MAX_DELTA = 10000
+
 # Django Caching Configuration
 if is_testing():
     CACHES = {
@@ -579,6 +601,47 @@ CAPTURE_JOB_EVENT_HOSTS = False
 # Rebuild Host Smart Inventory memberships.
 AWX_REBUILD_SMART_MEMBERSHIP = False
 
+# Above this many changed host names, smart inventory memberships are
+# reconciled in full instead of re-evaluated for the changed hosts only.
+AWX_SMART_MEMBERSHIP_MAX_HOSTS = 10000
+
+# Number of parsed smart inventory host filters to keep (per process).
+AWX_SMART_FILTER_CACHE_SIZE = 256
+
+# Serve smart inventory hosts from the memberships maintained when
+# AWX_REBUILD_SMART_MEMBERSHIP is enabled instead of running the host filter.
+# Has no effect unless AWX_REBUILD_SMART_MEMBERSHIP is enabled too.
+AWX_SMART_INVENTORY_MATERIALIZED_HOSTS = False
+
+# ansible_facts paths, in smart filter syntax (e.g. 'ansible_distribution',
+# 'ansible_default_ipv4__address' or 'ansible_all_ipv4_addresses[]'), whose
+# values are copied to an indexed table so smart filters on them don't test
+# every host's facts.  Run `awx-manage index_ansible_facts` after changing;
+# filters only use the index for a path once it has completed.
+AWX_INDEXED_ANSIBLE_FACTS = []
+
+# Seconds for which the IP addresses a host name resolves to are reused when
+# matching provisioning callbacks to hosts (they are refreshed in the
+# background once older), and the number of names resolved at once.
+AWX_CALLBACK_ADDRESS_TTL = 300
+AWX_CALLBACK_RESOLVER_CONCURRENCY = 20
+
+# Number of hosts or groups removed per transaction, along with the rows that
+# depend on them, when deleting an inventory.
+AWX_INVENTORY_DELETE_BATCH_SIZE = 500
+
+# Largest number of object ids a user can access through one role field (e.g.
+# the read_role of all inventories) that are cached per user for list views,
+# beyond which the role ancestry table is queried instead; 0 disables this.
+# Cached ids are dropped when the user's roles change, and otherwise expire
+# after AWX_ACCESSIBLE_IDS_CACHE_TIMEOUT seconds.
+AWX_ACCESSIBLE_IDS_CACHE_MAX = 1000
+AWX_ACCESSIBLE_IDS_CACHE_TIMEOUT = 3600
+
+# Pass cached facts to jobs as files in the job's private data directory
+# (Ansible's jsonfile cache plugin) instead of through memcached.
+AWX_FACT_CACHE_FILE_BASED = False
+
 # Enable bubblewrap support for running jobs (playbook runs only).
 # Note: This setting may be overridden by database settings.
 AWX_PROOT_ENABLED = True
@@ -610,6 +673,26 @@ AWX_ANSIBLE_CALLBACK_PLUGINS = ""
 # Time at which an HA node is considered active
 AWX_ACTIVE_NODE_TIME = 7200
 
+# Run jobs from hardlinked per-revision snapshots of project checkouts instead
+# of the shared checkout directory.  The snapshot is mounted read-only into the
+# job, so this also requires AWX_PROOT_ENABLED.
+AWX_PROJECT_SNAPSHOTS_ENABLED = False
+
+# Number of most recently used revision snapshots to keep per project.
+AWX_PROJECT_SNAPSHOTS_KEEP = 5
+
+# Stop looking for a play in a project's .yml/.yaml file after reading this
+# many bytes of it when listing the project's playbooks
+AWX_PROJECT_SCAN_MAX_BYTES = 1024 * 1024
+
+# Pass job inventories to Ansible (2.4+) as static JSON files rather than
+# generated Python scripts.  Isolated jobs always use a script.
+AWX_STATIC_INVENTORY_ENABLED = True
+
+# Seconds between database checks of a running job's cancel flag when cancels
+# are delivered by Postgres notifications (every pexpect loop otherwise).
+AWX_CANCEL_POLL_INTERVAL = 30
+
 # The number of seconds to sleep between status checks for jobs running on isolated nodes
 AWX_ISOLATED_CHECK_INTERVAL = 30
 
@@ -622,6 +705,15 @@ AWX_ISOLATED_CONNECTION_TIMEOUT = 10
 # The time (in seconds) between the periodic isolated heartbeat status check
 AWX_ISOLATED_PERIODIC_CHECK = 600
 
+# Stream job output from isolated nodes over a persistent SSH session instead
+# of polling them with a playbook every AWX_ISOLATED_CHECK_INTERVAL seconds
+# (polling remains the fallback if the session breaks)
+AWX_ISOLATED_STREAMING = True
+
+# The time (in seconds) an idle, multiplexed SSH connection to an isolated
+# node is kept open for reuse by other jobs
+AWX_ISOLATED_CONTROL_PERSIST = 60
+
 # Enable Pendo on the UI, possible values are 'off', 'anonymous', and 'detailed'
 # Note: This setting may be overridden by database settings.
 PENDO_TRACKING_STATE = "off"
@@ -882,6 +974,17 @@ SCM_HOST_FILTER = r'^.+$'
 SCM_EXCLUDE_EMPTY_GROUPS = True
 #SCM_INSTANCE_ID_VAR =
 
+# Keep the `_meta.hostvars` of an inventory source in a temporary file while
+# its groups are imported, decoding each host's variables only when the host
+# is added, instead of holding them all in memory.
+AWX_INVENTORY_IMPORT_SPILL_HOSTVARS = False
+
+# When a custom inventory script does not return `_meta.hostvars`, it is
+# called with `--host` for each host: at most this many calls run at once,
+# and each call is killed (failing the import) after this many seconds.
+AWX_INVENTORY_HOSTVARS_CONCURRENCY = 8
+AWX_INVENTORY_HOSTVARS_TIMEOUT = 60
+
 # ---------------------
 # -- Activity Stream --
 # ---------------------
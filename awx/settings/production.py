@@ -42,6 +42,9 @@ JOBOUTPUT_ROOT = '/var/lib/awx/job_status/'
 # The heartbeat file for the tower scheduler
 SCHEDULE_METADATA_LOCATION = '/var/lib/awx/.tower_cycle'
 
+# Node-local cache of static inventory files generated for jobs
+AWX_INVENTORY_CACHE_ROOT = '/var/lib/awx/inventory_cache/'
+
 # Ansible base virtualenv paths and enablement
 ANSIBLE_VENV_PATH = "/var/lib/awx/venv/ansible"
 
@@ -0,0 +1,36 @@
+# Copyright (c) 2017 Ansible, Inc.
+# All Rights Reserved
+#
+# Helpers shared by the benchmark scripts in this directory.
+import os
+import sys
+import time
+import traceback
+
+
+def measure(label, func):
+    '''
+    Run func() in a forked child and print its wall time and peak RSS, so
+    each measurement starts from the same parent process.
+    '''
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            func()
+            exit_code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            # never return into the parent's code (and its cleanup)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+    start = time.time()
+    _, status, rusage = os.wait4(pid, 0)
+    elapsed = time.time() - start
+    if not os.WIFEXITED(status) or os.WEXITSTATUS(status) != 0:
+        print '%-20s failed' % label
+        return
+    # ru_maxrss is reported in kilobytes on Linux.
+    print '%-20s %8.2fs  peak RSS %8.1f MB' % (label, elapsed, rusage.ru_maxrss / 1024.0)
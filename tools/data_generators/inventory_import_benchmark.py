@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Copyright (c) 2017 Ansible, Inc.
+# All Rights Reserved
+#
+# Compare peak memory and wall time of loading `ansible-inventory --list`
+# style JSON into a MemInventory the way inventory_import used to (read all
+# output, json.loads() it, then dict_to_mem_data()) and by streaming it with
+# stream_to_mem_data(), with hostvars kept in memory or spilled to disk, e.g.:
+#
+#   python tools/data_generators/inventory_import_benchmark.py --hosts 100000
+#
+# Each mode runs in a forked child so its peak RSS can be measured on its own.
+import json
+import os
+import sys
+import tempfile
+import resource
+from optparse import make_option, OptionParser
+
+
+# Django
+import django
+
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+
+from benchmark_utils import measure # noqa
+
+# awx
+from awx.main.utils.mem_inventory import ( # noqa
+    SpilledHostVars,
+    dict_to_mem_data,
+    stream_to_mem_data
+)
+
+
+option_list = [
+    make_option('--hosts', action='store', type='int', default=100000,
+                help='Number of hosts to generate'),
+    make_option('--groups', action='store', type='int', default=100,
+                help='Number of groups to spread the hosts across'),
+    make_option('--hostvars-size', action='store', type='int', default=2048,
+                help='Approximate size in bytes of the variables of each host'),
+    make_option('--source', action='store', type='string', default=None,
+                help='Benchmark an existing JSON file instead of generating one'),
+]
+parser = OptionParser(option_list=option_list)
+options, remainder = parser.parse_args()
+
+
+def generate_inventory(f, n_hosts, n_groups, hostvars_size):
+    f.write('{"_meta": {"hostvars": {')
+    for i in range(n_hosts):
+        hostvars = {
+            'ansible_host': '10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255),
+            'index': i,
+            'padding': 'x' * hostvars_size,
+        }
+        f.write('%s"host%d.example.com": %s' % (',' if i else '', i, json.dumps(hostvars)))
+    f.write('}}, "all": {"children": [%s]}' % ', '.join('"group%d"' % i for i in range(n_groups)))
+    for g in range(n_groups):
+        hosts = ', '.join('"host%d.example.com"' % i for i in range(g, n_hosts, n_groups))
+        f.write(', "group%d": {"hosts": [%s], "vars": {"group_index": %d}}' % (g, hosts, g))
+    f.write('}')
+
+
+def in_memory(path):
+    def run():
+        with open(path) as f:
+            stdout = f.read()
+        dict_to_mem_data(json.loads(stdout))
+    return run
+
+
+def streamed(path, spill=False):
+    def run():
+        hostvars = SpilledHostVars() if spill else None
+        with open(path) as f:
+            stream_to_mem_data(f, hostvars=hostvars)
+    return run
+
+
+if __name__ == '__main__':
+    if options.source:
+        path = options.source
+    else:
+        print 'Generating inventory with %d hosts in %d groups' % (options.hosts, options.groups)
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            generate_inventory(f, options.hosts, options.groups, options.hostvars_size)
+    print 'Inventory JSON is %.1f MB' % (os.path.getsize(path) / 1024.0 / 1024.0)
+    print 'Baseline process peak RSS %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+    try:
+        measure('json.loads', in_memory(path))
+        measure('streamed', streamed(path))
+        measure('streamed (spilled)', streamed(path, spill=True))
+    finally:
+        if not options.source:
+            os.remove(path)
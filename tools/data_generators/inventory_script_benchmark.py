@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# Copyright (c) 2017 Ansible, Inc.
+# All Rights Reserved
+#
+# Compare peak memory and wall time of Inventory.get_script_data() (building
+# the whole inventory in memory) and Inventory.iter_script_data() (streaming)
+# for a generated inventory, e.g.:
+#
+#   python tools/data_generators/inventory_script_benchmark.py --hosts 100000
+#
+# Each mode runs in a forked child so its peak RSS can be measured on its own.
+import json
+import os
+import sys
+import time
+import resource
+from optparse import make_option, OptionParser
+
+
+# Django
+import django
+
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+
+if base_dir not in sys.path:
+    sys.path.insert(1, base_dir)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "awx.settings.development") # noqa
+django.setup() # noqa
+
+
+from django.db import connection, transaction # noqa
+
+from benchmark_utils import measure # noqa
+
+# awx
+from awx.main.models import * # noqa
+from awx.main.signals import ( # noqa
+    disable_activity_stream,
+    disable_computed_fields
+)
+
+
+option_list = [
+    make_option('--hosts', action='store', type='int', default=100000,
+                help='Number of hosts to generate'),
+    make_option('--groups', action='store', type='int', default=100,
+                help='Number of groups to spread the hosts across'),
+    make_option('--inventory', action='store', type='int', default=None,
+                help='Benchmark an existing inventory instead of generating one'),
+    make_option('--keep', action='store_true',
+                help="Keep the generated inventory"),
+]
+parser = OptionParser(option_list=option_list)
+options, remainder = parser.parse_args()
+
+
+def generate_inventory(n_hosts, n_groups):
+    organization, _ = Organization.objects.get_or_create(name='inventory-script-benchmark')
+    inventory = Inventory.objects.create(name='inventory-script-benchmark-%d' % time.time(),
+                                         organization=organization)
+    Group.objects.bulk_create([
+        Group(name='group%d' % i, inventory=inventory, variables='{"group_index": %d}' % i)
+        for i in range(n_groups)
+    ])
+    groups = list(inventory.groups.order_by('id'))
+    for start in range(0, n_hosts, 5000):
+        Host.objects.bulk_create([
+            Host(name='host%d.example.com' % i, inventory=inventory,
+                 variables='{"ansible_host": "10.%d.%d.%d", "index": %d}' % (i >> 16 & 255, i >> 8 & 255, i & 255, i))
+            for i in range(start, min(start + 5000, n_hosts))
+        ])
+    through = Group.hosts.through
+    host_ids = inventory.hosts.order_by('id').values_list('id', flat=True).iterator()
+    batch = []
+    for n, host_id in enumerate(host_ids):
+        batch.append(through(group_id=groups[n % len(groups)].id, host_id=host_id))
+        if len(batch) >= 5000:
+            through.objects.bulk_create(batch)
+            batch = []
+    through.objects.bulk_create(batch)
+    inventory.rebuild_group_closure()
+    return inventory
+
+
+def in_memory(inventory):
+    def run():
+        connection.close()
+        with open(os.devnull, 'w') as f:
+            f.write(json.dumps(inventory.get_script_data(hostvars=True)))
+    return run
+
+
+def streamed(inventory):
+    def run():
+        connection.close()
+        with transaction.atomic(), open(os.devnull, 'w') as f:
+            for chunk in inventory.iter_script_data(hostvars=True):
+                f.write(chunk)
+    return run
+
+
+if __name__ == '__main__':
+    if options.inventory:
+        inventory = Inventory.objects.get(pk=options.inventory)
+    else:
+        print 'Generating inventory with %d hosts in %d groups' % (options.hosts, options.groups)
+        with disable_activity_stream(), disable_computed_fields():
+            inventory = generate_inventory(options.hosts, options.groups)
+    connection.close()
+    print 'Baseline process peak RSS %.1f MB' % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+    try:
+        measure('get_script_data', in_memory(inventory))
+        measure('iter_script_data', streamed(inventory))
+    finally:
+        if not options.inventory and not options.keep:
+            with disable_activity_stream(), disable_computed_fields():
+                Host.objects.filter(inventory=inventory).delete()
+                inventory.delete()